@@ -0,0 +1,754 @@
+#!/usr/bin/env python3
+"""
+Storage benchmarks for Intelligence Memory Training
+
+Usage:
+    python benchmark.py connections [--rows N] [--calls N]
+    python benchmark.py profiles [--calls N]
+    python benchmark.py bulk [--rows N] [--profile NAME]
+    python benchmark.py export [--rows N]
+    python benchmark.py import [--rows N] [--batch-size N]
+    python benchmark.py history [--calls N]
+    python benchmark.py backup [--rows N] [--pages N]
+    python benchmark.py pack [--rows N]
+    python benchmark.py profiling [--calls N]
+    python benchmark.py statistics [--rows N]
+    python benchmark.py stress [--writers N] [--sessions N] [--busy-timeout S]
+    python benchmark.py hybrid [--rows N] [--calls N]
+    python benchmark.py users [--sessions-per-user N] [--calls N]
+    python benchmark.py pages [--rows N] [--page-size N] [--calls N]
+    python benchmark.py percentile [--calls N]
+    python benchmark.py attempts [--rounds N] [--game-rounds N]
+"""
+import argparse
+import json
+import multiprocessing
+import os
+import random
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+import tracemalloc
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Any, Callable, Dict
+
+from config import Config
+from database import Database, epoch_ms, local_day
+
+
+GAME_TYPES = [
+    'document_recall', 'license_plates', 'face_recognition',
+    'safe_combinations', 'surveillance_details', 'map_memorization'
+]
+
+
+class PerCallDatabase(Database):
+    """Database that opens and closes a connection on every call (pre-cache behaviour)."""
+    
+    @contextmanager
+    def get_connection(self, write: bool = False):
+        conn = sqlite3.connect(self.db_file)
+        conn.row_factory = sqlite3.Row
+        try:
+            yield conn
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        finally:
+            conn.close()
+
+
+def seed_sessions(db: Database, rows: int) -> None:
+    """Fill the sessions and statistics tables with random sessions."""
+    rng = random.Random(42)
+    now = epoch_ms()
+    
+    def row():
+        ts = now - rng.randint(0, 2_000_000) * 60_000
+        return (rng.choice(GAME_TYPES), rng.randint(0, 300), rng.randint(1, 20),
+                rng.randint(0, 10), 10, rng.randint(30, 600), ts, local_day(ts))
+    
+    with db.get_connection() as conn:
+        conn.executemany('''
+            INSERT INTO sessions
+            (game_type, score, level_reached, correct_answers, total_attempts,
+             duration_seconds, practice_mode, ts_ms, local_day)
+            VALUES (?, ?, ?, ?, ?, ?, 0, ?, ?)
+        ''', (row() for _ in range(rows)))
+        conn.execute('''
+            INSERT OR REPLACE INTO statistics
+            (user_id, game_type, sessions_played, best_score, total_score, best_level,
+             total_correct, total_attempts, last_played)
+            SELECT user_id, game_type, COUNT(*), MAX(score), SUM(score), MAX(level_reached),
+                   SUM(correct_answers), SUM(total_attempts), MAX(ts_ms)
+            FROM sessions GROUP BY user_id, game_type
+        ''')
+
+
+def time_calls(fn: Callable[[], object], calls: int) -> float:
+    """Return the mean latency of fn in microseconds."""
+    start = time.perf_counter()
+    for _ in range(calls):
+        fn()
+    return (time.perf_counter() - start) / calls * 1e6
+
+
+def bench_connections(args: argparse.Namespace) -> None:
+    """Compare per-call connections with the per-thread connection cache."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db_file = os.path.join(temp_dir, 'bench.db')
+        cached = Database(db_file)
+        seed_sessions(cached, args.rows)
+        per_call = PerCallDatabase(db_file)
+        
+        operations: Dict[str, Callable[[Database], object]] = {
+            'get_statistics': lambda db: db.get_statistics('document_recall'),
+            'get_achievements': lambda db: db.get_achievements(),
+            'get_user_data': lambda db: db.get_user_data('theme'),
+            'get_recent_sessions': lambda db: db.get_recent_sessions(10, 'license_plates'),
+        }
+        
+        print(f"Per-call latency on {args.rows:,} sessions ({args.calls} calls each)")
+        print(f"{'operation':<22}{'per-call (us)':>16}{'cached (us)':>14}{'speedup':>10}")
+        for name, op in operations.items():
+            before = time_calls(lambda: op(per_call), args.calls)
+            after = time_calls(lambda: op(cached), args.calls)
+            print(f"{name:<22}{before:>16.1f}{after:>14.1f}{before / after:>9.1f}x")
+        cached.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_profiles(args: argparse.Namespace) -> None:
+    """Compare record_session latency under each performance profile."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print(f"record_session latency ({args.calls} calls each)")
+        print(f"{'profile':<12}{'journal':>10}{'synchronous':>14}{'latency (us)':>15}")
+        for profile in Config.DB_PROFILES:
+            db = Database(os.path.join(temp_dir, f'{profile}.db'), profile=profile)
+            pragmas = db.get_pragmas()
+            latency = time_calls(lambda: db.record_session('document_recall', 100, 5, 5, 5),
+                                 args.calls)
+            print(f"{profile:<12}{pragmas['journal_mode']:>10}"
+                  f"{pragmas['synchronous']:>14}{latency:>15.1f}")
+            db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def random_sessions(rows: int, seed: int = 42):
+    """Yield record_sessions() dicts with random values in time order, as a kiosk sync would."""
+    rng = random.Random(seed)
+    moment = int(datetime(2020, 1, 1).timestamp() * 1000)
+    for _ in range(rows):
+        moment += rng.randint(1, 600) * 1000
+        yield {
+            'game_type': rng.choice(GAME_TYPES),
+            'score': rng.randint(0, 300),
+            'level': rng.randint(1, 20),
+            'correct': rng.randint(0, 10),
+            'total': 10,
+            'duration': rng.randint(30, 600),
+            'ts_ms': moment
+        }
+
+
+def bench_bulk(args: argparse.Namespace) -> None:
+    """Measure record_sessions() throughput (target: 100k sessions/s)."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'bulk.db'), profile=args.profile)
+        sessions = list(random_sessions(args.rows))
+        
+        start = time.perf_counter()
+        db.record_sessions(sessions)
+        elapsed = time.perf_counter() - start
+        
+        rate = args.rows / elapsed
+        print(f"record_sessions: {args.rows:,} sessions in {elapsed:.2f}s "
+              f"({rate:,.0f} sessions/s, profile={args.profile})")
+        print("target 100,000 sessions/s:", "met" if rate >= 100_000 else "MISSED")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_export(args: argparse.Namespace) -> None:
+    """Compare peak memory and time of export_data and export_stream."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'export.db'))
+        db.record_sessions(random_sessions(args.rows))
+        out_file = os.path.join(temp_dir, 'export.json')
+        
+        def export_in_memory():
+            with open(out_file, 'w') as f:
+                json.dump(db.export_data(), f)
+        
+        def export_streaming():
+            with open(out_file, 'w') as f:
+                db.export_stream(f)
+        
+        print(f"Export of {args.rows:,} sessions")
+        print(f"{'method':<16}{'time (s)':>10}{'peak memory (MB)':>20}")
+        for name, export in (('export_data', export_in_memory),
+                             ('export_stream', export_streaming)):
+            tracemalloc.start()
+            start = time.perf_counter()
+            export()
+            elapsed = time.perf_counter() - start
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            print(f"{name:<16}{elapsed:>10.2f}{peak / 1e6:>20.1f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_import(args: argparse.Namespace) -> None:
+    """Time import_data on a backup file produced by export_stream."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        source = Database(os.path.join(temp_dir, 'source.db'))
+        source.record_sessions(random_sessions(args.rows))
+        backup_file = os.path.join(temp_dir, 'backup.json')
+        with open(backup_file, 'w') as f:
+            source.export_stream(f)
+        source.close()
+        size_mb = os.path.getsize(backup_file) / 1e6
+        
+        start = time.perf_counter()
+        with open(backup_file) as f:
+            data = json.load(f)
+        parsed = time.perf_counter()
+        
+        target = Database(os.path.join(temp_dir, 'target.db'))
+        count = target.import_data(data, merge=False, batch_size=args.batch_size)
+        loaded = time.perf_counter()
+        
+        print(f"Import of {count:,} sessions from a {size_mb:.0f} MB backup file")
+        print(f"  json.load:   {parsed - start:6.2f}s")
+        print(f"  import_data: {loaded - parsed:6.2f}s ({count / (loaded - parsed):,.0f} sessions/s)")
+        target.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_history(args: argparse.Namespace) -> None:
+    """Show 5-year get_session_history latency as the session count grows."""
+    raw_history = '''
+        SELECT local_day, COUNT(*), SUM(score), AVG(score), MAX(level_reached)
+        FROM sessions
+        WHERE ts_ms >= ?
+        GROUP BY local_day
+        ORDER BY local_day DESC
+    '''
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'history.db'))
+        start = epoch_ms() - 5 * 365 * 86_400_000
+        recorded = 0
+        print(f"5-year history latency ({args.calls} calls each)")
+        print(f"{'sessions':>10}{'raw GROUP BY (ms)':>20}{'rollup (ms)':>14}")
+        for target in (10_000, 100_000, 1_000_000):
+            rng = random.Random(target)
+            db.record_sessions({
+                'game_type': rng.choice(GAME_TYPES), 'score': rng.randint(0, 300),
+                'level': rng.randint(1, 20),
+                'ts_ms': start + rng.randint(0, 5 * 365 * 86400) * 1000
+            } for _ in range(target - recorded))
+            recorded = target
+            
+            def raw():
+                with db.get_connection() as conn:
+                    conn.execute(raw_history, (start,)).fetchall()
+            
+            raw_ms = time_calls(raw, args.calls) / 1000
+            rollup_ms = time_calls(lambda: db.get_session_history(5 * 365), args.calls) / 1000
+            print(f"{recorded:>10,}{raw_ms:>20.2f}{rollup_ms:>14.2f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_backup(args: argparse.Namespace) -> None:
+    """Measure record_session latency while an online backup is running."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'live.db'))
+        db.record_sessions(random_sessions(args.rows))
+        
+        def write_latencies(stop: threading.Event):
+            latencies = []
+            while not stop.is_set() and len(latencies) < 2000:
+                start = time.perf_counter()
+                db.record_session('document_recall', 100, 5, 5, 5)
+                latencies.append((time.perf_counter() - start) * 1000)
+            return latencies
+        
+        idle = write_latencies(threading.Event())
+        
+        done = threading.Event()
+        result = {}
+        
+        def run_backup():
+            result.update(db.backup(os.path.join(temp_dir, 'copy.db'), pages=args.pages))
+            done.set()
+        
+        backup_thread = threading.Thread(target=run_backup)
+        backup_thread.start()
+        during = write_latencies(done)
+        backup_thread.join()
+        
+        print(f"Online backup of {result['bytes'] / 1e6:.0f} MB ({result['pages']:,} pages, "
+              f"{args.pages} per step) took {result['duration_s']:.2f}s")
+        print(f"{'record_session':<22}{'mean (ms)':>12}{'max (ms)':>12}")
+        for name, latencies in (('idle', idle), ('during backup', during)):
+            print(f"{name:<22}{sum(latencies) / len(latencies):>12.3f}{max(latencies):>12.3f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_pack(args: argparse.Namespace) -> None:
+    """Compare size and time of JSON and pack exports and imports."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'source.db'))
+        db.record_sessions(random_sessions(args.rows))
+        
+        def json_export(path):
+            with open(path, 'w') as f:
+                db.export_stream(f)
+        
+        def json_import(target, path):
+            with open(path) as f:
+                target.import_data(json.load(f), merge=False)
+        
+        def pack_export(codec):
+            def export(path):
+                with open(path, 'wb') as f:
+                    db.export_pack(f, codec=codec)
+            return export
+        
+        def pack_import(target, path):
+            with open(path, 'rb') as f:
+                target.import_pack(f, merge=False)
+        
+        formats = [('json', json_export, json_import)]
+        formats += [(f'pack/{codec}', pack_export(codec), pack_import)
+                    for codec in ('zlib', 'lzma')]
+        
+        print(f"Export and import of {args.rows:,} sessions")
+        print(f"{'format':<12}{'size (MB)':>11}{'export (s)':>12}{'import (s)':>12}")
+        for index, (name, export, load) in enumerate(formats):
+            path = os.path.join(temp_dir, f'export-{index}')
+            start = time.perf_counter()
+            export(path)
+            exported = time.perf_counter()
+            target = Database(os.path.join(temp_dir, f'target-{index}.db'))
+            load(target, path)
+            imported = time.perf_counter()
+            target.close()
+            print(f"{name:<12}{os.path.getsize(path) / 1e6:>11.1f}"
+                  f"{exported - start:>12.2f}{imported - exported:>12.2f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_profiling(args: argparse.Namespace) -> None:
+    """Measure the per-call cost of method profiling, on and off."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'bench.db'))
+        db.set_user_data('streak', 3)
+        
+        # A cached read is the cheapest public call, so the wrapper cost shows most
+        def call():
+            db.get_user_data('streak')
+        
+        time_calls(call, 1000)
+        never = time_calls(call, args.calls)
+        db.enable_profiling()
+        enabled = time_calls(call, args.calls)
+        db.disable_profiling()
+        disabled = time_calls(call, args.calls)
+        
+        print(f"get_user_data (cached), mean of {args.calls:,} calls")
+        print(f"{'profiling':<22}{'mean (us)':>12}{'overhead (us)':>15}")
+        for name, mean in (('never enabled', never), ('enabled', enabled),
+                           ('disabled again', disabled)):
+            print(f"{name:<22}{mean:>12.3f}{mean - never:>15.3f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_statistics(args: argparse.Namespace) -> None:
+    """Time rebuild_statistics() and verify_statistics() on a large sessions table."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'statistics.db'))
+        db.record_sessions(random_sessions(args.rows))
+        db.close()
+        
+        for name, call in (('rebuild_statistics', db.rebuild_statistics),
+                           ('verify_statistics', db.verify_statistics)):
+            start = time.perf_counter()
+            call()
+            print(f"{name}: {args.rows:,} sessions in {time.perf_counter() - start:.2f}s")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def stress_writer(db_file: str, sessions: int, multi_process: bool, busy_timeout: float,
+                  start, results, seed: int) -> None:
+    """Record sessions from one process and report (recorded, failed) on results."""
+    rng = random.Random(seed)
+    recorded = failed = 0
+    db = Database(db_file, busy_timeout=busy_timeout, multi_process=multi_process)
+    start.wait()
+    for _ in range(sessions):
+        try:
+            db.record_session(rng.choice(GAME_TYPES), rng.randint(0, 300), rng.randint(1, 20),
+                              rng.randint(0, 10), 10, rng.randint(30, 600))
+            recorded += 1
+        except sqlite3.OperationalError:
+            failed += 1
+    db.close()
+    results.put((recorded, failed))
+
+
+def run_stress(db_file: str, writers: int = 16, sessions: int = 200, multi_process: bool = True,
+               busy_timeout: float = 5.0) -> Dict[str, Any]:
+    """Have ``writers`` processes record ``sessions`` each into db_file at once.
+    
+    Processes are spawned rather than forked so none inherits an open
+    connection, and all start writing together. ``lost`` counts sessions
+    a writer believed recorded that are missing from the file.
+    """
+    with Database(db_file) as db:
+        before = db.get_statistics()
+    stored_before = sum(stats['sessions_played'] for stats in before.values())
+    
+    context = multiprocessing.get_context('spawn')
+    start = context.Barrier(writers)
+    results = context.Queue()
+    processes = [context.Process(target=stress_writer,
+                                 args=(db_file, sessions, multi_process, busy_timeout,
+                                       start, results, seed))
+                 for seed in range(writers)]
+    for process in processes:
+        process.start()
+    began = time.perf_counter()
+    outcomes = [results.get() for _ in processes]
+    elapsed = time.perf_counter() - began
+    for process in processes:
+        process.join()
+    
+    recorded = sum(outcome[0] for outcome in outcomes)
+    with Database(db_file) as db:
+        with db.get_connection() as conn:
+            stored = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0] - stored_before
+        discrepancies = db.verify_statistics()
+    return {
+        'writers': writers,
+        'attempted': writers * sessions,
+        'recorded': recorded,
+        'failed': sum(outcome[1] for outcome in outcomes),
+        'stored': stored,
+        'lost': recorded - stored,
+        'statistics_consistent': not discrepancies,
+        'seconds': elapsed
+    }
+
+
+def bench_stress(args: argparse.Namespace) -> None:
+    """Compare concurrent writers from separate processes with and without multi_process."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        print(f"{args.writers} processes x {args.sessions} record_session calls")
+        print(f"{'mode':<16}{'recorded':>10}{'failed':>8}{'lost':>6}{'stats ok':>10}"
+              f"{'sessions/s':>12}")
+        for mode, multi_process in (('default', False), ('multi_process', True)):
+            result = run_stress(os.path.join(temp_dir, f'{mode}.db'), args.writers,
+                                args.sessions, multi_process, args.busy_timeout)
+            print(f"{mode:<16}{result['recorded']:>10,}{result['failed']:>8,}"
+                  f"{result['lost']:>6}{str(result['statistics_consistent']):>10}"
+                  f"{result['recorded'] / result['seconds']:>12,.0f}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_hybrid(args: argparse.Namespace) -> None:
+    """Compare record_session latency on disk and in hybrid mode, and the cost of a snapshot."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        path = os.path.join(temp_dir, 'hybrid.db')
+        with Database(path) as db:
+            db.record_sessions(random_sessions(args.rows))
+            disk = time_calls(lambda: db.record_session('document_recall', 100, 5, 5, 5),
+                              args.calls)
+        
+        start = time.perf_counter()
+        db = Database(path, hybrid=True, snapshot_interval=3600)
+        loaded = time.perf_counter() - start
+        memory = time_calls(lambda: db.record_session('document_recall', 100, 5, 5, 5),
+                            args.calls)
+        
+        # Longest write while a snapshot is being taken
+        done = threading.Event()
+        stalls = []
+        
+        def write_during_snapshot():
+            while not done.is_set():
+                begin = time.perf_counter()
+                db.record_session('document_recall', 100, 5, 5, 5)
+                stalls.append(time.perf_counter() - begin)
+        
+        writer = threading.Thread(target=write_during_snapshot)
+        writer.start()
+        result = db.snapshotter.snapshot_now()
+        done.set()
+        writer.join()
+        db.close()
+        
+        print(f"{args.rows:,} sessions, {result['bytes'] / 1e6:.1f} MB")
+        print(f"{'record_session on disk (us)':<36}{disk:>10.1f}")
+        print(f"{'record_session in hybrid (us)':<36}{memory:>10.1f}")
+        print(f"{'load at startup (ms)':<36}{loaded * 1000:>10.1f}")
+        print(f"{'snapshot (ms)':<36}{result['duration_s'] * 1000:>10.1f}")
+        print(f"{'longest write during snapshot (ms)':<36}{max(stalls) * 1000:>10.1f}")
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_users(args: argparse.Namespace) -> None:
+    """Show per-user query latency as the number of users sharing the database grows."""
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'users.db'))
+        rng = random.Random(7)
+        now = epoch_ms()
+        user_ids = []
+        
+        def per_user(call: Callable[[], object]) -> float:
+            total = 0.0
+            for user_id in rng.choices(user_ids, k=args.calls):
+                db.set_user(user_id)
+                # Every call misses the read cache, as for a trainee who just logged in
+                db._read_cache.clear()
+                start = time.perf_counter()
+                call()
+                total += time.perf_counter() - start
+            return total / args.calls * 1e6
+        
+        print(f"Per-user query latency, mean of {args.calls} calls on random users")
+        print(f"{'users':>8}{'sessions':>12}{'statistics (us)':>18}{'recent (us)':>14}"
+              f"{'history (us)':>15}")
+        for target in (10, 100, 1_000, 10_000):
+            added = [db.add_user(f'trainee-{n}') for n in range(len(user_ids), target)]
+            db.record_sessions({
+                'user_id': user_id, 'game_type': rng.choice(GAME_TYPES),
+                'score': rng.randint(0, 300), 'level': rng.randint(1, 20),
+                'ts_ms': now - rng.randint(0, 90 * 86400) * 1000
+            } for user_id in added for _ in range(args.sessions_per_user))
+            user_ids += added
+            
+            statistics = per_user(db.get_statistics)
+            recent = per_user(lambda: db.get_recent_sessions(10, game_type='document_recall'))
+            history = per_user(lambda: db.get_session_history(30))
+            print(f"{target:>8,}{target * args.sessions_per_user:>12,}{statistics:>18.1f}"
+                  f"{recent:>14.1f}{history:>15.1f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_pages(args: argparse.Namespace) -> None:
+    """Compare OFFSET paging with keyset pages at increasing depth."""
+    offset_page = '''
+        SELECT * FROM sessions WHERE user_id = ?
+        ORDER BY ts_ms DESC, id DESC
+        LIMIT ? OFFSET ?
+    '''
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'pages.db'))
+        db.record_sessions(random_sessions(args.rows))
+        
+        print(f"Page of {args.page_size} sessions out of {args.rows:,}, "
+              f"mean of {args.calls} calls")
+        print(f"{'depth':>10}{'OFFSET (ms)':>14}{'keyset (ms)':>14}")
+        for depth in (0, 1_000, 10_000, 100_000, args.rows // 2, args.rows - args.page_size):
+            depth = min(depth, args.rows - 1)
+            with db.get_connection() as conn:
+                offset_ms = time_calls(
+                    lambda: conn.execute(offset_page, (db.user_id, args.page_size, depth))
+                    .fetchall(), args.calls) / 1000
+                # The position a continuation token at this depth would hold
+                previous = conn.execute(offset_page, (db.user_id, 1, depth - 1)).fetchone()
+            after = (previous['ts_ms'], previous['id']) if depth else None
+            keyset_ms = time_calls(lambda: db.get_session_page(after, page_size=args.page_size),
+                                   args.calls) / 1000
+            print(f"{depth:>10,}{offset_ms:>14.3f}{keyset_ms:>14.3f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_percentile(args: argparse.Namespace) -> None:
+    """Compare counting sessions with the score histogram for a score percentile."""
+    raw_percentile = '''
+        SELECT SUM(score < ?), COUNT(*) FROM sessions
+        WHERE user_id = ? AND game_type = ?
+    '''
+    temp_dir = tempfile.mkdtemp()
+    try:
+        db = Database(os.path.join(temp_dir, 'percentile.db'))
+        recorded = 0
+        print(f"document_recall score percentile, mean of {args.calls} calls")
+        print(f"{'sessions':>10}{'COUNT over sessions (ms)':>26}{'histogram (ms)':>16}")
+        for target in (10_000, 100_000, 1_000_000):
+            db.record_sessions(random_sessions(target - recorded, seed=target))
+            recorded = target
+            
+            def raw():
+                with db.get_connection() as conn:
+                    conn.execute(raw_percentile, (150, db.user_id, 'document_recall')).fetchone()
+            
+            raw_ms = time_calls(raw, args.calls) / 1000
+            histogram_ms = time_calls(lambda: db.get_score_percentile('document_recall', 150),
+                                      args.calls) / 1000
+            print(f"{recorded:>10,}{raw_ms:>26.3f}{histogram_ms:>16.3f}")
+        db.close()
+    finally:
+        shutil.rmtree(temp_dir)
+
+
+def bench_attempts(args: argparse.Namespace) -> None:
+    """Append round attempts through AttemptBuffer at several flush sizes."""
+    print(f"{args.rounds:,} attempts in games of {args.game_rounds} rounds")
+    print(f"{'flush_every':>12}{'attempts/s':>12}{'per attempt (us)':>18}"
+          f"{'max add (ms)':>14}{'size (MB)':>11}")
+    for flush_every in (1, 10, 50, 200):
+        temp_dir = tempfile.mkdtemp()
+        try:
+            db_file = os.path.join(temp_dir, 'attempts.db')
+            db = Database(db_file)
+            worst = 0.0
+            start = time.perf_counter()
+            for game in range(args.rounds // args.game_rounds):
+                attempts = db.open_attempts('number_memory', flush_every=flush_every)
+                for level in range(1, args.game_rounds + 1):
+                    began = time.perf_counter()
+                    attempts.add(level, '4817', '4817' if level % 7 else '4871',
+                                 level % 7 != 0, 1200 + level)
+                    worst = max(worst, time.perf_counter() - began)
+                session_id = db.record_session('number_memory', 10 * args.game_rounds,
+                                               args.game_rounds)
+                attempts.finish(session_id)
+            elapsed = time.perf_counter() - start
+            db.close()
+            print(f"{flush_every:>12}{args.rounds / elapsed:>12,.0f}"
+                  f"{elapsed / args.rounds * 1e6:>18.1f}{worst * 1000:>14.2f}"
+                  f"{os.path.getsize(db_file) / 1e6:>11.1f}")
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+def main() -> None:
+    """Parse arguments and run the selected benchmark."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    subparsers = parser.add_subparsers(dest='benchmark', required=True)
+    
+    connections = subparsers.add_parser('connections', help='connection cache latency')
+    connections.add_argument('--rows', type=int, default=100_000)
+    connections.add_argument('--calls', type=int, default=500)
+    connections.set_defaults(func=bench_connections)
+    
+    profiles = subparsers.add_parser('profiles', help='record_session latency per profile')
+    profiles.add_argument('--calls', type=int, default=500)
+    profiles.set_defaults(func=bench_profiles)
+    
+    bulk = subparsers.add_parser('bulk', help='record_sessions throughput')
+    bulk.add_argument('--rows', type=int, default=500_000)
+    bulk.add_argument('--profile', choices=sorted(Config.DB_PROFILES), default='balanced')
+    bulk.set_defaults(func=bench_bulk)
+    
+    export = subparsers.add_parser('export', help='export memory use')
+    export.add_argument('--rows', type=int, default=200_000)
+    export.set_defaults(func=bench_export)
+    
+    import_ = subparsers.add_parser('import', help='import_data throughput')
+    import_.add_argument('--rows', type=int, default=1_000_000)
+    import_.add_argument('--batch-size', type=int, default=5000)
+    import_.set_defaults(func=bench_import)
+    
+    history = subparsers.add_parser('history', help='get_session_history latency')
+    history.add_argument('--calls', type=int, default=5)
+    history.set_defaults(func=bench_history)
+    
+    backup = subparsers.add_parser('backup', help='write latency during an online backup')
+    backup.add_argument('--rows', type=int, default=500_000)
+    backup.add_argument('--pages', type=int, default=64)
+    backup.set_defaults(func=bench_backup)
+    
+    pack = subparsers.add_parser('pack', help='pack vs JSON export size and time')
+    pack.add_argument('--rows', type=int, default=1_000_000)
+    pack.set_defaults(func=bench_pack)
+    
+    profiling = subparsers.add_parser('profiling', help='per-call cost of method profiling')
+    profiling.add_argument('--calls', type=int, default=200_000)
+    profiling.set_defaults(func=bench_profiling)
+    
+    statistics = subparsers.add_parser('statistics', help='statistics rebuild and verify time')
+    statistics.add_argument('--rows', type=int, default=10_000_000)
+    statistics.set_defaults(func=bench_statistics)
+    
+    stress = subparsers.add_parser('stress', help='concurrent writers in separate processes')
+    stress.add_argument('--writers', type=int, default=16)
+    stress.add_argument('--sessions', type=int, default=200)
+    stress.add_argument('--busy-timeout', type=float, default=5.0)
+    stress.set_defaults(func=bench_stress)
+    
+    hybrid = subparsers.add_parser('hybrid', help='hybrid in-memory write latency and snapshots')
+    hybrid.add_argument('--rows', type=int, default=200_000)
+    hybrid.add_argument('--calls', type=int, default=2000)
+    hybrid.set_defaults(func=bench_hybrid)
+    
+    users = subparsers.add_parser('users', help='per-user query latency as users grow')
+    users.add_argument('--sessions-per-user', type=int, default=50)
+    users.add_argument('--calls', type=int, default=1000)
+    users.set_defaults(func=bench_users)
+    
+    pages = subparsers.add_parser('pages', help='OFFSET vs keyset session pages by depth')
+    pages.add_argument('--rows', type=int, default=1_000_000)
+    pages.add_argument('--page-size', type=int, default=50)
+    pages.add_argument('--calls', type=int, default=20)
+    pages.set_defaults(func=bench_pages)
+    
+    percentile = subparsers.add_parser('percentile', help='score percentile latency')
+    percentile.add_argument('--calls', type=int, default=100)
+    percentile.set_defaults(func=bench_percentile)
+    
+    attempts = subparsers.add_parser('attempts', help='buffered attempt append throughput')
+    attempts.add_argument('--rounds', type=int, default=300_000)
+    attempts.add_argument('--game-rounds', type=int, default=100)
+    attempts.set_defaults(func=bench_attempts)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
@@ -1,9 +1,13 @@
 """
 Configuration settings for Intelligence Memory Training
+
+The global ``config`` instance is created on first access (or by init()),
+so importing this module does not read settings.json.
 """
-from typing import Dict, Any
+from typing import Dict, Any, Optional
 import json
 import os
+import threading
 
 
 class Config:
@@ -71,6 +75,25 @@ class Config:
         }
     }
     
+    # SQLite performance profiles (PRAGMA name -> value)
+    DB_PROFILES = {
+        'durable': {
+            'journal_mode': 'DELETE',
+            'synchronous': 'FULL'
+        },
+        'balanced': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL'
+        },
+        'fast': {
+            'journal_mode': 'WAL',
+            'synchronous': 'NORMAL',
+            'cache_size': -65536,  # KiB, i.e. 64 MB
+            'mmap_size': 268435456,  # 256 MB
+            'temp_store': 'MEMORY'
+        }
+    }
+    
     # Default settings
     DEFAULT_SETTINGS = {
         'theme': 'dark',
@@ -84,7 +107,20 @@ class Config:
         'window_width': 1000,
         'window_height': 750,
         'stats_file': 'memory_stats.db',
+        'db_profile': 'balanced',  # durable, balanced, fast
+        'snapshot_reads': True,  # read-only connections for statistics and history
+        'multi_process_writes': False,  # several app instances share stats_file
+        'busy_timeout_ms': 5000,
+        'hybrid_memory': False,  # work in memory, snapshot stats_file periodically
+        'snapshot_interval_seconds': 30,  # most work lost on a crash in hybrid mode
+        'db_profiling': False,  # per-method latency histograms and slow-call log
+        'slow_query_ms': 50,
+        'archive_file': None,  # relative to stats_file; see get_archive_file()
+        'archive_after_days': None,  # move older sessions to the archive at startup
         'backup_enabled': True,
+        'backup_dir': 'backups',
+        'backup_keep': 5,  # rotated copies
+        'backup_interval_hours': 24,
         'tutorial_completed': False
     }
     
@@ -251,6 +287,24 @@ class Config:
         difficulty_name = self.settings.get('difficulty', 'medium')
         return self.DIFFICULTY_PRESETS.get(difficulty_name, self.DIFFICULTY_PRESETS['medium'])
     
+    def get_db_profile(self) -> str:
+        """Get the configured database performance profile name."""
+        profile_name = self.settings.get('db_profile', 'balanced')
+        return profile_name if profile_name in self.DB_PROFILES else 'balanced'
+    
+    def get_archive_file(self, stats_file: str) -> Optional[str]:
+        """Get the session archive path for stats_file, or None when there is no archive.
+        
+        A relative archive_file is taken from stats_file's directory. With
+        only archive_after_days set, the archive is ``<stats_file name>.archive.db``.
+        """
+        archive_file = self.settings.get('archive_file')
+        if not archive_file:
+            if not self.settings.get('archive_after_days') or stats_file == ':memory:':
+                return None
+            archive_file = os.path.splitext(os.path.basename(stats_file))[0] + '.archive.db'
+        return os.path.join(os.path.dirname(stats_file), archive_file)
+    
     def get_font_multiplier(self) -> float:
         """Get font size multiplier."""
         size = self.settings.get('font_size', 'medium')
@@ -262,5 +316,30 @@ class Config:
         self.save_settings()
 
 
-# Global config instance
-config = Config()
+# Global config instance, loaded by init() or on first access to ``config``
+_config: Optional[Config] = None
+_config_lock = threading.RLock()
+
+
+def init(config_file: str = 'settings.json') -> Config:
+    """Load the global configuration, replacing any loaded before."""
+    global _config
+    with _config_lock:
+        _config = Config(config_file)
+        return _config
+
+
+def get_config() -> Config:
+    """Return the global configuration, loading it on first use."""
+    if _config is None:
+        with _config_lock:
+            if _config is None:
+                init()
+    return _config
+
+
+def __getattr__(name: str) -> Any:
+    """Create the ``config`` singleton lazily (module attribute hook, PEP 562)."""
+    if name == 'config':
+        return get_config()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
@@ -1,52 +1,500 @@
 """
 Database management for Intelligence Memory Training
+
+The global ``db`` instance is opened on first access (or by init()), so
+importing this module touches neither the configuration nor the disk.
 """
 import sqlite3
 import json
-from datetime import datetime
-from typing import Dict, List, Optional, Any
+import atexit
+import os
+import queue
+import random
+import threading
+import time
+import weakref
+from collections import deque
+from datetime import datetime, timedelta, timezone
+from itertools import chain, islice
+from typing import (TYPE_CHECKING, BinaryIO, Callable, Dict, Iterable, Iterator, List,
+                    Optional, Any, TextIO, Tuple, Union)
 from contextlib import contextmanager
+from config import Config, get_config
+
+if TYPE_CHECKING:
+    from concurrent.futures import Future
+
+
+def epoch_ms() -> int:
+    """Return the current time as integer epoch milliseconds."""
+    return time.time_ns() // 1_000_000
+
+
+def to_epoch_ms(value: Any) -> Optional[int]:
+    """Convert epoch milliseconds or a legacy UTC 'YYYY-MM-DD HH:MM:SS' text timestamp."""
+    if value is None or isinstance(value, int):
+        return value
+    moment = datetime.fromisoformat(value)
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return round(moment.timestamp() * 1000)
+
+
+def is_busy_error(error: Exception) -> bool:
+    """Check whether an sqlite3 error means another connection holds the lock."""
+    return isinstance(error, sqlite3.OperationalError) and 'locked' in str(error)
+
+
+def encode_user_value(value: Any) -> str:
+    """Encode a user_data value; strings are stored as-is, anything else as JSON."""
+    return value if isinstance(value, str) else json.dumps(value)
+
+
+def decode_user_value(text: str) -> Any:
+    """Decode a stored user_data value, falling back to the raw string."""
+    try:
+        return json.loads(text)
+    except (json.JSONDecodeError, TypeError):
+        return text
+
+
+def encode_page_token(ts_ms: int, session_id: int, newest_first: bool) -> str:
+    """Encode a session page position and reading direction as an opaque string."""
+    return '%s%x.%x' % ('o' if newest_first else 'n', ts_ms, session_id)
+
+
+def decode_page_token(token: str) -> Tuple[int, int, bool]:
+    """Decode a token from encode_page_token() into (ts_ms, session_id, newest_first)."""
+    try:
+        direction, (ts_ms, session_id) = token[0], token[1:].split('.')
+        if direction not in ('o', 'n'):
+            raise ValueError
+        return int(ts_ms, 16), int(session_id, 16), direction == 'o'
+    except (ValueError, IndexError, TypeError, AttributeError):
+        raise ValueError(f'Invalid session page token {token!r}') from None
+
+
+# (start_ms, end_ms, day) of the last local day looked up; bulk inserts arrive in time order
+_last_day_span = (0, 0, 0)
+
+
+def local_day(ts_ms: int) -> int:
+    """Return the local calendar day of an epoch-ms time as a YYYYMMDD integer."""
+    global _last_day_span
+    start, end, day = _last_day_span
+    if start <= ts_ms < end:
+        return day
+    
+    moment = time.localtime(ts_ms // 1000)
+    day = moment.tm_year * 10000 + moment.tm_mon * 100 + moment.tm_mday
+    # mktime finds local midnight on both ends, so 23 and 25 hour DST days are exact
+    start = int(time.mktime((moment.tm_year, moment.tm_mon, moment.tm_mday, 0, 0, 0, 0, 0, -1)))
+    end = int(time.mktime((moment.tm_year, moment.tm_mon, moment.tm_mday + 1, 0, 0, 0, 0, 0, -1)))
+    _last_day_span = (start * 1000, end * 1000, day)
+    return day
+
+
+class _ThreadOwner:
+    """Kept in a thread-local; freed, and its finalizers run, when the thread exits."""
+
+
+def _release_connection(connections: List[sqlite3.Connection], lock: threading.Lock,
+                        conn: sqlite3.Connection) -> None:
+    """Stop tracking a connection and close it."""
+    with lock:
+        if conn in connections:
+            connections.remove(conn)
+    conn.close()
+
+
+class _BackupRestarted(Exception):
+    """Raised from a backup's progress callback to abandon a copy that keeps restarting."""
+
+
+def _backup_file(source_file: str, destination: sqlite3.Connection, pages: int,
+                 max_restarts: int, on_step: Callable[[int, int, int], None]) -> None:
+    """Copy a database file into destination with the online backup API.
+    
+    SQLite restarts a paged copy whenever another connection commits, so
+    under steady writes it might never finish. WAL files are copied in one
+    step, since a WAL reader does not block writers; other journal modes
+    copy ``pages`` at a time and fall back to one step after
+    ``max_restarts`` restarts.
+    """
+    source = sqlite3.connect(source_file)
+    try:
+        if source.execute('PRAGMA journal_mode').fetchone()[0].lower() == 'wal':
+            pages = -1
+        restarts = 0
+        copied = 0
+        
+        def step(status: int, remaining: int, total: int) -> None:
+            nonlocal restarts, copied
+            if copied and total - remaining <= copied:
+                restarts += 1
+                if restarts > max_restarts:
+                    raise _BackupRestarted()
+            copied = total - remaining
+            on_step(status, remaining, total)
+        
+        try:
+            source.backup(destination, pages=pages, progress=step)
+        except _BackupRestarted:
+            source.backup(destination, pages=-1, progress=on_step)
+    finally:
+        source.close()
 
 
 class Database:
     """SQLite database manager for persistent storage."""
     
-    def __init__(self, db_file: str = 'memory_stats.db'):
-        """Initialize database connection."""
+    # PRAGMA synchronous / temp_store report integers
+    SYNCHRONOUS_MODES = {0: 'OFF', 1: 'NORMAL', 2: 'FULL', 3: 'EXTRA'}
+    TEMP_STORE_MODES = {0: 'DEFAULT', 1: 'FILE', 2: 'MEMORY'}
+    
+    # Schema migrations in order; PRAGMA user_version counts those applied
+    MIGRATIONS = (
+        '_migrate_session_indexes',
+        '_migrate_daily_rollup',
+        '_migrate_epoch_timestamps',
+        '_migrate_covering_game_index',
+        '_migrate_users',
+        '_migrate_keyset_index',
+        '_migrate_score_histogram',
+        '_migrate_attempts',
+    )
+    
+    # Sessions recorded before users existed belong to this user
+    DEFAULT_USER_ID = 1
+    
+    # Score histogram bucket width; scores are awarded in steps of 10
+    # (10 per level), so each bucket holds one score and percentiles are exact
+    SCORE_BUCKET_WIDTH = 10
+    
+    # Rounds an AttemptBuffer holds before appending them in one executemany
+    ATTEMPT_FLUSH_ROUNDS = 50
+    
+    # Sessions per record_sessions() INSERT statement, within SQLite's
+    # historical limit of 999 parameters
+    SESSION_INSERT_ROWS = 99
+    _SESSION_VALUES = '(?, ?, ?, ?, ?, ?, ?, ?, ?, ?)'
+    
+    # multi_process write transactions retry BEGIN IMMEDIATE and COMMIT this
+    # many times once busy_timeout has run out, sleeping a random time up to
+    # an exponentially growing cap so competing writers spread out
+    WRITE_RETRIES = 8
+    RETRY_BASE_DELAY = 0.01
+    RETRY_MAX_DELAY = 1.0
+    
+    # statistics columns recomputed by rebuild_statistics() and checked by verify_statistics()
+    STATISTICS_COLUMNS = ('sessions_played', 'best_score', 'total_score', 'best_level',
+                          'total_correct', 'total_attempts', 'last_played')
+    
+    # Public methods enable_profiling() leaves alone: context managers,
+    # lifecycle and the profiling API itself
+    UNPROFILED = frozenset({'get_connection', 'read_connection', 'close',
+                            'enable_profiling', 'disable_profiling', 'profile_stats',
+                            'slow_queries', 'explain'})
+    
+    def __init__(self, db_file: str = 'memory_stats.db', profile: str = 'balanced',
+                 archive_file: Optional[str] = None, snapshot_reads: bool = False,
+                 busy_timeout: float = 5.0, multi_process: bool = False,
+                 hybrid: bool = False, snapshot_interval: float = 30.0):
+        """Initialize database connection.
+        
+        ``profile`` names one of ``Config.DB_PROFILES`` and sets the pragmas
+        applied to every connection. ``archive_file`` enables the cold
+        archive tier: it is attached to every connection as ``archive`` and
+        receives old sessions from archive_sessions(). ``snapshot_reads``
+        serves statistics, history and achievement reads from read-only
+        connections (file databases only; see read_connection()).
+        
+        ``busy_timeout`` is how many seconds a connection waits for a lock
+        held by another connection. ``multi_process`` is for several
+        processes writing the same file: write blocks take the write lock
+        up front with BEGIN IMMEDIATE, and acquiring it or committing is
+        retried with jittered backoff when the timeout runs out.
+        
+        ``hybrid`` keeps the working set in memory: ``db_file`` is loaded
+        into an in-memory database at startup, and a DiskSnapshotter
+        writes it back every ``snapshot_interval`` seconds when it has
+        changed and again on close(), so writes cost no disk I/O and at
+        most that many seconds of data are at risk.
+        """
+        if profile not in Config.DB_PROFILES:
+            raise ValueError(f"Unknown database profile '{profile}', "
+                             f"expected one of {sorted(Config.DB_PROFILES)}")
         self.db_file = db_file
+        self.profile = profile
+        self.archive_file = archive_file
+        self.hybrid = hybrid and db_file != ':memory:'
+        in_memory = db_file == ':memory:' or self.hybrid
+        self.snapshot_reads = snapshot_reads and not in_memory
+        self.busy_timeout = busy_timeout
+        self.multi_process = multi_process and not in_memory
         # Keep persistent connection for in-memory databases
         self._persistent_conn = None
-        if db_file == ':memory:':
-            self._persistent_conn = sqlite3.connect(db_file)
-            self._persistent_conn.row_factory = sqlite3.Row
+        # File databases keep one open connection per thread
+        self._local = threading.local()
+        self._connections: List[sqlite3.Connection] = []
+        self._connections_lock = threading.Lock()
+        # Threads take turns on the single in-memory connection
+        self._persistent_lock = threading.RLock()
+        self.writer: Optional['SessionWriter'] = None
+        self.user_store: Optional['UserDataStore'] = None
+        self.backups: Optional['BackupManager'] = None
+        self.snapshotter: Optional['DiskSnapshotter'] = None
+        self.archiver: Optional[threading.Thread] = None
+        self._archive_stop = threading.Event()
+        self.profiler: Optional['QueryProfiler'] = None
+        # Reads and writes act on this user's data; see set_user()
+        self.user_id = self.DEFAULT_USER_ID
+        # One evaluator per user, loaded on first use; dropped whenever a transaction rolls back
+        self._achievements: Dict[int, 'AchievementEvaluator'] = {}
+        # Unreported unlocks of dropped evaluators, handed to the reloaded ones
+        self._pending_unlocks: Dict[int, List[str]] = {}
+        self._achievements_lock = threading.RLock()
+        # Read cache entries are (generation, rows); any committed write bumps the generation
+        self._generation = 0
+        self._read_cache: Dict[Tuple, Tuple[int, List[sqlite3.Row]]] = {}
+        self._cache_lock = threading.Lock()
+        self._cache_hits = 0
+        self._cache_misses = 0
+        if in_memory:
+            self._persistent_conn = self._connect()
+        if self.hybrid:
+            self._load_snapshot()
         self.init_database()
+        if self.hybrid:
+            self.snapshotter = DiskSnapshotter(self, interval=snapshot_interval)
+    
+    def __enter__(self) -> 'Database':
+        return self
+    
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        self.close()
+    
+    def _connect(self) -> sqlite3.Connection:
+        """Open a new connection configured for this database."""
+        # close() may run on a different thread than the one that opened it
+        conn = sqlite3.connect(':memory:' if self.hybrid else self.db_file,
+                               timeout=self.busy_timeout, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        for pragma, value in Config.DB_PROFILES[self.profile].items():
+            conn.execute(f'PRAGMA {pragma} = {value}')
+        if self.archive_file:
+            conn.execute('ATTACH DATABASE ? AS archive', (self.archive_file,))
+        if self.profiler:
+            conn.set_trace_callback(self.profiler.trace)
+        return conn
+    
+    def _load_snapshot(self) -> None:
+        """Copy db_file, if it exists, into the in-memory database of a hybrid instance."""
+        if not os.path.exists(self.db_file):
+            return
+        source = sqlite3.connect(self.db_file, timeout=self.busy_timeout)
+        try:
+            source.backup(self._persistent_conn)
+        finally:
+            source.close()
+    
+    def _thread_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's connection, opening it on first use."""
+        conn = getattr(self._local, 'conn', None)
+        if conn is None:
+            conn = self._connect()
+            self._local.conn = conn
+            self._track_connection(conn)
+        return conn
+    
+    def _read_only_connection(self) -> sqlite3.Connection:
+        """Return the calling thread's read-only connection, opening it on first use."""
+        conn = getattr(self._local, 'read_conn', None)
+        if conn is None:
+            from pathlib import Path
+            
+            conn = sqlite3.connect(Path(self.db_file).resolve().as_uri() + '?mode=ro',
+                                   uri=True, timeout=self.busy_timeout,
+                                   check_same_thread=False)
+            conn.row_factory = sqlite3.Row
+            # Only the read-side pragmas; journal mode and sync belong to writers
+            for pragma in ('cache_size', 'mmap_size', 'temp_store'):
+                value = Config.DB_PROFILES[self.profile].get(pragma)
+                if value is not None:
+                    conn.execute(f'PRAGMA {pragma} = {value}')
+            if self.archive_file:
+                conn.execute('ATTACH DATABASE ? AS archive',
+                             (Path(self.archive_file).resolve().as_uri() + '?mode=ro',))
+            if self.profiler:
+                conn.set_trace_callback(self.profiler.trace)
+            self._local.read_conn = conn
+            self._track_connection(conn)
+        return conn
+    
+    def _track_connection(self, conn: sqlite3.Connection) -> None:
+        """Keep conn for close(), and close it as soon as the calling thread exits."""
+        with self._connections_lock:
+            self._connections.append(conn)
+        owner = getattr(self._local, 'owner', None)
+        if owner is None:
+            owner = self._local.owner = _ThreadOwner()
+        # The finalizer must not reference self, or a live thread would keep the database alive
+        weakref.finalize(owner, _release_connection, self._connections,
+                         self._connections_lock, conn)
+    
+    @contextmanager
+    def read_connection(self):
+        """Context manager for connections that only read.
+        
+        With snapshot_reads, this is the thread's ``mode=ro`` connection
+        and the block runs in one read transaction, so every query in it
+        sees the same committed snapshot. Under WAL such readers neither
+        wait for nor hold up a writer, including an import, backup or bulk
+        insert running on the same thread. Otherwise it is get_connection().
+        """
+        if not self.snapshot_reads:
+            with self.get_connection() as conn:
+                yield conn
+            return
+        
+        conn = self._read_only_connection()
+        if conn.in_transaction:
+            # Nested read on the same thread: reuse the open snapshot
+            yield conn
+            return
+        conn.execute('BEGIN')
+        try:
+            yield conn
+        finally:
+            conn.rollback()
     
     @contextmanager
-    def get_connection(self):
-        """Context manager for database connections."""
+    def get_connection(self, write: bool = False):
+        """Context manager for database connections.
+        
+        Blocks that modify data pass write=True so that cached reads are
+        invalidated once the transaction commits; with multi_process they
+        also start with BEGIN IMMEDIATE, so reads inside the block cannot
+        go stale before its first write.
+        """
         # Use persistent connection for in-memory databases
         if self._persistent_conn:
-            try:
-                yield self._persistent_conn
-                self._persistent_conn.commit()
-            except Exception as e:
-                self._persistent_conn.rollback()
-                raise e
+            with self._persistent_lock:
+                yield from self._transaction(self._persistent_conn, write)
         else:
-            conn = sqlite3.connect(self.db_file)
-            conn.row_factory = sqlite3.Row
+            yield from self._transaction(self._thread_connection(), write)
+    
+    def _transaction(self, conn: sqlite3.Connection, write: bool):
+        """Commit on success and bump the write generation, or roll back on error."""
+        local = self._local
+        if getattr(local, 'depth', 0):
+            # Nested block on the same connection: the outermost one commits, and
+            # bumps the generation if any block inside it wrote
+            local.wrote = local.wrote or write
+            local.depth += 1
             try:
                 yield conn
-                conn.commit()
-            except Exception as e:
-                conn.rollback()
-                raise e
             finally:
-                conn.close()
+                local.depth -= 1
+            return
+        immediate = write and self.multi_process
+        if immediate:
+            self._retry_busy(conn.execute, 'BEGIN IMMEDIATE')
+            self._check_data_version(conn)
+        local.depth = 1
+        local.wrote = write
+        try:
+            yield conn
+            if immediate:
+                # A busy COMMIT leaves the transaction open, so it can be retried
+                self._retry_busy(conn.commit)
+            else:
+                conn.commit()
+        except Exception as e:
+            conn.rollback()
+            self._drop_evaluators()
+            raise e
+        finally:
+            local.depth = 0
+        if local.wrote:
+            with self._cache_lock:
+                self._generation += 1
+    
+    def _check_data_version(self, conn: sqlite3.Connection) -> None:
+        """Drop the read cache and achievement counters if another connection has committed.
+        
+        PRAGMA data_version changes whenever a different connection commits
+        to the file, so multi_process instances see each other's writes
+        instead of serving and building on stale in-memory state.
+        """
+        version = conn.execute('PRAGMA data_version').fetchone()[0]
+        if version == getattr(self._local, 'data_version', None):
+            return
+        self._local.data_version = version
+        with self._cache_lock:
+            self._generation += 1
+        self._drop_evaluators()
+    
+    def _retry_busy(self, operation: Callable, *args) -> Any:
+        """Run operation, retrying with jittered exponential backoff while the database is locked."""
+        for attempt in range(self.WRITE_RETRIES + 1):
+            try:
+                return operation(*args)
+            except sqlite3.OperationalError as e:
+                if attempt == self.WRITE_RETRIES or not is_busy_error(e):
+                    raise
+            time.sleep(random.uniform(0, min(self.RETRY_MAX_DELAY,
+                                             self.RETRY_BASE_DELAY * 2 ** attempt)))
+    
+    def close(self) -> None:
+        """Close every open connection.
+        
+        File databases reopen a connection on the next call, so closing is
+        safe at any point. In-memory databases lose their contents and
+        cannot be used afterwards; hybrid ones are saved to disk first.
+        """
+        if self.archiver:
+            self._archive_stop.set()
+            self.archiver.join()
+            self.archiver = None
+        if self.writer:
+            self.writer.close()
+            self.writer = None
+        if self.user_store:
+            self.user_store.close()
+            self.user_store = None
+        if self.snapshotter:
+            self.snapshotter.close()
+            self.snapshotter = None
+        if self.backups:
+            self.backups.close()
+            self.backups = None
+        with self._connections_lock:
+            connections, self._connections = self._connections, []
+        # Dropping this thread's owner runs its finalizers, which take the lock
+        self._local = threading.local()
+        for conn in connections:
+            conn.close()
+        if self._persistent_conn:
+            self._persistent_conn.close()
+    
+    def get_pragmas(self) -> Dict[str, Any]:
+        """Report the pragmas in effect on the calling thread's connection."""
+        with self.get_connection() as conn:
+            synchronous = conn.execute('PRAGMA synchronous').fetchone()[0]
+            temp_store = conn.execute('PRAGMA temp_store').fetchone()[0]
+            return {
+                'profile': self.profile,
+                'journal_mode': conn.execute('PRAGMA journal_mode').fetchone()[0].upper(),
+                'synchronous': self.SYNCHRONOUS_MODES.get(synchronous, synchronous),
+                'cache_size': conn.execute('PRAGMA cache_size').fetchone()[0],
+                'mmap_size': conn.execute('PRAGMA mmap_size').fetchone()[0],
+                'temp_store': self.TEMP_STORE_MODES.get(temp_store, temp_store)
+            }
     
     def init_database(self) -> None:
         """Create database tables if they don't exist."""
-        with self.get_connection() as conn:
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
             # Sessions table
@@ -87,7 +535,7 @@ class Database:
                 )
             ''')
             
-            # User preferences (for multi-user support in future)
+            # User preferences
             cursor.execute('''
                 CREATE TABLE IF NOT EXISTS user_data (
                     key TEXT PRIMARY KEY,
@@ -107,331 +555,2421 @@ class Database:
                 )
             ''')
             
+            if self.archive_file:
+                self._init_archive(cursor)
+            
+            self._migrate(cursor)
             conn.commit()
     
+    def _init_archive(self, cursor: sqlite3.Cursor) -> None:
+        """Create the archived sessions table; rows keep their original ids."""
+        self._create_sessions_table(cursor, 'archive')
+        self._convert_session_timestamps(cursor, 'archive')
+        self._add_session_user_column(cursor, 'archive')
+        self._create_session_indexes(cursor, 'archive')
+    
+    def _create_sessions_table(self, cursor: sqlite3.Cursor, schema: str,
+                               name: str = 'sessions') -> None:
+        """Create a sessions table with epoch-millisecond times.
+        
+        user_id comes last, where _add_session_user_column puts it on older
+        tables, so hot and archived rows always line up for SELECT *.
+        """
+        cursor.execute(f'''
+            CREATE TABLE IF NOT EXISTS {schema}.{name} (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                game_type TEXT NOT NULL,
+                score INTEGER NOT NULL,
+                level_reached INTEGER NOT NULL,
+                correct_answers INTEGER DEFAULT 0,
+                total_attempts INTEGER DEFAULT 0,
+                duration_seconds INTEGER DEFAULT 0,
+                practice_mode BOOLEAN DEFAULT 0,
+                ts_ms INTEGER,
+                local_day INTEGER,
+                user_id INTEGER NOT NULL DEFAULT {self.DEFAULT_USER_ID}
+            )
+        ''')
+    
+    def _add_session_user_column(self, cursor: sqlite3.Cursor, schema: str) -> None:
+        """Add user_id to a sessions table from before users; existing rows get the default user."""
+        columns = [row['name'] for row in cursor.execute(f'PRAGMA {schema}.table_info(sessions)')]
+        if 'user_id' not in columns:
+            # Only the schema changes: rows are not rewritten, they read the default
+            cursor.execute(f'''
+                ALTER TABLE {schema}.sessions
+                ADD COLUMN user_id INTEGER NOT NULL DEFAULT {self.DEFAULT_USER_ID}
+            ''')
+    
+    def _create_session_indexes(self, cursor: sqlite3.Cursor, schema: str) -> None:
+        """Index a sessions table for the per-user and time range queries."""
+        cursor.execute(f'DROP INDEX IF EXISTS {schema}.idx_sessions_game_type_ts')
+        cursor.execute(f'DROP INDEX IF EXISTS {schema}.idx_sessions_game_type_stats')
+        cursor.execute(f'DROP INDEX IF EXISTS {schema}.idx_sessions_user_game')
+        # get_recent_sessions(game_type=...) and session pages: equality on
+        # user and game type, then (ts_ms, id) order for keyset seeks. Also
+        # covers the statistics aggregate, which then groups in index order
+        # instead of sorting every session
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}.idx_sessions_user_game_ts
+            ON sessions (user_id, game_type, ts_ms, id, score, level_reached, correct_answers,
+                         total_attempts)
+        ''')
+        # get_recent_sessions(), session pages and exports: one user's
+        # sessions in (ts_ms, id) order, id being the rowid every index ends with
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}.idx_sessions_user_ts
+            ON sessions (user_id, ts_ms)
+        ''')
+        # Archiving: covers the time range scan across all users
+        cursor.execute(f'''
+            CREATE INDEX IF NOT EXISTS {schema}.idx_sessions_ts
+            ON sessions (ts_ms, score, level_reached)
+        ''')
+    
+    def _convert_session_timestamps(self, cursor: sqlite3.Cursor, schema: str) -> None:
+        """Rewrite a sessions table with a text timestamp column in a single pass.
+        
+        Text timestamps are UTC, as CURRENT_TIMESTAMP wrote them. The table
+        is copied into the new layout and renamed over the old one, keeping
+        ids and the AUTOINCREMENT counter so archived ids are never reused.
+        """
+        columns = [row['name'] for row in cursor.execute(f'PRAGMA {schema}.table_info(sessions)')]
+        if 'timestamp' not in columns:
+            return
+        
+        sequence = cursor.execute(f'''
+            SELECT seq FROM {schema}.sqlite_sequence WHERE name = 'sessions'
+        ''').fetchone()
+        self._create_sessions_table(cursor, schema, 'sessions_v3')
+        cursor.execute(f'''
+            INSERT INTO {schema}.sessions_v3
+            (id, game_type, score, level_reached, correct_answers, total_attempts,
+             duration_seconds, practice_mode, ts_ms, local_day)
+            SELECT id, game_type, score, level_reached, correct_answers, total_attempts,
+                   duration_seconds, practice_mode,
+                   CAST(ROUND((julianday(timestamp) - 2440587.5) * 86400000) AS INTEGER),
+                   CAST(strftime('%Y%m%d', timestamp, 'localtime') AS INTEGER)
+            FROM {schema}.sessions
+        ''')
+        cursor.execute(f'DROP TABLE {schema}.sessions')
+        cursor.execute(f'ALTER TABLE {schema}.sessions_v3 RENAME TO sessions')
+        if sequence:
+            cursor.execute(f'''
+                UPDATE {schema}.sqlite_sequence SET seq = MAX(seq, ?) WHERE name = 'sessions'
+            ''', (sequence[0],))
+    
+    def _sessions_source(self, include_archive: bool = True) -> str:
+        """Return the sessions table, or a UNION ALL of hot and archived sessions."""
+        if include_archive and self.archive_file:
+            return '(SELECT * FROM main.sessions UNION ALL SELECT * FROM archive.sessions)'
+        return 'main.sessions'
+    
+    def _migrate(self, cursor: sqlite3.Cursor) -> None:
+        """Apply any schema migrations the database has not seen yet."""
+        version = cursor.execute('PRAGMA user_version').fetchone()[0]
+        for target in range(version, len(self.MIGRATIONS)):
+            getattr(self, self.MIGRATIONS[target])(cursor)
+            cursor.execute(f'PRAGMA user_version = {target + 1}')
+    
+    def _migrate_session_indexes(self, cursor: sqlite3.Cursor) -> None:
+        """Formerly indexed the text timestamp column.
+        
+        Superseded by _migrate_epoch_timestamps, which drops that column and
+        indexes ts_ms instead; kept so user_version numbering stays stable.
+        """
+    
+    def _migrate_daily_rollup(self, cursor: sqlite3.Cursor) -> None:
+        """Formerly added daily_rollup keyed by UTC date text.
+        
+        Superseded by _migrate_epoch_timestamps, which creates it keyed by
+        local day; kept so user_version numbering stays stable.
+        """
+    
+    def _migrate_epoch_timestamps(self, cursor: sqlite3.Cursor) -> None:
+        """Store session times as epoch milliseconds plus a local YYYYMMDD day.
+        
+        Written against the single-user layout; _migrate_users then adds
+        the user keys and the session indexes.
+        """
+        self._convert_session_timestamps(cursor, 'main')
+        
+        # Per-day, per-game totals backing get_session_history
+        cursor.execute('DROP TABLE IF EXISTS daily_rollup')
+        cursor.execute('''
+            CREATE TABLE daily_rollup (
+                local_day INTEGER NOT NULL,
+                game_type TEXT NOT NULL,
+                sessions INTEGER DEFAULT 0,
+                score_sum INTEGER DEFAULT 0,
+                max_level INTEGER DEFAULT 0,
+                correct_sum INTEGER DEFAULT 0,
+                attempts_sum INTEGER DEFAULT 0,
+                PRIMARY KEY (local_day, game_type)
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            INSERT INTO daily_rollup
+            SELECT local_day, game_type, COUNT(*), SUM(score), MAX(level_reached),
+                   SUM(correct_answers), SUM(total_attempts)
+            FROM {self._sessions_source()}
+            WHERE local_day IS NOT NULL
+            GROUP BY local_day, game_type
+        ''')
+        # statistics.last_played becomes epoch milliseconds too
+        cursor.execute('DELETE FROM statistics')
+        cursor.execute(f'''
+            INSERT INTO statistics
+            SELECT game_type, COUNT(*), MAX(score), SUM(score), MAX(level_reached),
+                   SUM(correct_answers), SUM(total_attempts), MAX(ts_ms)
+            FROM {self._sessions_source()}
+            GROUP BY game_type
+        ''')
+    
+    def _migrate_covering_game_index(self, cursor: sqlite3.Cursor) -> None:
+        """Formerly replaced the (game_type, ts_ms) index with a covering one.
+        
+        Superseded by _migrate_users, which indexes sessions by user; kept
+        so user_version numbering stays stable.
+        """
+    
+    def _migrate_users(self, cursor: sqlite3.Cursor) -> None:
+        """Add users and key every per-user table by user_id.
+        
+        Existing data is given to the default user. Sessions only gain a
+        column, so large tables are not rewritten; the small tables are
+        copied into layouts whose primary keys lead with user_id.
+        """
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS users (
+                id INTEGER PRIMARY KEY,
+                name TEXT NOT NULL UNIQUE,
+                created_ms INTEGER
+            )
+        ''')
+        cursor.execute('INSERT OR IGNORE INTO users (id, name, created_ms) VALUES (?, ?, ?)',
+                       (self.DEFAULT_USER_ID, 'default', epoch_ms()))
+        
+        self._add_session_user_column(cursor, 'main')
+        self._create_session_indexes(cursor, 'main')
+        
+        self._rekey_by_user(cursor, 'statistics', '''
+            game_type TEXT NOT NULL,
+            sessions_played INTEGER DEFAULT 0,
+            best_score INTEGER DEFAULT 0,
+            total_score INTEGER DEFAULT 0,
+            best_level INTEGER DEFAULT 0,
+            total_correct INTEGER DEFAULT 0,
+            total_attempts INTEGER DEFAULT 0,
+            last_played INTEGER
+        ''', 'game_type')
+        self._rekey_by_user(cursor, 'achievements', '''
+            achievement_id TEXT NOT NULL,
+            unlocked_at DATETIME DEFAULT CURRENT_TIMESTAMP,
+            progress INTEGER DEFAULT 0
+        ''', 'achievement_id')
+        self._rekey_by_user(cursor, 'user_data', '''
+            key TEXT NOT NULL,
+            value TEXT,
+            updated_at DATETIME DEFAULT CURRENT_TIMESTAMP
+        ''', 'key')
+        self._rekey_by_user(cursor, 'daily_challenges', '''
+            date TEXT NOT NULL,
+            game_type TEXT NOT NULL,
+            target_level INTEGER NOT NULL,
+            completed BOOLEAN DEFAULT 0,
+            score INTEGER DEFAULT 0
+        ''', 'date')
+        self._rekey_by_user(cursor, 'daily_rollup', '''
+            local_day INTEGER NOT NULL,
+            game_type TEXT NOT NULL,
+            sessions INTEGER DEFAULT 0,
+            score_sum INTEGER DEFAULT 0,
+            max_level INTEGER DEFAULT 0,
+            correct_sum INTEGER DEFAULT 0,
+            attempts_sum INTEGER DEFAULT 0
+        ''', 'local_day, game_type')
+    
+    def _migrate_keyset_index(self, cursor: sqlite3.Cursor) -> None:
+        """Order the per-user game index by (ts_ms, id) for session pages."""
+        self._create_session_indexes(cursor, 'main')
+    
+    def _migrate_score_histogram(self, cursor: sqlite3.Cursor) -> None:
+        """Add per-user, per-game score histograms backing get_score_percentile."""
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS score_histogram (
+                user_id INTEGER NOT NULL,
+                game_type TEXT NOT NULL,
+                bucket INTEGER NOT NULL,
+                sessions INTEGER DEFAULT 0,
+                PRIMARY KEY (user_id, game_type, bucket)
+            ) WITHOUT ROWID
+        ''')
+        self._rebuild_score_histogram(cursor)
+    
+    def _migrate_attempts(self, cursor: sqlite3.Cursor) -> None:
+        """Add the attempts table for round-level results."""
+        # A plain rowid table appended in id order, so batches land on the
+        # last pages; heavy users add hundreds of thousands of rows a month
+        cursor.execute('''
+            CREATE TABLE IF NOT EXISTS attempts (
+                id INTEGER PRIMARY KEY,
+                user_id INTEGER NOT NULL,
+                session_id INTEGER,
+                game_type TEXT NOT NULL,
+                level INTEGER NOT NULL,
+                prompt TEXT,
+                answer TEXT,
+                correct BOOLEAN NOT NULL,
+                response_ms INTEGER,
+                ts_ms INTEGER NOT NULL
+            )
+        ''')
+        # get_attempts(): a user's rounds newest first, and one session's rounds
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_attempts_user_ts ON attempts (user_id, ts_ms)
+        ''')
+        cursor.execute('''
+            CREATE INDEX IF NOT EXISTS idx_attempts_session ON attempts (session_id)
+        ''')
+    
+    def _rekey_by_user(self, cursor: sqlite3.Cursor, table: str, columns: str,
+                       key: str) -> None:
+        """Copy a table into a layout keyed by (user_id, ``key``) under the default user."""
+        names = ', '.join(row['name'] for row in cursor.execute(f'PRAGMA table_info({table})'))
+        cursor.execute(f'''
+            CREATE TABLE {table}_v5 (
+                user_id INTEGER NOT NULL,
+                {columns.strip()},
+                PRIMARY KEY (user_id, {key})
+            ) WITHOUT ROWID
+        ''')
+        cursor.execute(f'''
+            INSERT INTO {table}_v5 (user_id, {names})
+            SELECT ?, {names} FROM {table}
+        ''', (self.DEFAULT_USER_ID,))
+        cursor.execute(f'DROP TABLE {table}')
+        cursor.execute(f'ALTER TABLE {table}_v5 RENAME TO {table}')
+    
+    def add_user(self, name: str) -> int:
+        """Add a trainee and return their user id; a name already taken returns its id."""
+        with self.get_connection(write=True) as conn:
+            conn.execute('INSERT OR IGNORE INTO users (name, created_ms) VALUES (?, ?)',
+                         (name, epoch_ms()))
+            return conn.execute('SELECT id FROM users WHERE name = ?', (name,)).fetchone()[0]
+    
+    def get_users(self) -> List[Dict]:
+        """List every user as {'id', 'name', 'created_ms'}, in id order."""
+        return [dict(row) for row in
+                self._cached_query('SELECT id, name, created_ms FROM users ORDER BY id')]
+    
+    def set_user(self, user_id: int) -> None:
+        """Make ``user_id`` the user that later reads and writes act on.
+        
+        Unflushed user data is written for the previous user first, and an
+        open user data store is reloaded with the new user's values. Raises
+        ValueError for an unknown id.
+        """
+        with self.get_connection() as conn:
+            if conn.execute('SELECT 1 FROM users WHERE id = ?', (user_id,)).fetchone() is None:
+                raise ValueError(f'Unknown user id {user_id}')
+        if self.user_store:
+            self.user_store.flush()
+        self.user_id = user_id
+        if self.user_store:
+            self.user_store.load()
+    
     def record_session(self, game_type: str, score: int, level: int, 
                       correct: int = 0, total: int = 0, duration: int = 0,
-                      practice_mode: bool = False) -> int:
-        """Record a training session."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+                      practice_mode: bool = False, streak: int = 0) -> int:
+        """Record a training session.
+        
+        Achievements the session earns are unlocked in the same transaction
+        and reported by the next check_achievements() call.
+        """
+        with self.get_connection(write=True) as conn:
+            return self._insert_session(conn.cursor(), self.user_id, game_type, score, level,
+                                        correct, total, duration, practice_mode, streak)
+    
+    def _insert_session(self, cursor: sqlite3.Cursor, user_id: int, game_type: str, score: int,
+                        level: int, correct: int = 0, total: int = 0, duration: int = 0,
+                        practice_mode: bool = False, streak: int = 0) -> int:
+        """Insert a session and update statistics inside the caller's transaction."""
+        with self._achievements_lock:
+            # Load before inserting so the evaluator does not count this session twice
+            evaluator = self._achievement_evaluator(cursor, user_id)
             
             # Insert session
+            now = epoch_ms()
+            today = local_day(now)
             cursor.execute('''
                 INSERT INTO sessions 
-                (game_type, score, level_reached, correct_answers, total_attempts, 
-                 duration_seconds, practice_mode)
-                VALUES (?, ?, ?, ?, ?, ?, ?)
-            ''', (game_type, score, level, correct, total, duration, practice_mode))
+                (user_id, game_type, score, level_reached, correct_answers, total_attempts, 
+                 duration_seconds, practice_mode, ts_ms, local_day)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+            ''', (user_id, game_type, score, level, correct, total, duration, practice_mode,
+                  now, today))
             
             session_id = cursor.lastrowid
             
             # Update statistics
             cursor.execute('''
-                INSERT INTO statistics (game_type, sessions_played, best_score, total_score, 
-                                       best_level, total_correct, total_attempts, last_played)
-                VALUES (?, 1, ?, ?, ?, ?, ?, CURRENT_TIMESTAMP)
-                ON CONFLICT(game_type) DO UPDATE SET
+                INSERT INTO statistics (user_id, game_type, sessions_played, best_score,
+                                        total_score, best_level, total_correct,
+                                        total_attempts, last_played)
+                VALUES (?, ?, 1, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, game_type) DO UPDATE SET
                     sessions_played = sessions_played + 1,
                     best_score = MAX(best_score, ?),
                     total_score = total_score + ?,
                     best_level = MAX(best_level, ?),
                     total_correct = total_correct + ?,
                     total_attempts = total_attempts + ?,
-                    last_played = CURRENT_TIMESTAMP
-            ''', (game_type, score, score, level, correct, total,
+                    last_played = MAX(COALESCE(last_played, 0), excluded.last_played)
+            ''', (user_id, game_type, score, score, level, correct, total, now,
                   score, score, level, correct, total))
             
+            # Update today's rollup
+            cursor.execute('''
+                INSERT INTO daily_rollup (user_id, local_day, game_type, sessions, score_sum,
+                                          max_level, correct_sum, attempts_sum)
+                VALUES (?, ?, ?, 1, ?, ?, ?, ?)
+                ON CONFLICT(user_id, local_day, game_type) DO UPDATE SET
+                    sessions = sessions + 1,
+                    score_sum = score_sum + excluded.score_sum,
+                    max_level = MAX(max_level, excluded.max_level),
+                    correct_sum = correct_sum + excluded.correct_sum,
+                    attempts_sum = attempts_sum + excluded.attempts_sum
+            ''', (user_id, today, game_type, score, level, correct, total))
+            
+            # Count the score in its histogram bucket
+            cursor.execute(f'''
+                INSERT INTO score_histogram (user_id, game_type, bucket, sessions)
+                VALUES (?, ?, ? / {self.SCORE_BUCKET_WIDTH}, 1)
+                ON CONFLICT(user_id, game_type, bucket) DO UPDATE SET
+                    sessions = sessions + 1
+            ''', (user_id, game_type, score))
+            
+            evaluator.observe(game_type, score, level, streak)
+            self._save_achievement_changes(cursor, user_id, evaluator.evaluate(score, streak))
+            
             return session_id
     
-    def get_statistics(self, game_type: Optional[str] = None) -> Dict[str, Any]:
-        """Get statistics for a game or all games."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
+    def record_sessions(self, sessions: Iterable[Dict[str, Any]]) -> int:
+        """Record many training sessions in one transaction.
+        
+        Each session is a dict with the keyword arguments of record_session,
+        plus an optional 'ts_ms' in epoch milliseconds or legacy UTC text
+        'timestamp' (defaults to now) and an optional 'user_id' (defaults to
+        the current user). Statistics, daily rollup and score histogram
+        totals are aggregated per key and upserted once each, and sessions
+        are inserted SESSION_INSERT_ROWS per statement. Returns the number of
+        sessions recorded.
+        """
+        now = epoch_ms()
+        width = self.SCORE_BUCKET_WIDTH
+        users = set()
+        # Totals are summed while the rows are built; grouping the inserted
+        # sessions again in SQL needs a sort for each. Rollup entries are
+        # [sessions, score_sum, max_level, correct_sum, attempts_sum,
+        # best_score, last_played], the last two only for statistics
+        rollup: Dict[Tuple[int, int, str], List[int]] = {}
+        histogram: Dict[Tuple[int, str, int], int] = {}
+        
+        def row(s: Dict[str, Any]) -> Tuple:
+            ts = to_epoch_ms(s.get('ts_ms', s.get('timestamp')))
+            if ts is None:
+                ts = now
+            user_id = s.get('user_id', self.user_id)
+            users.add(user_id)
+            game_type, score, level = s['game_type'], s['score'], s['level']
+            correct, total = s.get('correct', 0), s.get('total', 0)
+            day = local_day(ts)
             
-            if game_type:
-                cursor.execute('''
-                    SELECT * FROM statistics WHERE game_type = ?
-                ''', (game_type,))
-                row = cursor.fetchone()
-                if row:
-                    return dict(row)
-                return {
-                    'sessions_played': 0,
-                    'best_score': 0,
-                    'total_score': 0,
-                    'best_level': 0,
-                    'total_correct': 0,
-                    'total_attempts': 0
-                }
+            totals = rollup.get((user_id, day, game_type))
+            if totals is None:
+                rollup[user_id, day, game_type] = [1, score, level, correct, total, score, ts]
             else:
-                cursor.execute('SELECT * FROM statistics')
-                rows = cursor.fetchall()
-                return {row['game_type']: dict(row) for row in rows}
+                totals[0] += 1
+                totals[1] += score
+                if level > totals[2]:
+                    totals[2] = level
+                totals[3] += correct
+                totals[4] += total
+                if score > totals[5]:
+                    totals[5] = score
+                if ts > totals[6]:
+                    totals[6] = ts
+            bucket = (user_id, game_type, score // width)
+            histogram[bucket] = histogram.get(bucket, 0) + 1
+            
+            return (user_id, game_type, score, level, correct, total, s.get('duration', 0),
+                    s.get('practice_mode', False), ts, day)
+        
+        rows = [row(s) for s in sessions]
+        if not rows:
+            return 0
+        
+        statistics: Dict[Tuple[int, str], List[int]] = {}
+        for (user_id, _, game_type), totals in rollup.items():
+            sessions_played, score_sum, max_level, correct_sum, attempts_sum, best, last = totals
+            stats = statistics.get((user_id, game_type))
+            if stats is None:
+                statistics[user_id, game_type] = [sessions_played, best, score_sum, max_level,
+                                                  correct_sum, attempts_sum, last]
+            else:
+                stats[0] += sessions_played
+                stats[1] = max(stats[1], best)
+                stats[2] += score_sum
+                stats[3] = max(stats[3], max_level)
+                stats[4] += correct_sum
+                stats[5] += attempts_sum
+                stats[6] = max(stats[6], last)
+        
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            
+            # Many rows per INSERT: AUTOINCREMENT updates sqlite_sequence once
+            # per statement, which costs as much as the row itself
+            insert = '''
+                INSERT INTO sessions 
+                (user_id, game_type, score, level_reached, correct_answers, total_attempts, 
+                 duration_seconds, practice_mode, ts_ms, local_day)
+                VALUES 
+            '''
+            size = self.SESSION_INSERT_ROWS
+            full = len(rows) - len(rows) % size
+            cursor.executemany(insert + ', '.join([self._SESSION_VALUES] * size),
+                               (tuple(chain.from_iterable(rows[start:start + size]))
+                                for start in range(0, full, size)))
+            if full < len(rows):
+                cursor.execute(insert + ', '.join([self._SESSION_VALUES] * (len(rows) - full)),
+                               tuple(chain.from_iterable(rows[full:])))
+            count = len(rows)
+            
+            # Update statistics, one upsert per user and game type
+            cursor.executemany('''
+                INSERT INTO statistics (user_id, game_type, sessions_played, best_score,
+                                        total_score, best_level, total_correct,
+                                        total_attempts, last_played)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, game_type) DO UPDATE SET
+                    sessions_played = sessions_played + excluded.sessions_played,
+                    best_score = MAX(best_score, excluded.best_score),
+                    total_score = total_score + excluded.total_score,
+                    best_level = MAX(best_level, excluded.best_level),
+                    total_correct = total_correct + excluded.total_correct,
+                    total_attempts = total_attempts + excluded.total_attempts,
+                    last_played = MAX(COALESCE(last_played, 0), excluded.last_played)
+            ''', [key + tuple(stats) for key, stats in statistics.items()])
+            
+            # Update the rollup for every day the batch touches
+            cursor.executemany('''
+                INSERT INTO daily_rollup (user_id, local_day, game_type, sessions, score_sum,
+                                          max_level, correct_sum, attempts_sum)
+                VALUES (?, ?, ?, ?, ?, ?, ?, ?)
+                ON CONFLICT(user_id, local_day, game_type) DO UPDATE SET
+                    sessions = sessions + excluded.sessions,
+                    score_sum = score_sum + excluded.score_sum,
+                    max_level = MAX(max_level, excluded.max_level),
+                    correct_sum = correct_sum + excluded.correct_sum,
+                    attempts_sum = attempts_sum + excluded.attempts_sum
+            ''', [key + tuple(totals[:5]) for key, totals in rollup.items()])
+            
+            # Update the score histograms
+            cursor.executemany('''
+                INSERT INTO score_histogram (user_id, game_type, bucket, sessions)
+                VALUES (?, ?, ?, ?)
+                ON CONFLICT(user_id, game_type, bucket) DO UPDATE SET
+                    sessions = sessions + excluded.sessions
+            ''', [bucket + (sessions,) for bucket, sessions in histogram.items()])
+            
+            with self._achievements_lock:
+                for user_id in users:
+                    self._drop_evaluators(user_id)
+                    evaluator = self._achievement_evaluator(cursor, user_id)
+                    self._save_achievement_changes(cursor, user_id, evaluator.evaluate())
+            
+            return count
     
-    def get_recent_sessions(self, limit: int = 10, game_type: Optional[str] = None) -> List[Dict]:
-        """Get recent training sessions."""
-        with self.get_connection() as conn:
+    def start_writer(self, max_queue: int = 1000, batch_size: int = 100) -> 'SessionWriter':
+        """Start the background session writer, or return the running one."""
+        if self.writer is None:
+            self.writer = SessionWriter(self, max_queue=max_queue, batch_size=batch_size)
+        return self.writer
+    
+    def record_session_async(self, game_type: str, score: int, level: int,
+                             correct: int = 0, total: int = 0, duration: int = 0,
+                             practice_mode: bool = False, streak: int = 0,
+                             callback: Optional[Callable[['Future'], None]] = None) -> 'Future':
+        """Queue a session for the background writer and return a Future of its id.
+        
+        Starts the writer on first use. ``callback`` runs on the writer
+        thread once the session is committed, so Tk code should hand the
+        result back with ``root.after``.
+        """
+        return self.start_writer().submit(game_type, score, level, correct, total,
+                                          duration, practice_mode, streak, callback=callback)
+    
+    def get_statistics(self, game_type: Optional[str] = None) -> Dict[str, Any]:
+        """Get the current user's statistics for a game or all games."""
+        if game_type:
+            rows = self._cached_query('''
+                SELECT * FROM statistics WHERE user_id = ? AND game_type = ?
+            ''', (self.user_id, game_type))
+            if rows:
+                return dict(rows[0])
+            return {
+                'sessions_played': 0,
+                'best_score': 0,
+                'total_score': 0,
+                'best_level': 0,
+                'total_correct': 0,
+                'total_attempts': 0
+            }
+        else:
+            rows = self._cached_query('SELECT * FROM statistics WHERE user_id = ?',
+                                      (self.user_id,))
+            return {row['game_type']: dict(row) for row in rows}
+    
+    def get_recent_sessions(self, limit: int = 10, game_type: Optional[str] = None,
+                            include_archive: bool = False) -> List[Dict]:
+        """Get the current user's recent training sessions.
+        
+        Only the hot sessions table is read unless ``include_archive`` is set.
+        """
+        source = self._sessions_source(include_archive)
+        with self.read_connection() as conn:
             cursor = conn.cursor()
             
             if game_type:
-                cursor.execute('''
-                    SELECT * FROM sessions 
-                    WHERE game_type = ?
-                    ORDER BY timestamp DESC 
+                cursor.execute(f'''
+                    SELECT * FROM {source} 
+                    WHERE user_id = ? AND game_type = ?
+                    ORDER BY ts_ms DESC 
                     LIMIT ?
-                ''', (game_type, limit))
+                ''', (self.user_id, game_type, limit))
             else:
-                cursor.execute('''
-                    SELECT * FROM sessions 
-                    ORDER BY timestamp DESC 
+                cursor.execute(f'''
+                    SELECT * FROM {source} 
+                    WHERE user_id = ?
+                    ORDER BY ts_ms DESC 
                     LIMIT ?
-                ''', (limit,))
+                ''', (self.user_id, limit))
             
             return [dict(row) for row in cursor.fetchall()]
     
+    def get_session_page(self, after: Optional[Union[str, Tuple[int, int]]] = None,
+                         game_type: Optional[str] = None, page_size: int = 50,
+                         newest_first: bool = True,
+                         include_archive: bool = False) -> Dict[str, Any]:
+        """Read one page of the current user's sessions by keyset.
+        
+        ``after`` is a continuation token from an earlier page or a
+        (ts_ms, id) position, and the page holds the ``page_size`` sessions
+        past it, newest first unless ``newest_first`` is False; a token
+        carries its own direction. Each page seeks the (user_id, ts_ms)
+        indexes to its position, so it costs the same at any depth, where
+        OFFSET would step over every earlier row. Pass the same game_type
+        and include_archive along with a token.
+        
+        Returns ``{'sessions', 'next', 'previous'}``. ``next`` continues past
+        the last session and is None at the end. ``previous`` reads back
+        from the first session in the opposite direction, so its page lists
+        sessions in reverse; it is None on a first page.
+        """
+        if page_size < 1:
+            raise ValueError('page_size must be at least 1')
+        if isinstance(after, str):
+            ts_ms, session_id, newest_first = decode_page_token(after)
+            after = (ts_ms, session_id)
+        
+        conditions, params = ['user_id = ?'], [self.user_id]
+        if game_type:
+            conditions.append('game_type = ?')
+            params.append(game_type)
+        if after is not None:
+            conditions.append(f"(ts_ms, id) {'<' if newest_first else '>'} (?, ?)")
+            params.extend(after)
+        order = 'DESC' if newest_first else 'ASC'
+        tables = ['main.sessions']
+        if include_archive and self.archive_file:
+            tables.append('archive.sessions')
+        # One SELECT per table, merged in order, so each one seeks its own index
+        select = ' UNION ALL '.join(f"SELECT * FROM {table} WHERE {' AND '.join(conditions)}"
+                                    for table in tables)
+        with self.read_connection() as conn:
+            rows = conn.execute(f'{select} ORDER BY ts_ms {order}, id {order} LIMIT ?',
+                                params * len(tables) + [page_size + 1]).fetchall()
+        
+        sessions = [dict(row) for row in rows[:page_size]]
+        first, last = (sessions[0], sessions[-1]) if sessions else (None, None)
+        return {
+            'sessions': sessions,
+            'next': (encode_page_token(last['ts_ms'], last['id'], newest_first)
+                     if len(rows) > page_size else None),
+            'previous': (encode_page_token(first['ts_ms'], first['id'], not newest_first)
+                         if first and after is not None else None)
+        }
+    
+    def iter_sessions(self, after: Optional[Union[str, Tuple[int, int]]] = None,
+                      game_type: Optional[str] = None, page_size: int = 500,
+                      newest_first: bool = True,
+                      include_archive: bool = False) -> Iterator[Dict]:
+        """Yield the current user's sessions past ``after``, a page at a time.
+        
+        Takes the same arguments as get_session_page() and reads pages of
+        ``page_size`` until the end, each in its own short read, so memory
+        stays bounded and no transaction is held between pages.
+        """
+        token = after
+        while True:
+            page = self.get_session_page(token, game_type, page_size, newest_first,
+                                         include_archive)
+            yield from page['sessions']
+            token = page['next']
+            if token is None:
+                return
+    
+    def get_score_percentile(self, game_type: str, score: int) -> Optional[float]:
+        """Return the percentage of the current user's sessions of a game scoring below ``score``.
+        
+        Answered from score_histogram alone, reading one row per bucket the
+        user has filled rather than any sessions. Scores sharing a bucket
+        (see SCORE_BUCKET_WIDTH) count as ties. Call it before recording
+        the session to compare against earlier runs only. Returns None when
+        the user has no sessions of that game.
+        """
+        with self.read_connection() as conn:
+            below, total = conn.execute(f'''
+                SELECT SUM(CASE WHEN bucket < ? / {self.SCORE_BUCKET_WIDTH} THEN sessions END),
+                       SUM(sessions)
+                FROM score_histogram
+                WHERE user_id = ? AND game_type = ?
+            ''', (score, self.user_id, game_type)).fetchone()
+        if not total:
+            return None
+        return 100.0 * (below or 0) / total
+    
     def get_session_history(self, days: int = 30) -> List[Dict]:
-        """Get session history for the last N days."""
-        with self.get_connection() as conn:
+        """Get the current user's session history for the last N days.
+        
+        Served from daily_rollup, so the cost depends on the number of days
+        rather than the number of sessions. The rollup is kept when sessions
+        are archived, so older ranges include archived sessions. Days are
+        local calendar days, reported as 'YYYY-MM-DD'.
+        """
+        first_day = int((datetime.now() - timedelta(days=days)).strftime('%Y%m%d'))
+        with self.read_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 SELECT 
-                    DATE(timestamp) as date,
-                    COUNT(*) as sessions,
-                    SUM(score) as total_score,
-                    AVG(score) as avg_score,
-                    MAX(level_reached) as max_level
-                FROM sessions
-                WHERE timestamp >= datetime('now', '-' || ? || ' days')
-                GROUP BY DATE(timestamp)
-                ORDER BY date DESC
-            ''', (days,))
+                    printf('%04d-%02d-%02d', local_day / 10000, local_day / 100 % 100,
+                           local_day % 100) as date,
+                    SUM(sessions) as sessions,
+                    SUM(score_sum) as total_score,
+                    CAST(SUM(score_sum) AS REAL) / SUM(sessions) as avg_score,
+                    MAX(max_level) as max_level
+                FROM daily_rollup
+                WHERE user_id = ? AND local_day >= ?
+                GROUP BY local_day
+                ORDER BY local_day DESC
+            ''', (self.user_id, first_day))
             
             return [dict(row) for row in cursor.fetchall()]
     
     def unlock_achievement(self, achievement_id: str, progress: int = 100) -> bool:
-        """Unlock an achievement."""
-        with self.get_connection() as conn:
+        """Unlock an achievement for the current user."""
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT OR REPLACE INTO achievements (achievement_id, progress, unlocked_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (achievement_id, progress))
+                INSERT OR REPLACE INTO achievements (user_id, achievement_id, progress,
+                                                     unlocked_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (self.user_id, achievement_id, progress))
+            
+            self._drop_evaluators(self.user_id)
             
             return cursor.rowcount > 0
     
     def get_achievements(self) -> Dict[str, Dict]:
-        """Get all unlocked achievements."""
+        """Get all of the current user's unlocked achievements."""
+        rows = self._cached_query('''
+            SELECT * FROM achievements WHERE user_id = ? AND unlocked_at IS NOT NULL
+        ''', (self.user_id,))
+        
+        return {row['achievement_id']: {
+            'unlocked_at': row['unlocked_at'],
+            'progress': row['progress']
+        } for row in rows}
+    
+    def get_achievement_progress(self) -> Dict[str, int]:
+        """Get progress (0-100) towards every achievement that has any."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
-            cursor.execute('SELECT * FROM achievements')
-            rows = cursor.fetchall()
-            
-            return {row['achievement_id']: {
-                'unlocked_at': row['unlocked_at'],
-                'progress': row['progress']
-            } for row in rows}
+            cursor.execute('SELECT achievement_id, progress FROM achievements WHERE user_id = ?',
+                           (self.user_id,))
+            return {row['achievement_id']: row['progress'] for row in cursor.fetchall()}
     
     def check_achievements(self, session_data: Dict) -> List[str]:
-        """Check if any achievements should be unlocked based on session data."""
-        from config import config as app_config
-        
-        newly_unlocked = []
-        stats = self.get_statistics()
-        unlocked = self.get_achievements()
-        
-        # Total sessions across all games
-        total_sessions = sum(s.get('sessions_played', 0) for s in stats.values())
+        """Check if any achievements should be unlocked based on session data.
         
-        # Check each achievement
-        for achievement_id, achievement in app_config.ACHIEVEMENTS.items():
-            if achievement_id in unlocked:
-                continue
-            
-            req = achievement['requirement']
-            
-            # Check session count
-            if 'sessions' in req and total_sessions >= req['sessions']:
-                self.unlock_achievement(achievement_id)
-                newly_unlocked.append(achievement_id)
+        Returns the achievements unlocked by sessions recorded since the last
+        call, plus any that the score or streak in session_data earns.
+        """
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
             
-            # Check max level
-            elif 'max_level' in req:
-                max_level = max((s.get('best_level', 0) for s in stats.values()), default=0)
-                if max_level >= req['max_level']:
-                    self.unlock_achievement(achievement_id)
-                    newly_unlocked.append(achievement_id)
-            
-            # Check single score
-            elif 'single_score' in req and session_data.get('score', 0) >= req['single_score']:
-                self.unlock_achievement(achievement_id)
-                newly_unlocked.append(achievement_id)
-            
-            # Check modules played
-            elif 'modules_played' in req and len(stats) >= req['modules_played']:
-                self.unlock_achievement(achievement_id)
-                newly_unlocked.append(achievement_id)
-            
-            # Check streak (would need to track this separately)
-            elif 'streak' in req and session_data.get('streak', 0) >= req['streak']:
-                self.unlock_achievement(achievement_id)
-                newly_unlocked.append(achievement_id)
+            with self._achievements_lock:
+                evaluator = self._achievement_evaluator(cursor, self.user_id)
+                self._save_achievement_changes(cursor, self.user_id, evaluator.evaluate(
+                    session_data.get('score', 0), session_data.get('streak', 0)))
+                newly_unlocked, evaluator.pending = evaluator.pending, []
         
         return newly_unlocked
     
+    def _achievement_evaluator(self, cursor: sqlite3.Cursor,
+                               user_id: int) -> 'AchievementEvaluator':
+        """Return a user's achievement evaluator, loading it on first use."""
+        evaluator = self._achievements.get(user_id)
+        if evaluator is None:
+            evaluator = AchievementEvaluator(Config.ACHIEVEMENTS)
+            evaluator.load(cursor, user_id)
+            # Carried-over unlocks whose transaction rolled back are not reported
+            evaluator.pending = [achievement_id
+                                 for achievement_id in self._pending_unlocks.pop(user_id, [])
+                                 if achievement_id in evaluator.unlocked]
+            self._achievements[user_id] = evaluator
+        return evaluator
+    
+    def _drop_evaluators(self, user_id: Optional[int] = None) -> None:
+        """Drop one user's achievement evaluator, or all of them, to be reloaded on next use.
+        
+        Unlocks not yet reported by check_achievements() are kept for the
+        reloaded evaluator.
+        """
+        with self._achievements_lock:
+            for dropped in ([user_id] if user_id is not None else list(self._achievements)):
+                evaluator = self._achievements.pop(dropped, None)
+                if evaluator is not None and evaluator.pending:
+                    self._pending_unlocks.setdefault(dropped, []).extend(evaluator.pending)
+    
+    def _save_achievement_changes(self, cursor: sqlite3.Cursor, user_id: int,
+                                  changes: List[Tuple[str, int, bool]]) -> None:
+        """Persist (achievement_id, progress, unlocked) changes from a user's evaluator."""
+        if not changes:
+            return
+        cursor.executemany('''
+            INSERT INTO achievements (user_id, achievement_id, progress, unlocked_at)
+            VALUES (?, ?, ?, CASE WHEN ? THEN CURRENT_TIMESTAMP END)
+            ON CONFLICT(user_id, achievement_id) DO UPDATE SET
+                progress = MAX(progress, excluded.progress),
+                unlocked_at = COALESCE(unlocked_at, excluded.unlocked_at)
+        ''', [(user_id,) + change for change in changes])
+    
     def set_user_data(self, key: str, value: Any) -> None:
-        """Store user-specific data."""
-        with self.get_connection() as conn:
+        """Store data for the current user.
+        
+        Goes through the user data store when one is open, so the write is
+        committed by its next flush.
+        """
+        if self.user_store:
+            self.user_store.set(key, value)
+            return
+        
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
-            value_str = json.dumps(value) if not isinstance(value, str) else value
-            
             cursor.execute('''
-                INSERT OR REPLACE INTO user_data (key, value, updated_at)
-                VALUES (?, ?, CURRENT_TIMESTAMP)
-            ''', (key, value_str))
+                INSERT OR REPLACE INTO user_data (user_id, key, value, updated_at)
+                VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+            ''', (self.user_id, key, encode_user_value(value)))
     
     def get_user_data(self, key: str, default: Any = None) -> Any:
-        """Retrieve user-specific data."""
-        with self.get_connection() as conn:
-            cursor = conn.cursor()
-            
-            cursor.execute('SELECT value FROM user_data WHERE key = ?', (key,))
-            row = cursor.fetchone()
-            
-            if row:
-                try:
-                    return json.loads(row['value'])
-                except json.JSONDecodeError:
-                    return row['value']
-            
-            return default
+        """Retrieve data stored for the current user."""
+        if self.user_store:
+            return self.user_store.get(key, default)
+        
+        rows = self._cached_query('SELECT value FROM user_data WHERE user_id = ? AND key = ?',
+                                  (self.user_id, key))
+        
+        if rows:
+            return decode_user_value(rows[0]['value'])
+        
+        return default
+    
+    def open_user_store(self, flush_interval: float = 5.0) -> 'UserDataStore':
+        """Open the in-memory user data store, or return the open one."""
+        if self.user_store is None:
+            self.user_store = UserDataStore(self, flush_interval=flush_interval)
+        return self.user_store
+    
+    def open_attempts(self, game_type: str,
+                      flush_every: Optional[int] = None) -> 'AttemptBuffer':
+        """Start buffering the current user's rounds of one game; see AttemptBuffer."""
+        return AttemptBuffer(self, game_type, flush_every or self.ATTEMPT_FLUSH_ROUNDS)
+    
+    def get_attempts(self, session_id: Optional[int] = None, limit: int = 100) -> List[Dict]:
+        """Get the current user's latest attempts, or every attempt of one session in order."""
+        with self.read_connection() as conn:
+            if session_id is not None:
+                rows = conn.execute('''
+                    SELECT * FROM attempts
+                    WHERE session_id = ? AND user_id = ?
+                    ORDER BY id
+                ''', (session_id, self.user_id)).fetchall()
+            else:
+                rows = conn.execute('''
+                    SELECT * FROM attempts
+                    WHERE user_id = ?
+                    ORDER BY ts_ms DESC
+                    LIMIT ?
+                ''', (self.user_id, limit)).fetchall()
+            return [dict(row) for row in rows]
+    
+    def _cached_query(self, sql: str, params: Tuple = ()) -> List[sqlite3.Row]:
+        """Run a read query, reusing its rows until the next committed write."""
+        if getattr(self._local, 'depth', 0) and not self.snapshot_reads:
+            # Inside a get_connection() block the query may see uncommitted
+            # writes, which must neither be cached nor hidden by the cache
+            with self.read_connection() as conn:
+                return conn.execute(sql, params).fetchall()
+        if self.multi_process:
+            self._check_data_version(self._thread_connection())
+        
+        key = (sql, params)
+        with self._cache_lock:
+            generation = self._generation
+            entry = self._read_cache.get(key)
+            if entry is not None and entry[0] == generation:
+                self._cache_hits += 1
+                return entry[1]
+            self._cache_misses += 1
+        
+        with self.read_connection() as conn:
+            rows = conn.execute(sql, params).fetchall()
+        
+        # Stored under the generation seen before the query, so a write that
+        # lands meanwhile still invalidates it
+        with self._cache_lock:
+            self._read_cache[key] = (generation, rows)
+        return rows
+    
+    def cache_stats(self) -> Dict[str, Any]:
+        """Report read cache hits, misses and hit rate."""
+        with self._cache_lock:
+            lookups = self._cache_hits + self._cache_misses
+            return {
+                'hits': self._cache_hits,
+                'misses': self._cache_misses,
+                'hit_rate': self._cache_hits / lookups if lookups else 0.0,
+                'generation': self._generation,
+                'entries': len(self._read_cache)
+            }
+    
+    def enable_profiling(self, slow_ms: float = 50.0, log_size: int = 100) -> 'QueryProfiler':
+        """Time every public method until disable_profiling().
+        
+        Calls are counted into per-method latency histograms, and calls
+        slower than ``slow_ms`` are kept in a slow log with the SQL they
+        ran (see slow_queries()). Profiling replaces the methods on this
+        instance only; while it is off they are the plain class functions
+        and cost nothing extra.
+        """
+        if self.profiler is None:
+            self.profiler = QueryProfiler(self, slow_ms=slow_ms, log_size=log_size)
+            self.profiler.install()
+        return self.profiler
+    
+    def disable_profiling(self) -> Dict[str, Any]:
+        """Remove the timing wrappers; returns the final profile_stats()."""
+        stats = self.profile_stats()
+        if self.profiler:
+            self.profiler.uninstall()
+            self.profiler = None
+        return stats
+    
+    def profile_stats(self) -> Dict[str, Any]:
+        """Report call counts and latency percentiles per method (empty when off)."""
+        return self.profiler.stats() if self.profiler else {}
+    
+    def slow_queries(self, explain: bool = False) -> List[Dict[str, Any]]:
+        """Return the slow-call log, oldest first.
+        
+        Each entry names the method and its duration and lists the SQL
+        statements it executed. With ``explain``, entries also get
+        ``plans``: the EXPLAIN QUERY PLAN of each statement, captured now
+        against the current schema.
+        """
+        if not self.profiler:
+            return []
+        entries = self.profiler.slow_log_entries()
+        if explain:
+            for entry in entries:
+                entry['plans'] = [self.explain(sql) for sql in entry['sql']]
+        return entries
+    
+    def explain(self, sql: str) -> List[str]:
+        """Return the EXPLAIN QUERY PLAN steps for a statement.
+        
+        Statements without a query plan (BEGIN, COMMIT, PRAGMA, ...) give
+        an empty list.
+        """
+        if sql.lstrip().split(None, 1)[0].upper() not in ('SELECT', 'INSERT', 'UPDATE',
+                                                           'DELETE', 'REPLACE', 'WITH'):
+            return []
+        with self.read_connection() as conn:
+            rows = conn.execute('EXPLAIN QUERY PLAN ' + sql).fetchall()
+        # Rows are (id, parent, notused, detail); indent children under their parent
+        depth = {0: 0}
+        plan = []
+        for node, parent, _, detail in rows:
+            depth[node] = depth.get(parent, 0) + 1
+            plan.append('  ' * (depth[node] - 1) + detail)
+        return plan
     
     def create_daily_challenge(self, date: str, game_type: str, target_level: int) -> None:
-        """Create a daily challenge."""
-        with self.get_connection() as conn:
+        """Create a daily challenge for the current user."""
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
-                INSERT OR REPLACE INTO daily_challenges (date, game_type, target_level)
-                VALUES (?, ?, ?)
-            ''', (date, game_type, target_level))
+                INSERT OR REPLACE INTO daily_challenges (user_id, date, game_type, target_level)
+                VALUES (?, ?, ?, ?)
+            ''', (self.user_id, date, game_type, target_level))
     
     def get_daily_challenge(self, date: str) -> Optional[Dict]:
-        """Get daily challenge for a specific date."""
+        """Get the current user's daily challenge for a specific date."""
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
-                SELECT * FROM daily_challenges WHERE date = ?
-            ''', (date,))
+                SELECT * FROM daily_challenges WHERE user_id = ? AND date = ?
+            ''', (self.user_id, date))
             
             row = cursor.fetchone()
             return dict(row) if row else None
     
     def complete_daily_challenge(self, date: str, score: int) -> None:
-        """Mark daily challenge as completed."""
-        with self.get_connection() as conn:
+        """Mark the current user's daily challenge as completed."""
+        with self.get_connection(write=True) as conn:
             cursor = conn.cursor()
             
             cursor.execute('''
                 UPDATE daily_challenges 
                 SET completed = 1, score = ?
-                WHERE date = ?
-            ''', (score, date))
+                WHERE user_id = ? AND date = ?
+            ''', (score, self.user_id, date))
+    
+    def backup(self, target: str, pages: int = 64, step_sleep: float = 0.005,
+               progress: Optional[Callable[[int, int], None]] = None,
+               include_archive: bool = True, max_restarts: int = 10) -> Dict[str, Any]:
+        """Copy the live database to ``target`` with the SQLite online backup API.
+        
+        WAL files are copied in one step, as WAL readers do not block
+        writers. Otherwise ``pages`` pages are copied per step with a
+        ``step_sleep`` pause in between, so sessions can still be written
+        while a backup runs; after ``max_restarts`` restarts caused by those
+        writes, the copy starts over in one step. The copy is written next
+        to ``target`` and renamed into place when complete.
+        ``progress(copied_pages, total_pages)`` is called after each step.
+        An archive file is copied the same way to
+        ``<target stem>.archive.db`` once the main copy is in place, with
+        progress starting again from zero; its path is returned as
+        ``archive``, None without an archive or with include_archive=False.
+        
+        In-memory and hybrid databases are first copied to a second
+        in-memory database, so writers only wait for that memory copy
+        rather than the whole write to disk.
+        """
+        def on_step(status: int, remaining: int, total: int) -> None:
+            if progress:
+                progress(total - remaining, total)
+            if remaining:
+                time.sleep(step_sleep)
+        
+        partial = target + '.partial'
+        start = time.perf_counter()
+        destination = sqlite3.connect(partial)
+        try:
+            if self._persistent_conn:
+                staged = sqlite3.connect(':memory:')
+                try:
+                    with self._persistent_lock:
+                        self._persistent_conn.backup(staged)
+                    staged.backup(destination, pages=pages, progress=on_step)
+                finally:
+                    staged.close()
+            else:
+                # A connection of its own, so the backup never holds a cached one
+                _backup_file(self.db_file, destination, pages, max_restarts, on_step)
+            page_count = destination.execute('PRAGMA page_count').fetchone()[0]
+        finally:
+            destination.close()
+        os.replace(partial, target)
+        
+        archive_target = None
+        if include_archive and self.archive_file and os.path.exists(self.archive_file):
+            # Copied second: a session archived in between then lands in both
+            # copies, which archive_sessions() repairs, rather than in neither
+            archive_target = os.path.splitext(target)[0] + '.archive.db'
+            partial = archive_target + '.partial'
+            destination = sqlite3.connect(partial)
+            try:
+                _backup_file(self.archive_file, destination, pages, max_restarts, on_step)
+            finally:
+                destination.close()
+            os.replace(partial, archive_target)
+        
+        return {
+            'path': target,
+            'pages': page_count,
+            'bytes': os.path.getsize(target),
+            'archive': archive_target,
+            'duration_s': time.perf_counter() - start
+        }
+    
+    def start_backups(self, backup_dir: str = 'backups', keep: int = 5,
+                      interval: float = 86400.0, **backup_options) -> 'BackupManager':
+        """Start scheduled background backups, or return the running manager."""
+        if self.backups is None:
+            self.backups = BackupManager(self, backup_dir, keep=keep, interval=interval,
+                                         **backup_options)
+        return self.backups
+    
+    def start_archiving(self, older_than_days: int = 365) -> threading.Thread:
+        """Run archive_sessions() on a background thread, or return the running one.
+        
+        close() stops it after the batch in progress.
+        """
+        if self.archiver is None or not self.archiver.is_alive():
+            self._archive_stop.clear()
+            self.archiver = threading.Thread(target=self.archive_sessions, args=(older_than_days,),
+                                             name='SessionArchiver', daemon=True)
+            self.archiver.start()
+        return self.archiver
+    
+    def archive_sessions(self, older_than_days: int = 365, batch_size: int = 5000) -> int:
+        """Move sessions older than ``older_than_days`` into the archive file.
+        
+        Sessions move oldest first, ``batch_size`` per transaction, so the
+        write lock is only held briefly. Statistics and daily_rollup are left
+        untouched since they already count archived sessions. A close()
+        during start_archiving() stops it after the current batch. Returns
+        the number of sessions moved.
+        """
+        if not self.archive_file:
+            raise RuntimeError("No archive file configured for this database")
+        
+        moved = 0
+        cutoff = epoch_ms() - older_than_days * 86_400_000
+        with self.get_connection(write=True) as conn:
+            # Transactions spanning two WAL files are not atomic as a whole;
+            # finish any move interrupted after the archive side committed
+            conn.execute('''
+                DELETE FROM main.sessions
+                WHERE id <= (SELECT MAX(id) FROM archive.sessions)
+                  AND id IN (SELECT id FROM archive.sessions)
+            ''')
+        
+        while True:
+            with self.get_connection(write=True) as conn:
+                boundary = conn.execute('''
+                    SELECT ts_ms, id FROM main.sessions
+                    WHERE ts_ms < ?
+                    ORDER BY ts_ms, id
+                    LIMIT 1 OFFSET ?
+                ''', (cutoff, batch_size - 1)).fetchone()
+                # The last, partial batch takes everything left before the cutoff
+                condition, params = ('ts_ms < ?', (cutoff,))
+                if boundary:
+                    condition, params = ('(ts_ms, id) <= (?, ?)', tuple(boundary))
+                
+                conn.execute(f'''
+                    INSERT OR REPLACE INTO archive.sessions
+                    SELECT * FROM main.sessions WHERE {condition}
+                ''', params)
+                count = conn.execute(f'DELETE FROM main.sessions WHERE {condition}',
+                                     params).rowcount
+            moved += count
+            if not boundary or count == 0 or self._archive_stop.is_set():
+                return moved
     
     def export_data(self) -> Dict[str, Any]:
-        """Export all data for backup."""
+        """Export the current user's data for backup, archived sessions included."""
+        if self.user_store:
+            self.user_store.flush()
+        user_id = self.user_id
         with self.get_connection() as conn:
             cursor = conn.cursor()
             
             data = {
                 'export_date': datetime.now().isoformat(),
-                'sessions': [],
-                'statistics': {},
-                'achievements': {},
-                'user_data': {}
+                'sessions': []
             }
             
             # Export sessions
-            cursor.execute('SELECT * FROM sessions ORDER BY timestamp')
+            cursor.execute(f'''
+                SELECT * FROM {self._sessions_source()} WHERE user_id = ? ORDER BY ts_ms
+            ''', (user_id,))
             data['sessions'] = [dict(row) for row in cursor.fetchall()]
             
-            # Export statistics
-            cursor.execute('SELECT * FROM statistics')
-            data['statistics'] = {row['game_type']: dict(row) for row in cursor.fetchall()}
+            data.update(self._export_small_tables(cursor, user_id))
+            return data
+    
+    def export_stream(self, fp: TextIO, batch_size: int = 1000) -> int:
+        """Write an export_data()-compatible JSON document to a text file object.
+        
+        Sessions are paged with fetchmany and written row by row, so memory
+        use stays bounded however many sessions there are. The whole export
+        reads from one snapshot and includes archived sessions. Like
+        export_data() it covers the current user. Returns the number of
+        sessions written.
+        """
+        if self.user_store:
+            self.user_store.flush()
+        user_id = self.user_id
+        with self.get_connection() as conn:
+            cursor = conn.cursor()
+            if not conn.in_transaction:
+                cursor.execute('BEGIN')
             
-            # Export achievements
-            cursor.execute('SELECT * FROM achievements')
-            data['achievements'] = {row['achievement_id']: dict(row) for row in cursor.fetchall()}
+            fp.write('{"export_date": %s, "sessions": [' % json.dumps(datetime.now().isoformat()))
             
-            # Export user data
-            cursor.execute('SELECT * FROM user_data')
-            for row in cursor.fetchall():
-                try:
-                    data['user_data'][row['key']] = json.loads(row['value'])
-                except json.JSONDecodeError:
-                    data['user_data'][row['key']] = row['value']
+            count = 0
+            cursor.execute(f'''
+                SELECT * FROM {self._sessions_source()} WHERE user_id = ? ORDER BY ts_ms
+            ''', (user_id,))
+            while True:
+                rows = cursor.fetchmany(batch_size)
+                if not rows:
+                    break
+                for row in rows:
+                    fp.write(',\n' if count else '\n')
+                    fp.write(json.dumps(dict(row)))
+                    count += 1
             
-            return data
+            fp.write('\n]')
+            
+            for name, section in self._export_small_tables(cursor, user_id).items():
+                fp.write(', %s: %s' % (json.dumps(name), json.dumps(section)))
+            fp.write('}\n')
+            
+            return count
     
-    def import_data(self, data: Dict[str, Any], merge: bool = True) -> None:
-        """Import data from backup."""
+    def export_pack(self, fp: BinaryIO, codec: str = 'zlib',
+                    chunk_rows: int = 10000) -> Dict[str, int]:
+        """Write a compressed pack backup (see datapack) to a binary file object.
+        
+        The current user's achievements, user data and then sessions,
+        archived ones included, are read from one snapshot and written
+        ``chunk_rows`` rows per compressed frame. Statistics and the daily
+        rollup are derived, so they are left out and rebuilt on import.
+        Returns the row count of each table.
+        """
+        from datapack import PackWriter
+        
+        if self.user_store:
+            self.user_store.flush()
+        user_id = self.user_id
         with self.get_connection() as conn:
             cursor = conn.cursor()
+            if not conn.in_transaction:
+                cursor.execute('BEGIN')
+            
+            session_columns = [row['name'] for row in cursor.execute('PRAGMA table_info(sessions)')]
+            queries = {
+                'achievements': ('''
+                    SELECT achievement_id, unlocked_at, progress FROM achievements
+                    WHERE user_id = ?
+                ''', ['achievement_id', 'unlocked_at', 'progress']),
+                'user_data': ('SELECT key, value FROM user_data WHERE user_id = ?',
+                              ['key', 'value']),
+                'sessions': (f'''
+                    SELECT * FROM {self._sessions_source()} WHERE user_id = ? ORDER BY ts_ms
+                ''', session_columns)
+            }
+            tables = {}
+            for name, (sql, columns) in queries.items():
+                source = self._sessions_source() if name == 'sessions' else name
+                count = cursor.execute(f'SELECT COUNT(*) FROM {source} WHERE user_id = ?',
+                                       (user_id,)).fetchone()[0]
+                tables[name] = {'columns': columns, 'rows': count}
+            
+            writer = PackWriter(fp, tables, codec=codec, chunk_rows=chunk_rows,
+                                schema_version=cursor.execute('PRAGMA user_version').fetchone()[0],
+                                export_date=datetime.now().isoformat())
+            
+            def fetch(sql: str):
+                cursor.execute(sql, (user_id,))
+                while True:
+                    rows = cursor.fetchmany(chunk_rows)
+                    if not rows:
+                        return
+                    yield from rows
+            
+            for name, (sql, _) in queries.items():
+                writer.write_rows(name, fetch(sql))
+            writer.close()
+            
+            return {name: table['rows'] for name, table in tables.items()}
+    
+    def _export_small_tables(self, cursor: sqlite3.Cursor, user_id: int) -> Dict[str, Dict]:
+        """Export a user's statistics, achievements and user data sections."""
+        data: Dict[str, Dict] = {
+            'statistics': {},
+            'achievements': {},
+            'user_data': {}
+        }
+        
+        # Export statistics
+        cursor.execute('SELECT * FROM statistics WHERE user_id = ?', (user_id,))
+        data['statistics'] = {row['game_type']: dict(row) for row in cursor.fetchall()}
+        
+        # Export achievements
+        cursor.execute('SELECT * FROM achievements WHERE user_id = ?', (user_id,))
+        data['achievements'] = {row['achievement_id']: dict(row) for row in cursor.fetchall()}
+        
+        # Export user data
+        cursor.execute('SELECT * FROM user_data WHERE user_id = ?', (user_id,))
+        for row in cursor.fetchall():
+            data['user_data'][row['key']] = decode_user_value(row['value'])
+        
+        return data
+    
+    def import_data(self, data: Dict[str, Any], merge: bool = True, batch_size: int = 5000,
+                    progress: Optional[Callable[[int, Optional[int]], None]] = None) -> int:
+        """Import data from backup into the current user.
+        
+        Sessions are given the current user whichever user exported them,
+        and ``merge=False`` replaces only that user's data. Everything is
+        loaded in one transaction, with sessions inserted
+        ``batch_size`` rows per executemany. ``progress(done, total)`` is
+        called after each batch; total is None when data['sessions'] is an
+        iterator. The backup's statistics block is ignored: statistics are
+        recomputed from the user's sessions once loading is done. Returns
+        the number of sessions imported.
+        """
+        user_id = self.user_id
+        sessions = data.get('sessions', [])
+        total = len(sessions) if hasattr(sessions, '__len__') else None
+        now = epoch_ms()
+        
+        def row(session: Dict[str, Any]) -> Tuple:
+            # Backups from before epoch timestamps carry UTC text 'timestamp'
+            ts = to_epoch_ms(session.get('ts_ms', session.get('timestamp')))
+            if ts is None:
+                ts = now
+            return (user_id, session.get('game_type'), session.get('score'),
+                    session.get('level_reached'), session.get('correct_answers', 0),
+                    session.get('total_attempts', 0), session.get('duration_seconds', 0),
+                    session.get('practice_mode', 0), ts, local_day(ts))
+        
+        rows = map(row, sessions)
+        
+        if self.user_store:
+            self.user_store.flush()
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
             
             if not merge:
-                # Clear existing data
-                cursor.execute('DELETE FROM sessions')
-                cursor.execute('DELETE FROM statistics')
-                cursor.execute('DELETE FROM achievements')
-                cursor.execute('DELETE FROM user_data')
+                # Clear the user's existing data
+                tables = ['main.sessions', 'statistics', 'achievements', 'user_data']
+                if self.archive_file:
+                    tables.append('archive.sessions')
+                for table in tables:
+                    cursor.execute(f'DELETE FROM {table} WHERE user_id = ?', (user_id,))
             
             # Import sessions
-            for session in data.get('sessions', []):
-                cursor.execute('''
+            done = 0
+            while True:
+                batch = list(islice(rows, batch_size))
+                if not batch:
+                    break
+                cursor.executemany('''
                     INSERT INTO sessions 
-                    (game_type, score, level_reached, correct_answers, total_attempts, 
-                     duration_seconds, practice_mode, timestamp)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (session.get('game_type'), session.get('score'), 
-                      session.get('level_reached'), session.get('correct_answers', 0),
-                      session.get('total_attempts', 0), session.get('duration_seconds', 0),
-                      session.get('practice_mode', 0), session.get('timestamp')))
-            
-            # Import statistics
-            for game_type, stats in data.get('statistics', {}).items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO statistics 
-                    (game_type, sessions_played, best_score, total_score, best_level,
-                     total_correct, total_attempts, last_played)
-                    VALUES (?, ?, ?, ?, ?, ?, ?, ?)
-                ''', (game_type, stats.get('sessions_played', 0), stats.get('best_score', 0),
-                      stats.get('total_score', 0), stats.get('best_level', 0),
-                      stats.get('total_correct', 0), stats.get('total_attempts', 0),
-                      stats.get('last_played')))
+                    (user_id, game_type, score, level_reached, correct_answers, total_attempts, 
+                     duration_seconds, practice_mode, ts_ms, local_day)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', batch)
+                done += len(batch)
+                if progress:
+                    progress(done, total)
+            
+            self._rebuild_statistics(cursor, user_id)
+            self._rebuild_daily_rollup(cursor, user_id)
+            self._rebuild_score_histogram(cursor, user_id)
             
             # Import achievements
-            for achievement_id, achievement in data.get('achievements', {}).items():
-                cursor.execute('''
-                    INSERT OR REPLACE INTO achievements (achievement_id, unlocked_at, progress)
-                    VALUES (?, ?, ?)
-                ''', (achievement_id, achievement.get('unlocked_at'), 
-                      achievement.get('progress', 100)))
+            cursor.executemany('''
+                INSERT OR REPLACE INTO achievements (user_id, achievement_id, unlocked_at,
+                                                     progress)
+                VALUES (?, ?, ?, ?)
+            ''', [(user_id, achievement_id, achievement.get('unlocked_at'),
+                   achievement.get('progress', 100))
+                  for achievement_id, achievement in data.get('achievements', {}).items()])
             
             # Import user data
-            for key, value in data.get('user_data', {}).items():
-                value_str = json.dumps(value) if not isinstance(value, str) else value
-                cursor.execute('''
-                    INSERT OR REPLACE INTO user_data (key, value)
-                    VALUES (?, ?)
-                ''', (key, value_str))
+            cursor.executemany('''
+                INSERT OR REPLACE INTO user_data (user_id, key, value)
+                VALUES (?, ?, ?)
+            ''', [(user_id, key, encode_user_value(value))
+                  for key, value in data.get('user_data', {}).items()])
+        
+        self._drop_evaluators(user_id)
+        if self.user_store:
+            self.user_store.load()
+        
+        return done
+    
+    def import_pack(self, fp: BinaryIO, merge: bool = True,
+                    progress: Optional[Callable[[int, Optional[int]], None]] = None) -> int:
+        """Import a pack backup written by export_pack from a binary file object.
+        
+        Frames are decompressed one at a time and fed to import_data, so
+        memory use is bounded by the chunk size. Returns the number of
+        sessions imported.
+        """
+        from datapack import PackError, PackReader
+        
+        reader = PackReader(fp)
+        if reader.header.get('schema_version', 0) > len(self.MIGRATIONS):
+            raise PackError('Pack was written by a newer schema version')
+        
+        data: Dict[str, Any] = {'achievements': {}, 'user_data': {}}
+        frames = reader.frames()
+        # The small tables come first, so they are collected before sessions stream in
+        first_sessions: List[List[Any]] = []
+        for table, rows in frames:
+            if table == 'sessions':
+                first_sessions = rows
+                break
+            columns = reader.columns(table)
+            for row in rows:
+                record = dict(zip(columns, row))
+                if table == 'achievements':
+                    data['achievements'][record['achievement_id']] = record
+                elif table == 'user_data':
+                    data['user_data'][record['key']] = record['value']
+        
+        def sessions():
+            columns = reader.columns('sessions')
+            more = (rows for table, rows in frames if table == 'sessions')
+            for rows in chain([first_sessions], more):
+                for row in rows:
+                    yield dict(zip(columns, row))
+        
+        data['sessions'] = sessions() if 'sessions' in reader.tables else []
+        total = reader.header['tables'].get('sessions', {}).get('rows')
+        return self.import_data(data, merge=merge,
+                                progress=progress and (lambda done, _: progress(done, total)))
+    
+    def rebuild_statistics(self) -> int:
+        """Recompute the statistics table from sessions in one transaction.
+        
+        Every row, for every user, is replaced from a single aggregate pass
+        over sessions, archived ones included, so hand-maintained totals
+        that drifted are corrected. Returns the number of (user, game type)
+        rows.
+        """
+        with self.get_connection(write=True) as conn:
+            cursor = conn.cursor()
+            self._rebuild_statistics(cursor)
+            count = cursor.execute('SELECT COUNT(*) FROM statistics').fetchone()[0]
+        
+        # Achievement counters are seeded from statistics
+        self._drop_evaluators()
+        return count
+    
+    def verify_statistics(self) -> List[Dict[str, Any]]:
+        """Compare the statistics table with a fresh aggregate of sessions.
+        
+        Both are read from one snapshot. Returns one entry per differing
+        value, ``{'user_id', 'game_type', 'column', 'stored', 'expected'}``,
+        with None on the side a row is missing from; an empty list means
+        the table is consistent.
+        """
+        sql, params = self._statistics_select()
+        with self.read_connection() as conn:
+            if not conn.in_transaction:
+                conn.execute('BEGIN')
+            stored = {(row['user_id'], row['game_type']): row
+                      for row in conn.execute('SELECT * FROM statistics')}
+            expected = {(row['user_id'], row['game_type']): row
+                        for row in conn.execute(sql, params)}
+        
+        discrepancies = []
+        for user_id, game_type in sorted(stored.keys() | expected.keys()):
+            have = stored.get((user_id, game_type))
+            want = expected.get((user_id, game_type))
+            for column in self.STATISTICS_COLUMNS:
+                value = have[column] if have else None
+                target = want[column] if want else None
+                if value != target:
+                    discrepancies.append({'user_id': user_id, 'game_type': game_type,
+                                          'column': column, 'stored': value,
+                                          'expected': target})
+        return discrepancies
+    
+    def _statistics_select(self, user_id: Optional[int] = None) -> Tuple[str, Tuple]:
+        """Return a query and its parameters aggregating sessions into statistics rows.
+        
+        There is one row per user and game type, for every user or just
+        ``user_id``. Each sessions table is grouped on its own, so SQLite
+        walks idx_sessions_user_game_ts in order rather than sorting every
+        row; with an archive the two sets of totals are then combined.
+        """
+        where, params = ('', ()) if user_id is None else ('WHERE user_id = ?', (user_id,))
+        aggregate = '''
+            SELECT user_id, game_type, COUNT(*) AS sessions_played, MAX(score) AS best_score,
+                   SUM(score) AS total_score, MAX(level_reached) AS best_level,
+                   SUM(correct_answers) AS total_correct, SUM(total_attempts) AS total_attempts,
+                   MAX(ts_ms) AS last_played
+            FROM {}.sessions
+            {}
+            GROUP BY user_id, game_type
+        '''
+        if not self.archive_file:
+            return aggregate.format('main', where), params
+        return f'''
+            SELECT user_id, game_type, SUM(sessions_played) AS sessions_played,
+                   MAX(best_score) AS best_score, SUM(total_score) AS total_score,
+                   MAX(best_level) AS best_level, SUM(total_correct) AS total_correct,
+                   SUM(total_attempts) AS total_attempts, MAX(last_played) AS last_played
+            FROM ({aggregate.format('main', where)}
+                  UNION ALL {aggregate.format('archive', where)})
+            GROUP BY user_id, game_type
+        ''', params * 2
+    
+    def _rebuild_statistics(self, cursor: sqlite3.Cursor, user_id: Optional[int] = None) -> None:
+        """Recompute statistics, for every user or just ``user_id``, in one aggregate pass."""
+        sql, params = self._statistics_select(user_id)
+        if user_id is None:
+            cursor.execute('DELETE FROM statistics')
+        else:
+            cursor.execute('DELETE FROM statistics WHERE user_id = ?', (user_id,))
+        cursor.execute(f'''
+            INSERT INTO statistics (user_id, game_type, {', '.join(self.STATISTICS_COLUMNS)})
+            {sql}
+        ''', params)
+    
+    def _rebuild_daily_rollup(self, cursor: sqlite3.Cursor,
+                              user_id: Optional[int] = None) -> None:
+        """Recompute daily_rollup, for every user or just ``user_id``, in one aggregate pass."""
+        condition, params = ('', ()) if user_id is None else ('AND user_id = ?', (user_id,))
+        if user_id is None:
+            cursor.execute('DELETE FROM daily_rollup')
+        else:
+            cursor.execute('DELETE FROM daily_rollup WHERE user_id = ?', (user_id,))
+        cursor.execute(f'''
+            INSERT INTO daily_rollup (user_id, local_day, game_type, sessions, score_sum,
+                                      max_level, correct_sum, attempts_sum)
+            SELECT user_id, local_day, game_type, COUNT(*), SUM(score), MAX(level_reached),
+                   SUM(correct_answers), SUM(total_attempts)
+            FROM {self._sessions_source()}
+            WHERE local_day IS NOT NULL {condition}
+            GROUP BY user_id, local_day, game_type
+        ''', params)
+    
+    def _rebuild_score_histogram(self, cursor: sqlite3.Cursor,
+                                 user_id: Optional[int] = None) -> None:
+        """Recompute score_histogram, for every user or just ``user_id``, in one aggregate pass."""
+        condition, params = ('', ()) if user_id is None else ('WHERE user_id = ?', (user_id,))
+        cursor.execute(f'DELETE FROM score_histogram {condition}', params)
+        cursor.execute(f'''
+            INSERT INTO score_histogram (user_id, game_type, bucket, sessions)
+            SELECT user_id, game_type, score / {self.SCORE_BUCKET_WIDTH}, COUNT(*)
+            FROM {self._sessions_source()}
+            {condition}
+            GROUP BY user_id, game_type, score / {self.SCORE_BUCKET_WIDTH}
+        ''', params)
+
+
+class AchievementEvaluator:
+    """In-memory achievement counters, updated in O(1) per recorded session.
+    
+    State is loaded once from the statistics and achievements tables.
+    evaluate() returns (achievement_id, progress, unlocked) rows for the
+    achievements whose progress changed, and queues new unlocks in
+    ``pending`` until check_achievements() reports them.
+    """
+    
+    def __init__(self, definitions: Dict[str, Dict]):
+        """Initialize empty counters for the given achievement definitions."""
+        self.definitions = definitions
+        self.total_sessions = 0
+        self.max_level = 0
+        self.modules_played: set = set()
+        self.best_score = 0
+        self.best_streak = 0
+        self.unlocked: set = set()
+        self.progress: Dict[str, int] = {}
+        self.pending: List[str] = []
+    
+    def load(self, cursor: sqlite3.Cursor, user_id: int) -> None:
+        """Load a user's counters and achievement state from the database."""
+        cursor.execute('''
+            SELECT game_type, sessions_played, best_score, best_level FROM statistics
+            WHERE user_id = ?
+        ''', (user_id,))
+        for row in cursor.fetchall():
+            self.total_sessions += row['sessions_played'] or 0
+            self.max_level = max(self.max_level, row['best_level'] or 0)
+            self.best_score = max(self.best_score, row['best_score'] or 0)
+            self.modules_played.add(row['game_type'])
+        
+        cursor.execute('''
+            SELECT achievement_id, unlocked_at, progress FROM achievements WHERE user_id = ?
+        ''', (user_id,))
+        for row in cursor.fetchall():
+            self.progress[row['achievement_id']] = row['progress'] or 0
+            if row['unlocked_at'] is not None:
+                self.unlocked.add(row['achievement_id'])
+        
+        # Streaks are not stored with sessions: progress = streak * 100 // target,
+        # so the best streak is at least the progress scaled back up, rounded up
+        for achievement_id, achievement in self.definitions.items():
+            target = achievement['requirement'].get('streak')
+            if target:
+                progress = self.progress.get(achievement_id, 0)
+                if achievement_id in self.unlocked:
+                    progress = 100
+                self.best_streak = max(self.best_streak, -(-progress * target // 100))
+    
+    def observe(self, game_type: str, score: int, level: int, streak: int = 0) -> None:
+        """Fold one recorded session into the counters."""
+        self.total_sessions += 1
+        self.max_level = max(self.max_level, level)
+        self.best_score = max(self.best_score, score)
+        self.best_streak = max(self.best_streak, streak)
+        self.modules_played.add(game_type)
+    
+    def evaluate(self, score: int = 0, streak: int = 0) -> List[Tuple[str, int, bool]]:
+        """Compare the counters with every locked achievement's requirement."""
+        changes = []
+        for achievement_id, achievement in self.definitions.items():
+            if achievement_id in self.unlocked:
+                continue
             
-            conn.commit()
+            req = achievement['requirement']
+            if 'sessions' in req:
+                value, target = self.total_sessions, req['sessions']
+            elif 'max_level' in req:
+                value, target = self.max_level, req['max_level']
+            elif 'single_score' in req:
+                value, target = max(self.best_score, score), req['single_score']
+            elif 'modules_played' in req:
+                value, target = len(self.modules_played), req['modules_played']
+            elif 'streak' in req:
+                value, target = max(self.best_streak, streak), req['streak']
+            else:
+                continue
+            
+            progress = min(100, value * 100 // target) if target > 0 else 100
+            if value >= target:
+                self.unlocked.add(achievement_id)
+                self.pending.append(achievement_id)
+                self.progress[achievement_id] = 100
+                changes.append((achievement_id, 100, True))
+            elif progress > self.progress.get(achievement_id, 0):
+                self.progress[achievement_id] = progress
+                changes.append((achievement_id, progress, False))
+        return changes
+
+
+class SessionWriter:
+    """Write-behind queue that records sessions on a dedicated thread.
+    
+    Sessions are queued with submit() and committed in groups of up to
+    ``batch_size`` per transaction. The queue is bounded, so submit()
+    blocks once ``max_queue`` sessions are waiting. Pending sessions are
+    flushed by close(), which also runs at interpreter exit.
+    """
+    
+    _STOP = object()
+    
+    def __init__(self, database: Database, max_queue: int = 1000, batch_size: int = 100):
+        """Start the writer thread."""
+        self.database = database
+        self.batch_size = batch_size
+        self._queue: queue.Queue = queue.Queue(maxsize=max_queue)
+        self._stats_lock = threading.Lock()
+        self._batches = 0
+        self._written = 0
+        self._failed = 0
+        self._last_batch_ms = 0.0
+        self._max_latency_ms = 0.0
+        self._total_latency_ms = 0.0
+        self._closed = False
+        self._thread = threading.Thread(target=self._run, name='SessionWriter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def submit(self, game_type: str, score: int, level: int, correct: int = 0,
+               total: int = 0, duration: int = 0, practice_mode: bool = False,
+               streak: int = 0, callback: Optional[Callable[['Future'], None]] = None) -> 'Future':
+        """Queue a session for the current user; the Future resolves to its session id."""
+        if self._closed:
+            raise RuntimeError('SessionWriter is closed')
+        # Imported here: concurrent.futures pulls in logging, which most callers never need
+        from concurrent.futures import Future
+        
+        future = Future()
+        if callback:
+            future.add_done_callback(callback)
+        # The user is fixed now, so a set_user() before the write lands changes nothing
+        args = (self.database.user_id, game_type, score, level, correct, total, duration,
+                practice_mode, streak)
+        self._queue.put((args, future, time.perf_counter()))
+        return future
+    
+    def flush(self) -> None:
+        """Block until every queued session has been committed."""
+        self._queue.join()
+    
+    def close(self) -> None:
+        """Flush pending sessions and stop the writer thread."""
+        if self._closed:
+            return
+        self._closed = True
+        atexit.unregister(self.close)
+        self._queue.put(self._STOP)
+        self._thread.join()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Report queue depth and flush latency."""
+        with self._stats_lock:
+            return {
+                'queue_depth': self._queue.qsize(),
+                'batches': self._batches,
+                'sessions_written': self._written,
+                'sessions_failed': self._failed,
+                'last_batch_ms': self._last_batch_ms,
+                'max_latency_ms': self._max_latency_ms,
+                'avg_latency_ms': self._total_latency_ms / self._written if self._written else 0.0
+            }
+    
+    def _run(self) -> None:
+        """Drain the queue, committing each group of sessions in one transaction."""
+        while True:
+            batch = [self._queue.get()]
+            while len(batch) < self.batch_size and batch[-1] is not self._STOP:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            
+            stop = batch[-1] is self._STOP
+            # Sessions whose futures were cancelled while queued are dropped
+            items = [item for item in (batch[:-1] if stop else batch)
+                     if item[1].set_running_or_notify_cancel()]
+            try:
+                if items:
+                    self._write(items)
+            finally:
+                for _ in batch:
+                    self._queue.task_done()
+            if stop:
+                return
+    
+    def _write(self, items: List) -> None:
+        """Commit a group of sessions and resolve their futures."""
+        start = time.perf_counter()
+        try:
+            with self.database.get_connection(write=True) as conn:
+                cursor = conn.cursor()
+                results = [self.database._insert_session(cursor, *args) for args, _, _ in items]
+        except Exception as e:
+            if len(items) == 1:
+                with self._stats_lock:
+                    self._failed += 1
+                self._settle(items[0][1], error=e)
+                return
+            # Write one by one so a single bad session only fails itself
+            for item in items:
+                self._write([item])
+            return
+        
+        end = time.perf_counter()
+        with self._stats_lock:
+            self._batches += 1
+            self._written += len(items)
+            self._last_batch_ms = (end - start) * 1000
+            for _, _, queued_at in items:
+                latency_ms = (end - queued_at) * 1000
+                self._total_latency_ms += latency_ms
+                self._max_latency_ms = max(self._max_latency_ms, latency_ms)
+        for (_, future, _), session_id in zip(items, results):
+            self._settle(future, session_id)
+    
+    @staticmethod
+    def _settle(future: 'Future', session_id: Optional[int] = None,
+                error: Optional[Exception] = None) -> None:
+        """Resolve a future; one the caller already resolved must not stop the writer."""
+        try:
+            if error is None:
+                future.set_result(session_id)
+            else:
+                future.set_exception(error)
+        except Exception:
+            # concurrent.futures.InvalidStateError, which Python 3.7 lacks
+            pass
+
+
+class UserDataStore:
+    """In-memory copy of the current user's user_data rows with write-behind flushing.
+    
+    The rows are decoded once on load and reads are served from memory.
+    Writes update memory immediately and mark the key dirty; dirty keys
+    are committed together in one transaction ``flush_interval`` seconds
+    after the first unflushed write, on flush(), and on close(), which
+    also runs at interpreter exit. Timed flushes run on one thread that
+    lives as long as the store, so they reuse a single connection.
+    """
+    
+    def __init__(self, database: Database, flush_interval: float = 5.0):
+        """Load the table and get ready to track writes."""
+        self.database = database
+        self.flush_interval = flush_interval
+        self._lock = threading.RLock()
+        self.user_id = database.user_id
+        self._values: Dict[str, Any] = {}
+        self._dirty: set = set()
+        # Monotonic time the flush thread writes dirty keys at; None while clean
+        self._due: Optional[float] = None
+        self._wakeup = threading.Condition(self._lock)
+        self._flushes = 0
+        self._closed = False
+        self.load()
+        self._thread = threading.Thread(target=self._run, name='UserDataStore', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def load(self) -> None:
+        """Replace the in-memory values with the current user's rows, dropping unflushed writes."""
+        user_id = self.database.user_id
+        with self.database.get_connection() as conn:
+            rows = conn.execute('SELECT key, value FROM user_data WHERE user_id = ?',
+                                (user_id,)).fetchall()
+        with self._lock:
+            self.user_id = user_id
+            self._values = {row['key']: decode_user_value(row['value']) for row in rows}
+            self._dirty.clear()
+    
+    def get(self, key: str, default: Any = None) -> Any:
+        """Return a value without touching the database."""
+        return self._values.get(key, default)
+    
+    def get_int(self, key: str, default: int = 0) -> int:
+        """Return an integer value, or ``default`` if the key holds something else."""
+        value = self._values.get(key)
+        return value if isinstance(value, int) and not isinstance(value, bool) else default
+    
+    def get_str(self, key: str, default: str = '') -> str:
+        """Return a string value, or ``default`` if the key holds something else."""
+        value = self._values.get(key)
+        return value if isinstance(value, str) else default
+    
+    def get_bool(self, key: str, default: bool = False) -> bool:
+        """Return a boolean value, or ``default`` if the key holds something else."""
+        value = self._values.get(key)
+        return value if isinstance(value, bool) else default
+    
+    def set(self, key: str, value: Any) -> None:
+        """Set a value in memory and schedule it to be written."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('UserDataStore is closed')
+            self._values[key] = value
+            self._dirty.add(key)
+            self._schedule_flush()
+    
+    def increment(self, key: str, amount: int = 1) -> int:
+        """Add to an integer counter, starting from 0, and return the new value."""
+        with self._lock:
+            value = self.get_int(key) + amount
+            self.set(key, value)
+            return value
+    
+    def flush(self) -> int:
+        """Write every dirty key in one transaction; returns the number written."""
+        with self._lock:
+            self._due = None
+            if not self._dirty:
+                return 0
+            rows = [(self.user_id, key, encode_user_value(self._values[key]))
+                    for key in self._dirty]
+            try:
+                with self.database.get_connection(write=True) as conn:
+                    conn.executemany('''
+                        INSERT OR REPLACE INTO user_data (user_id, key, value, updated_at)
+                        VALUES (?, ?, ?, CURRENT_TIMESTAMP)
+                    ''', rows)
+            except Exception:
+                # Keys stay dirty; try again after the next interval
+                self._schedule_flush()
+                raise
+            self._dirty.clear()
+            self._flushes += 1
+            return len(rows)
+    
+    def close(self) -> None:
+        """Flush pending writes and stop accepting new ones."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            atexit.unregister(self.close)
+            self._wakeup.notify()
+            self.flush()
+        self._thread.join()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Report the number of keys, pending writes and flushes."""
+        with self._lock:
+            return {
+                'keys': len(self._values),
+                'dirty': len(self._dirty),
+                'flushes': self._flushes
+            }
+    
+    def _schedule_flush(self) -> None:
+        """Set the flush thread's due time unless one is already pending."""
+        if self._due is None and not self._closed:
+            self._due = time.monotonic() + self.flush_interval
+            self._wakeup.notify()
+    
+    def _run(self) -> None:
+        """Flush thread: write dirty keys whenever their due time passes, until close()."""
+        with self._lock:
+            while not self._closed:
+                if self._due is None:
+                    self._wakeup.wait()
+                elif time.monotonic() < self._due:
+                    self._wakeup.wait(self._due - time.monotonic())
+                else:
+                    try:
+                        self.flush()
+                    except sqlite3.Error:
+                        # flush() set a new due time to try again
+                        pass
+
+
+class AttemptBuffer:
+    """Round-level results of one game, appended to the attempts table in batches.
+    
+    add() records a round in memory and every ``flush_every`` rounds the
+    buffer is written with one executemany. finish() writes the rest and
+    links every round of the game to its recorded session. Rounds are
+    written for the user who was current when the buffer was opened;
+    anything still buffered at interpreter exit is written by close(),
+    unlinked.
+    """
+    
+    def __init__(self, database: Database, game_type: str, flush_every: int = 50):
+        """Get ready to buffer rounds for the database's current user."""
+        self.database = database
+        self.game_type = game_type
+        self.flush_every = flush_every
+        self.user_id = database.user_id
+        self.session_id: Optional[int] = None
+        self._lock = threading.RLock()
+        self._rows: List[Tuple] = []
+        # (first_id, last_id) of rows written before the session id was known
+        self._unlinked: List[Tuple[int, int]] = []
+        self._written = 0
+        self._flushes = 0
+        self._closed = False
+        atexit.register(self.close)
+    
+    def add(self, level: int, prompt: Optional[str], answer: Optional[str], correct: bool,
+            response_ms: Optional[int] = None) -> None:
+        """Buffer one round, writing the buffer once it holds ``flush_every`` rounds."""
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('AttemptBuffer is closed')
+            self._rows.append((level, prompt, answer, bool(correct), response_ms, epoch_ms()))
+            if len(self._rows) >= self.flush_every:
+                self.flush()
+    
+    def flush(self) -> int:
+        """Append the buffered rounds in one transaction; returns the number written."""
+        with self._lock:
+            if not self._rows:
+                return 0
+            with self.database.get_connection(write=True) as conn:
+                conn.executemany('''
+                    INSERT INTO attempts (user_id, session_id, game_type, level, prompt, answer,
+                                          correct, response_ms, ts_ms)
+                    VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)
+                ''', [(self.user_id, self.session_id, self.game_type) + row
+                      for row in self._rows])
+                # The write lock is held for the whole batch, so it got the newest ids
+                last_id = conn.execute('SELECT MAX(id) FROM attempts').fetchone()[0]
+            count = len(self._rows)
+            if self.session_id is None:
+                self._unlinked.append((last_id - count + 1, last_id))
+            # Rows stay buffered if the write failed
+            self._rows = []
+            self._written += count
+            self._flushes += 1
+            return count
+    
+    def finish(self, session_id: Optional[int] = None) -> int:
+        """Write the remaining rounds, link them all to ``session_id`` and close.
+        
+        Returns the number of rounds the game wrote in total.
+        """
+        with self._lock:
+            if self._closed:
+                raise RuntimeError('AttemptBuffer is closed')
+            # Rounds written from now on carry the session id directly
+            self.session_id = session_id
+            self.flush()
+            if session_id is not None and self._unlinked:
+                with self.database.get_connection(write=True) as conn:
+                    conn.executemany('''
+                        UPDATE attempts SET session_id = ? WHERE id BETWEEN ? AND ?
+                    ''', [(session_id, first, last) for first, last in self._unlinked])
+                self._unlinked = []
+            self.close()
+            return self._written
+    
+    def close(self) -> None:
+        """Write any buffered rounds and stop accepting new ones."""
+        with self._lock:
+            if self._closed:
+                return
+            self._closed = True
+            atexit.unregister(self.close)
+            self.flush()
+    
+    def stats(self) -> Dict[str, Any]:
+        """Report buffered and written rounds and the number of flushes."""
+        with self._lock:
+            return {
+                'buffered': len(self._rows),
+                'written': self._written,
+                'flushes': self._flushes
+            }
+
+
+class BackupManager:
+    """Background thread that takes rotated online backups on a schedule.
+    
+    Backups are named ``<database>-YYYYmmdd-HHMMSS-ffffff.db`` in
+    ``backup_dir``, each with a ``.archive.db`` copy when the database has
+    an archive, and only the ``keep`` newest are kept. The first backup
+    is due ``interval`` seconds after the newest existing one, so the
+    schedule survives restarts, but never sooner than ``startup_delay``
+    seconds after start. status() reports progress of the running backup
+    and the result of the last one.
+    """
+    
+    def __init__(self, database: Database, backup_dir: str, keep: int = 5,
+                 interval: float = 86400.0, pages: int = 64, step_sleep: float = 0.005,
+                 startup_delay: float = 60.0):
+        """Start the backup thread."""
+        self.database = database
+        self.backup_dir = backup_dir
+        self.keep = keep
+        self.interval = interval
+        self.pages = pages
+        self.step_sleep = step_sleep
+        self.startup_delay = startup_delay
+        self.prefix = os.path.splitext(os.path.basename(database.db_file))[0] or 'memory'
+        self._lock = threading.Lock()
+        self._backup_lock = threading.Lock()
+        self._progress = (0, 0)
+        self._running = False
+        self._last: Optional[Dict[str, Any]] = None
+        self._last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='BackupManager', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def list_backups(self) -> List[str]:
+        """Return existing backup paths, oldest first."""
+        if not os.path.isdir(self.backup_dir):
+            return []
+        names = sorted(name for name in os.listdir(self.backup_dir)
+                       if name.startswith(self.prefix + '-') and name.endswith('.db')
+                       and not name.endswith('.archive.db'))
+        return [os.path.join(self.backup_dir, name) for name in names]
+    
+    def backup_now(self) -> Dict[str, Any]:
+        """Take a backup on the calling thread, then rotate old copies."""
+        with self._backup_lock:
+            os.makedirs(self.backup_dir, exist_ok=True)
+            stamp = datetime.now().strftime('%Y%m%d-%H%M%S-%f')
+            target = os.path.join(self.backup_dir, f'{self.prefix}-{stamp}.db')
+            with self._lock:
+                self._running = True
+                self._progress = (0, 0)
+            try:
+                result = self.database.backup(target, pages=self.pages,
+                                              step_sleep=self.step_sleep,
+                                              progress=self._on_progress)
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                raise
+            finally:
+                with self._lock:
+                    self._running = False
+            
+            self._rotate()
+            with self._lock:
+                self._last = result
+                self._last_error = None
+            return result
+    
+    def status(self) -> Dict[str, Any]:
+        """Report the running backup's progress and the last backup's result."""
+        with self._lock:
+            copied, total = self._progress
+            return {
+                'running': self._running,
+                'pages_copied': copied,
+                'pages_total': total,
+                'last_backup': self._last,
+                'last_error': self._last_error,
+                'backups': len(self.list_backups())
+            }
+    
+    def close(self) -> None:
+        """Stop the schedule, waiting for a running backup to finish."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        atexit.unregister(self.close)
+        self._thread.join()
+    
+    def _on_progress(self, copied: int, total: int) -> None:
+        with self._lock:
+            self._progress = (copied, total)
+    
+    def _rotate(self) -> None:
+        """Delete all but the ``keep`` newest backups, with their archive copies."""
+        backups = self.list_backups()
+        for path in backups[:max(0, len(backups) - self.keep)]:
+            os.remove(path)
+            archive = os.path.splitext(path)[0] + '.archive.db'
+            if os.path.exists(archive):
+                os.remove(archive)
+    
+    def _next_delay(self) -> float:
+        """Seconds until the next backup is due."""
+        backups = self.list_backups()
+        if not backups:
+            return 0.0
+        age = time.time() - os.path.getmtime(backups[-1])
+        return max(0.0, self.interval - age)
+    
+    def _run(self) -> None:
+        """Wait for each due time and back up until closed."""
+        delay = max(self.startup_delay, self._next_delay())
+        while not self._stop.wait(delay):
+            try:
+                self.backup_now()
+            except (sqlite3.Error, OSError):
+                # Recorded in status(); retried at the next interval
+                pass
+            delay = self.interval
+
+
+class DiskSnapshotter:
+    """Background thread that saves a hybrid database's memory image to disk.
+    
+    Every ``interval`` seconds, if anything was written since the last
+    snapshot, the in-memory database is copied over its db_file with
+    Database.backup(), which writes a temporary file and renames it into
+    place, so the file on disk is always a complete snapshot. The archive
+    file is written directly through its attachment and is not copied. close(),
+    which also runs at interpreter exit, takes a final one.
+    """
+    
+    def __init__(self, database: Database, interval: float = 30.0):
+        """Start the snapshot thread."""
+        self.database = database
+        self.interval = interval
+        self._lock = threading.Lock()
+        self._snapshot_lock = threading.Lock()
+        # Write generation saved by the last snapshot; None until the first
+        self._saved_generation: Optional[int] = None
+        self._last: Optional[Dict[str, Any]] = None
+        self._last_error: Optional[str] = None
+        self._stop = threading.Event()
+        self._thread = threading.Thread(target=self._run, name='DiskSnapshotter', daemon=True)
+        self._thread.start()
+        atexit.register(self.close)
+    
+    def snapshot_now(self, force: bool = False) -> Optional[Dict[str, Any]]:
+        """Save the database if it changed since the last snapshot.
+        
+        Returns the Database.backup() result, or None when there was
+        nothing new to save.
+        """
+        with self._snapshot_lock:
+            # Read before copying: a write racing the copy triggers one more snapshot
+            generation = self.database._generation
+            if not force and generation == self._saved_generation:
+                return None
+            try:
+                # Only main: the archive copy would replace the attached archive file
+                result = self.database.backup(self.database.db_file, pages=-1, step_sleep=0,
+                                              include_archive=False)
+            except Exception as e:
+                with self._lock:
+                    self._last_error = str(e)
+                raise
+            with self._lock:
+                self._saved_generation = generation
+                self._last = result
+                self._last_error = None
+            return result
+    
+    def status(self) -> Dict[str, Any]:
+        """Report whether unsaved writes exist and the last snapshot's result."""
+        with self._lock:
+            return {
+                'interval': self.interval,
+                'dirty': self.database._generation != self._saved_generation,
+                'last_snapshot': self._last,
+                'last_error': self._last_error
+            }
+    
+    def close(self) -> None:
+        """Stop the timer and save any remaining changes."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        atexit.unregister(self.close)
+        self._thread.join()
+        self.snapshot_now()
+    
+    def _run(self) -> None:
+        """Snapshot every interval until closed."""
+        while not self._stop.wait(self.interval):
+            try:
+                self.snapshot_now()
+            except (sqlite3.Error, OSError):
+                # Recorded in status(); retried at the next interval
+                pass
+
+
+class QueryProfiler:
+    """Per-method call counts, latency histograms and a slow-call log.
+    
+    Installed by Database.enable_profiling(), which replaces each public
+    method on the instance with a timing wrapper. Latencies are measured
+    with perf_counter_ns and bucketed by powers of two, so bucket ``i``
+    counts calls that took less than ``2**i`` ns. While a call runs, the
+    statements executed on the calling thread are collected through the
+    connections' trace callback and kept if the call turns out slow.
+    """
+    
+    BUCKETS = 40  # the last bucket takes everything from about 9 minutes up
+    MAX_STATEMENTS = 50  # per logged call; bulk inserts trace one per row
+    
+    def __init__(self, database: Database, slow_ms: float = 50.0, log_size: int = 100):
+        """Create empty histograms; install() starts timing."""
+        self.database = database
+        self.slow_ms = slow_ms
+        self._slow_ns = int(slow_ms * 1_000_000)
+        self._slow_log: deque = deque(maxlen=log_size)
+        # Method name -> [calls, total_ns, max_ns] and bucket counts
+        self._totals: Dict[str, List[int]] = {}
+        self._histograms: Dict[str, List[int]] = {}
+        self._lock = threading.Lock()
+        self._local = threading.local()
+        self._methods: List[str] = []
+    
+    def install(self) -> None:
+        """Wrap the database's public methods and trace its open connections."""
+        cls = type(self.database)
+        for name in dir(cls):
+            if name.startswith('_') or name in cls.UNPROFILED:
+                continue
+            if callable(getattr(cls, name)):
+                setattr(self.database, name, self._wrap(name, getattr(self.database, name)))
+                self._methods.append(name)
+        self._set_trace(self.trace)
+    
+    def uninstall(self) -> None:
+        """Restore the class methods and stop tracing."""
+        for name in self._methods:
+            self.database.__dict__.pop(name, None)
+        self._methods = []
+        self._set_trace(None)
+    
+    def trace(self, sql: str) -> None:
+        """Connection trace callback: remember statements run inside a timed call."""
+        statements = getattr(self._local, 'statements', None)
+        if statements is not None and len(statements) < self.MAX_STATEMENTS:
+            statements.append(sql)
+    
+    def stats(self) -> Dict[str, Any]:
+        """Report counts, mean, percentiles and the histogram of each called method."""
+        with self._lock:
+            totals = {name: list(values) for name, values in self._totals.items() if values[0]}
+            histograms = {name: list(self._histograms[name]) for name in totals}
+            slow_calls = len(self._slow_log)
+        
+        methods = {}
+        for name, (calls, total_ns, max_ns) in sorted(totals.items()):
+            histogram = histograms[name]
+            methods[name] = {
+                'calls': calls,
+                'total_ms': total_ns / 1e6,
+                'mean_us': total_ns / calls / 1e3,
+                'p50_us': self._percentile(histogram, calls, 0.50, max_ns) / 1e3,
+                'p95_us': self._percentile(histogram, calls, 0.95, max_ns) / 1e3,
+                'p99_us': self._percentile(histogram, calls, 0.99, max_ns) / 1e3,
+                'max_us': max_ns / 1e3,
+                # Bucket upper bound in ns -> calls
+                'histogram': {1 << bucket: count for bucket, count in enumerate(histogram)
+                              if count}
+            }
+        return {'slow_ms': self.slow_ms, 'slow_calls': slow_calls, 'methods': methods}
+    
+    def slow_log_entries(self) -> List[Dict[str, Any]]:
+        """Copy the slow-call log, oldest first."""
+        with self._lock:
+            return [dict(entry, sql=list(entry['sql'])) for entry in self._slow_log]
+    
+    def report(self) -> str:
+        """Format stats() and the slow log as a plain-text table."""
+        stats = self.stats()
+        lines = [f"{'method':<28} {'calls':>8} {'mean us':>10} {'p50 us':>10} "
+                 f"{'p95 us':>10} {'p99 us':>10} {'max us':>10}"]
+        for name, method in stats['methods'].items():
+            lines.append(f"{name:<28} {method['calls']:>8,} {method['mean_us']:>10.1f} "
+                         f"{method['p50_us']:>10.1f} {method['p95_us']:>10.1f} "
+                         f"{method['p99_us']:>10.1f} {method['max_us']:>10.1f}")
+        slow = self.database.slow_queries(explain=True)
+        lines.append(f"\n{len(slow)} calls over {self.slow_ms:g} ms")
+        for entry in slow:
+            lines.append(f"{entry['method']} {entry['duration_ms']:.1f} ms "
+                         f"({entry['thread']})")
+            for sql, plan in zip(entry['sql'], entry['plans']):
+                lines.append(f"    {sql}")
+                lines.extend(f"        {step}" for step in plan)
+        return '\n'.join(lines)
+    
+    def _wrap(self, name: str, method: Callable) -> Callable:
+        """Return a timing wrapper for one bound method."""
+        totals = self._totals.setdefault(name, [0, 0, 0])
+        histogram = self._histograms.setdefault(name, [0] * self.BUCKETS)
+        local = self._local
+        clock = time.perf_counter_ns
+        last_bucket = self.BUCKETS - 1
+        
+        def timed(*args, **kwargs):
+            statements = getattr(local, 'statements', None)
+            outermost = statements is None
+            if outermost:
+                statements = local.statements = []
+            first = len(statements)
+            start = clock()
+            try:
+                return method(*args, **kwargs)
+            finally:
+                elapsed = clock() - start
+                with self._lock:
+                    totals[0] += 1
+                    totals[1] += elapsed
+                    if elapsed > totals[2]:
+                        totals[2] = elapsed
+                    histogram[min(elapsed.bit_length(), last_bucket)] += 1
+                    if elapsed >= self._slow_ns:
+                        self._slow_log.append({
+                            'method': name,
+                            'duration_ms': elapsed / 1e6,
+                            'ts_ms': epoch_ms(),
+                            'thread': threading.current_thread().name,
+                            'sql': statements[first:]
+                        })
+                if outermost:
+                    local.statements = None
+        
+        timed.__name__ = name
+        timed.__doc__ = method.__doc__
+        return timed
+    
+    def _set_trace(self, callback: Optional[Callable[[str], None]]) -> None:
+        """Set the trace callback on every connection the database has open."""
+        database = self.database
+        with database._connections_lock:
+            connections = list(database._connections)
+        if database._persistent_conn:
+            connections.append(database._persistent_conn)
+        for conn in connections:
+            conn.set_trace_callback(callback)
+    
+    @staticmethod
+    def _percentile(histogram: List[int], calls: int, fraction: float, max_ns: int) -> int:
+        """Upper bound of the bucket holding the given fraction of calls."""
+        target = calls * fraction
+        seen = 0
+        for bucket, count in enumerate(histogram):
+            seen += count
+            if count and seen >= target:
+                return min(1 << bucket, max_ns)
+        return max_ns
+
+
+# Global database instance, opened by init() or on first access to ``db``
+_db: Optional[Database] = None
+_db_lock = threading.RLock()
+
+
+def init(db_file: Optional[str] = None) -> Database:
+    """Open the global database from the configuration, replacing any opened before.
+    
+    ``db_file`` overrides the stats_file setting. Archiving, backups and
+    profiling start as the configuration says.
+    """
+    global _db
+    settings = get_config()
+    with _db_lock:
+        if _db is not None:
+            _db.close()
+        db_file = db_file or settings.get('stats_file', 'memory_stats.db')
+        _db = Database(db_file,
+                       profile=settings.get_db_profile(),
+                       archive_file=settings.get_archive_file(db_file),
+                       snapshot_reads=settings.get('snapshot_reads', True),
+                       busy_timeout=settings.get('busy_timeout_ms', 5000) / 1000,
+                       multi_process=settings.get('multi_process_writes', False),
+                       hybrid=settings.get('hybrid_memory', False),
+                       snapshot_interval=settings.get('snapshot_interval_seconds', 30))
+        if settings.get('db_profiling', False):
+            _db.enable_profiling(slow_ms=settings.get('slow_query_ms', 50))
+        if _db.archive_file and settings.get('archive_after_days'):
+            _db.start_archiving(settings.get('archive_after_days'))
+        if settings.get('backup_enabled', True):
+            _db.start_backups(settings.get('backup_dir', 'backups'),
+                              keep=settings.get('backup_keep', 5),
+                              interval=settings.get('backup_interval_hours', 24) * 3600)
+        return _db
+
+
+def get_db() -> Database:
+    """Return the global database, opening it on first use."""
+    if _db is None:
+        with _db_lock:
+            if _db is None:
+                init()
+    return _db
 
 
-# Global database instance
-db = Database()
+def __getattr__(name: str) -> Any:
+    """Open the ``db`` singleton lazily (module attribute hook, PEP 562)."""
+    if name == 'db':
+        return get_db()
+    raise AttributeError(f"module {__name__!r} has no attribute {name!r}")
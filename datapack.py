@@ -0,0 +1,139 @@
+"""
+Compact backup format for Intelligence Memory Training
+
+A pack file is a stream of length-prefixed frames:
+
+    magic      b'IMTPACK' + format version byte
+    header     4-byte big-endian length + UTF-8 JSON object
+    frames     table index (1 byte), row count (4 bytes), payload length (4 bytes),
+               payload: a compressed JSON array of row arrays
+    end        a frame with table index 255 and no payload
+
+The header records the codec, the database schema version and, for each
+table, its column names and row count. Rows are written as arrays in that
+column order, so keys are stored once per file instead of once per row.
+"""
+import json
+import lzma
+import struct
+import zlib
+from typing import Any, BinaryIO, Callable, Dict, Iterable, Iterator, List, Tuple
+
+
+MAGIC = b'IMTPACK\x01'
+END = 255
+
+_HEADER = struct.Struct('>I')
+_FRAME = struct.Struct('>BII')
+
+# Codec name -> (compress, decompress)
+CODECS: Dict[str, Tuple[Callable[[bytes], bytes], Callable[[bytes], bytes]]] = {
+    'zlib': (lambda data: zlib.compress(data, 6), zlib.decompress),
+    'lzma': (lambda data: lzma.compress(data, preset=1), lzma.decompress),
+    'none': (bytes, bytes)
+}
+
+
+class PackError(ValueError):
+    """Raised when a stream is not a readable pack file."""
+
+
+def is_pack(fp: BinaryIO) -> bool:
+    """Check for the pack magic without consuming it; fp must be seekable."""
+    position = fp.tell()
+    magic = fp.read(len(MAGIC))
+    fp.seek(position)
+    return magic == MAGIC
+
+
+class PackWriter:
+    """Write a pack file to a binary stream.
+    
+    ``tables`` maps each table name to its column names and row count, in
+    the order the tables will be written. Rows passed to write_rows() are
+    grouped ``chunk_rows`` per frame.
+    """
+    
+    def __init__(self, fp: BinaryIO, tables: Dict[str, Dict[str, Any]], codec: str = 'zlib',
+                 schema_version: int = 0, chunk_rows: int = 10000, **metadata):
+        """Write the magic and header."""
+        if codec not in CODECS:
+            raise ValueError(f"Unknown codec '{codec}', expected one of {sorted(CODECS)}")
+        self.fp = fp
+        self.chunk_rows = chunk_rows
+        self._compress = CODECS[codec][0]
+        self._tables = list(tables)
+        self.bytes_written = 0
+        
+        header = dict(metadata, codec=codec, schema_version=schema_version, tables=tables)
+        encoded = json.dumps(header).encode('utf-8')
+        self._write(MAGIC + _HEADER.pack(len(encoded)) + encoded)
+    
+    def write_rows(self, table: str, rows: Iterable[Iterable[Any]]) -> int:
+        """Write rows for a table in compressed chunks; returns the row count."""
+        index = self._tables.index(table)
+        count = 0
+        chunk: List[Any] = []
+        for row in rows:
+            chunk.append(list(row))
+            if len(chunk) >= self.chunk_rows:
+                self._write_frame(index, chunk)
+                count += len(chunk)
+                chunk = []
+        if chunk:
+            self._write_frame(index, chunk)
+            count += len(chunk)
+        return count
+    
+    def close(self) -> None:
+        """Write the end marker; the stream itself is left open."""
+        self._write(_FRAME.pack(END, 0, 0))
+    
+    def _write_frame(self, index: int, rows: List[Any]) -> None:
+        payload = self._compress(json.dumps(rows, separators=(',', ':')).encode('utf-8'))
+        self._write(_FRAME.pack(index, len(rows), len(payload)) + payload)
+    
+    def _write(self, data: bytes) -> None:
+        self.fp.write(data)
+        self.bytes_written += len(data)
+
+
+class PackReader:
+    """Read a pack file from a binary stream, one frame at a time."""
+    
+    def __init__(self, fp: BinaryIO):
+        """Read and check the magic and header."""
+        self.fp = fp
+        if self._read(len(MAGIC)) != MAGIC:
+            raise PackError('Not a pack file')
+        (length,) = _HEADER.unpack(self._read(_HEADER.size))
+        self.header: Dict[str, Any] = json.loads(self._read(length).decode('utf-8'))
+        codec = self.header.get('codec')
+        if codec not in CODECS:
+            raise PackError(f"Unsupported codec '{codec}'")
+        self._decompress = CODECS[codec][1]
+        self.tables: List[str] = list(self.header['tables'])
+    
+    def columns(self, table: str) -> List[str]:
+        """Return the column names rows of a table are written in."""
+        return self.header['tables'][table]['columns']
+    
+    def frames(self) -> Iterator[Tuple[str, List[List[Any]]]]:
+        """Yield (table, rows) for each frame until the end marker."""
+        while True:
+            index, count, length = _FRAME.unpack(self._read(_FRAME.size))
+            if index == END:
+                return
+            if index >= len(self.tables):
+                raise PackError(f'Frame names table {index}, but the header lists '
+                                f'{len(self.tables)}')
+            rows = json.loads(self._decompress(self._read(length)))
+            if len(rows) != count:
+                raise PackError(f'Frame holds {len(rows)} rows, expected {count}')
+            yield self.tables[index], rows
+    
+    def _read(self, size: int) -> bytes:
+        data = self.fp.read(size)
+        if len(data) != size:
+            raise PackError('Unexpected end of pack file')
+        return data
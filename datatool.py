@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+"""
+Data export and import for Intelligence Memory Training
+
+Usage:
+    python datatool.py export FILE [--format pack|json] [--codec zlib|lzma|none]
+    python datatool.py import FILE [--replace]
+    python datatool.py --db-stats export|import ...
+    python datatool.py --user NAME export|import ...
+
+Pack files are the compact format described in datapack.py; import
+detects the format from the file contents. Both commands work on the
+configured statistics database unless --db is given, and on one
+trainee's data: the default user unless --user names another, who is
+added if missing. --db-stats times
+the command's database calls and prints per-method latencies and the
+slow-call log with query plans to stderr when it finishes.
+"""
+import argparse
+import json
+import sys
+import time
+
+from config import config
+from database import Database
+from datapack import CODECS, is_pack
+
+
+def open_database(args: argparse.Namespace) -> Database:
+    """Open the database named on the command line."""
+    db = Database(args.db, profile=config.get_db_profile(),
+                  archive_file=args.archive or config.get_archive_file(args.db))
+    if args.db_stats:
+        db.enable_profiling(slow_ms=args.slow_ms)
+    if args.user:
+        db.set_user(db.add_user(args.user))
+    return db
+
+
+def export_command(args: argparse.Namespace) -> None:
+    """Write all data to FILE."""
+    start = time.perf_counter()
+    with open_database(args) as db:
+        if args.format == 'pack':
+            with open(args.file, 'wb') as f:
+                counts = db.export_pack(f, codec=args.codec)
+            sessions = counts['sessions']
+        else:
+            with open(args.file, 'w') as f:
+                sessions = db.export_stream(f)
+        print_db_stats(args, db)
+    print(f"Exported {sessions:,} sessions to {args.file} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def import_command(args: argparse.Namespace) -> None:
+    """Load data from FILE, merging unless --replace is given."""
+    def progress(done, total):
+        if total:
+            print(f"\r{done:,} / {total:,} sessions", end='', file=sys.stderr)
+    
+    start = time.perf_counter()
+    with open_database(args) as db, open(args.file, 'rb') as f:
+        if is_pack(f):
+            count = db.import_pack(f, merge=not args.replace, progress=progress)
+        else:
+            count = db.import_data(json.load(f), merge=not args.replace, progress=progress)
+        print_db_stats(args, db)
+    print(f"\rImported {count:,} sessions from {args.file} "
+          f"in {time.perf_counter() - start:.1f}s")
+
+
+def print_db_stats(args: argparse.Namespace, db: Database) -> None:
+    """Print the profiling report when --db-stats is given."""
+    if args.db_stats:
+        print(db.profiler.report(), file=sys.stderr)
+
+
+def main() -> None:
+    """Parse arguments and run the selected command."""
+    parser = argparse.ArgumentParser(description=__doc__,
+                                     formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--db', default=config.get('stats_file', 'memory_stats.db'),
+                        help='database file (default: the stats_file setting)')
+    parser.add_argument('--archive',
+                        help='archive file (default: from the archive settings, next to --db)')
+    parser.add_argument('--user', help='trainee whose data is exported or imported '
+                                       '(default: the default user)')
+    parser.add_argument('--db-stats', action='store_true',
+                        help='print per-method database latencies and slow calls')
+    parser.add_argument('--slow-ms', type=float, default=config.get('slow_query_ms', 50),
+                        help='slow-call threshold for --db-stats (default: the slow_query_ms setting)')
+    subparsers = parser.add_subparsers(dest='command', required=True)
+    
+    export = subparsers.add_parser('export', help="export a trainee's data to a file")
+    export.add_argument('file')
+    export.add_argument('--format', choices=['pack', 'json'], default='pack')
+    export.add_argument('--codec', choices=sorted(CODECS), default='zlib')
+    export.set_defaults(func=export_command)
+    
+    import_ = subparsers.add_parser('import', help='import data from a pack or JSON file')
+    import_.add_argument('file')
+    import_.add_argument('--replace', action='store_true',
+                         help='replace existing data instead of merging')
+    import_.set_defaults(func=import_command)
+    
+    args = parser.parse_args()
+    args.func(args)
+
+
+if __name__ == '__main__':
+    main()
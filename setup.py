@@ -45,6 +45,7 @@ setup(
     entry_points={
         "console_scripts": [
             "memory-training=app:main",
+            "memory-training-data=datatool:main",
         ],
     },
     include_package_data=True,
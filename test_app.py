@@ -2,10 +2,23 @@
 Unit tests for Intelligence Memory Training
 """
 import unittest
+import io
 import os
 import json
+import shutil
+import sqlite3
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from datetime import datetime, timedelta, timezone
+import config as config_module
+import database as database_module
 from config import Config
-from database import Database
+from benchmark import run_stress
+from database import Database, epoch_ms, is_busy_error, local_day, to_epoch_ms
+from datapack import PackError, PackReader, PackWriter
 from utils import (
     generate_document_code,
     generate_license_plate,
@@ -63,6 +76,25 @@ class TestConfig(unittest.TestCase):
         multiplier = self.config.get_font_multiplier()
         self.assertEqual(multiplier, 1.15)
     
+    def test_archive_file(self):
+        """Test the archive is off by default and otherwise lives next to stats_file."""
+        stats_file = os.path.join('data', 'stats.db')
+        self.assertIsNone(self.config.get_archive_file(stats_file))
+        self.config.set('archive_after_days', 365)
+        self.assertEqual(self.config.get_archive_file(stats_file),
+                         os.path.join('data', 'stats.archive.db'))
+        self.assertIsNone(self.config.get_archive_file(':memory:'))
+        self.config.set('archive_file', 'old.db')
+        self.assertEqual(self.config.get_archive_file(stats_file), os.path.join('data', 'old.db'))
+    
+    def test_get_db_profile(self):
+        """Test database profile selection falls back to balanced."""
+        self.assertEqual(self.config.get_db_profile(), 'balanced')
+        self.config.set('db_profile', 'fast')
+        self.assertEqual(self.config.get_db_profile(), 'fast')
+        self.config.set('db_profile', 'turbo')
+        self.assertEqual(self.config.get_db_profile(), 'balanced')
+    
     def test_reset_to_defaults(self):
         """Test resetting to default settings."""
         self.config.set('theme', 'blue')
@@ -145,6 +177,1881 @@ class TestDatabase(unittest.TestCase):
         # Verify
         stats = new_db.get_statistics('document_recall')
         self.assertEqual(stats['sessions_played'], 1)
+    
+    def test_record_sessions(self):
+        """Test bulk recording matches one-at-a-time statistics."""
+        sessions = [
+            {'game_type': 'document_recall', 'score': 50, 'level': 3, 'correct': 3, 'total': 4},
+            {'game_type': 'document_recall', 'score': 120, 'level': 6, 'correct': 6, 'total': 6},
+            {'game_type': 'license_plates', 'score': 30, 'level': 2,
+             'timestamp': '2025-01-02 10:00:00'},
+        ]
+        count = self.db.record_sessions(sessions)
+        self.assertEqual(count, 3)
+        
+        single_db = Database(':memory:')
+        for session in sessions[:2]:
+            single_db.record_session(session['game_type'], session['score'], session['level'],
+                                     session['correct'], session['total'])
+        bulk = self.db.get_statistics('document_recall')
+        single = single_db.get_statistics('document_recall')
+        for key in ('sessions_played', 'best_score', 'total_score', 'best_level',
+                    'total_correct', 'total_attempts'):
+            self.assertEqual(bulk[key], single[key], key)
+        
+        plates = self.db.get_statistics('license_plates')
+        self.assertEqual(plates['last_played'], to_epoch_ms('2025-01-02 10:00:00'))
+        self.assertEqual(len(self.db.get_recent_sessions(limit=10)), 3)
+    
+    def test_record_sessions_merges_with_existing(self):
+        """Test bulk statistics upserts add to existing rows."""
+        self.db.record_session('document_recall', 200, 9, 9, 9)
+        self.db.record_sessions([{'game_type': 'document_recall', 'score': 10, 'level': 1}])
+        
+        stats = self.db.get_statistics('document_recall')
+        self.assertEqual(stats['sessions_played'], 2)
+        self.assertEqual(stats['best_score'], 200)
+        self.assertEqual(stats['total_score'], 210)
+    
+    def test_record_sessions_rolls_back_on_error(self):
+        """Test a bad row leaves the database untouched."""
+        with self.assertRaises(KeyError):
+            self.db.record_sessions([
+                {'game_type': 'document_recall', 'score': 10, 'level': 1},
+                {'game_type': 'document_recall', 'score': 10},
+            ])
+        self.assertEqual(self.db.get_recent_sessions(), [])
+        self.assertEqual(self.db.get_statistics(), {})
+    
+    def test_record_sessions_across_insert_statements(self):
+        """Test a batch spanning several multi-row INSERTs keeps every session in order."""
+        count = Database.SESSION_INSERT_ROWS * 2 + 5
+        self.assertEqual(self.db.record_sessions(
+            {'game_type': 'document_recall', 'score': i, 'level': 1, 'ts_ms': 1_000_000 + i}
+            for i in range(count)), count)
+        
+        sessions = self.db.get_recent_sessions(limit=count + 1)
+        self.assertEqual([s['score'] for s in sessions], list(range(count))[::-1])
+        self.assertEqual(self.db.verify_statistics(), [])
+
+
+class TestConnectionCache(unittest.TestCase):
+    """Test per-thread connection reuse for file databases."""
+    
+    def setUp(self):
+        """Set up a file-backed test database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.temp_dir, 'test.db'))
+    
+    def tearDown(self):
+        """Close connections and remove the database file."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def test_connection_reused_within_thread(self):
+        """Test repeated calls on one thread share a connection."""
+        with self.db.get_connection() as first:
+            pass
+        self.db.record_session('document_recall', 100, 5, 5, 5)
+        with self.db.get_connection() as second:
+            pass
+        self.assertIs(first, second)
+    
+    def test_threads_get_own_connections(self):
+        """Test each thread opens its own connection."""
+        seen = []
+        
+        def worker():
+            with self.db.get_connection() as conn:
+                seen.append(conn)
+            self.db.record_session('document_recall', 10, 1)
+        
+        threads = [threading.Thread(target=worker) for _ in range(3)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        
+        self.assertEqual(len(set(map(id, seen))), 3)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 3)
+    
+    def test_exited_threads_release_connections(self):
+        """Test a thread's connection is closed once the thread exits."""
+        seen = []
+        
+        def worker():
+            with self.db.get_connection() as conn:
+                seen.append(conn)
+        
+        for _ in range(20):
+            thread = threading.Thread(target=worker)
+            thread.start()
+            thread.join()
+        
+        with self.db.get_connection():
+            pass
+        self.assertEqual(len(self.db._connections), 1)
+        with self.assertRaises(sqlite3.ProgrammingError):
+            seen[0].execute('SELECT 1')
+    
+    def test_nested_block_joins_outer_transaction(self):
+        """Test a nested block neither commits the outer one nor loses its write."""
+        with self.assertRaises(RuntimeError):
+            with self.db.get_connection(write=True):
+                self.db.record_session('document_recall', 100, 5)
+                raise RuntimeError('abort')
+        self.assertEqual(self.db.get_recent_sessions(), [])
+        
+        self.assertEqual(self.db.get_statistics(), {})
+        with self.db.get_connection():
+            self.db.record_session('document_recall', 100, 5)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 1)
+    
+    def test_close_and_reopen(self):
+        """Test the database keeps working after close()."""
+        self.db.record_session('document_recall', 100, 5, 5, 5)
+        with self.db.get_connection() as before:
+            pass
+        self.db.close()
+        
+        stats = self.db.get_statistics('document_recall')
+        self.assertEqual(stats['sessions_played'], 1)
+        with self.db.get_connection() as after:
+            self.assertIsNot(before, after)
+    
+    def test_context_manager_closes(self):
+        """Test leaving the with-block closes open connections."""
+        with Database(os.path.join(self.temp_dir, 'scoped.db')) as scoped:
+            scoped.record_session('document_recall', 100, 5)
+            with scoped.get_connection() as conn:
+                pass
+        with self.assertRaises(sqlite3.ProgrammingError):
+            conn.execute('SELECT 1')
+
+
+class TestPerformanceProfiles(unittest.TestCase):
+    """Test SQLite performance profiles."""
+    
+    def setUp(self):
+        """Set up a scratch directory for database files."""
+        self.temp_dir = tempfile.mkdtemp()
+    
+    def tearDown(self):
+        """Remove database files."""
+        shutil.rmtree(self.temp_dir)
+    
+    def open_db(self, profile):
+        """Open a file database with the given profile."""
+        db = Database(os.path.join(self.temp_dir, f'{profile}.db'), profile=profile)
+        self.addCleanup(db.close)
+        return db
+    
+    def test_durable_profile(self):
+        """Test the durable profile keeps rollback journaling."""
+        pragmas = self.open_db('durable').get_pragmas()
+        self.assertEqual(pragmas['profile'], 'durable')
+        self.assertEqual(pragmas['journal_mode'], 'DELETE')
+        self.assertEqual(pragmas['synchronous'], 'FULL')
+    
+    def test_balanced_profile(self):
+        """Test the balanced profile enables WAL."""
+        pragmas = self.open_db('balanced').get_pragmas()
+        self.assertEqual(pragmas['journal_mode'], 'WAL')
+        self.assertEqual(pragmas['synchronous'], 'NORMAL')
+    
+    def test_fast_profile(self):
+        """Test the fast profile enlarges caches."""
+        pragmas = self.open_db('fast').get_pragmas()
+        self.assertEqual(pragmas['journal_mode'], 'WAL')
+        self.assertEqual(pragmas['cache_size'], Config.DB_PROFILES['fast']['cache_size'])
+        self.assertEqual(pragmas['temp_store'], 'MEMORY')
+    
+    def test_unknown_profile(self):
+        """Test an unknown profile is rejected."""
+        with self.assertRaises(ValueError):
+            Database(':memory:', profile='turbo')
+
+
+class TestQueryPlans(unittest.TestCase):
+    """Test hot queries are served by indexes rather than full scans."""
+    
+    def setUp(self):
+        """Set up a database with enough rows for the planner to care."""
+        self.db = Database(':memory:')
+        for i in range(50):
+            attempts = self.db.open_attempts('document_recall')
+            for level in range(1, 6):
+                attempts.add(level, 'prompt', 'answer', True, 1000)
+            session_id = self.db.record_session(['document_recall', 'license_plates'][i % 2],
+                                                i, i % 10)
+            attempts.finish(session_id)
+        self.session_id = session_id
+        with self.db.get_connection() as conn:
+            conn.execute('ANALYZE')
+    
+    def capture_plans(self, call):
+        """Run call and return the EXPLAIN QUERY PLAN of every SELECT it issued."""
+        statements = []
+        with self.db.get_connection() as conn:
+            conn.set_trace_callback(lambda sql: statements.append(sql))
+            try:
+                call()
+            finally:
+                conn.set_trace_callback(None)
+            
+            plans = {}
+            for sql in statements:
+                if not sql.lstrip().upper().startswith('SELECT'):
+                    continue
+                # Older Pythons trace the unexpanded statement
+                params = (None,) * sql.count('?')
+                rows = conn.execute('EXPLAIN QUERY PLAN ' + sql, params).fetchall()
+                plans[sql] = [row[3] for row in rows]
+        self.assertTrue(plans, 'no SELECT statements captured')
+        return plans
+    
+    # Tables that grow with history and must never be scanned without an index
+    LARGE_TABLES = ('sessions', 'daily_rollup', 'attempts')
+    
+    def assert_no_session_scan(self, call):
+        """Fail if any query issued by call scans a large table or sorts it without an index."""
+        for sql, plan in self.capture_plans(call).items():
+            for step in plan:
+                for table in self.LARGE_TABLES:
+                    if step.startswith(f'SCAN {table}'):
+                        self.assertIn('USING', step, f'full scan of {table} in: {sql}')
+                self.assertNotIn('TEMP B-TREE FOR ORDER BY', step, f'sort in: {sql}')
+                self.assertNotIn('TEMP B-TREE FOR GROUP BY', step, f'sort in: {sql}')
+    
+    def test_all_session_queries_use_indexes(self):
+        """Test every Database read touching sessions avoids a full scan."""
+        calls = {
+            'get_recent_sessions': lambda: self.db.get_recent_sessions(10),
+            'get_recent_sessions_by_game': lambda: self.db.get_recent_sessions(
+                10, game_type='document_recall'),
+            'get_session_history': lambda: self.db.get_session_history(30),
+            'export_data': self.db.export_data,
+            'verify_statistics': self.db.verify_statistics,
+            'get_session_page': lambda: self.db.get_session_page(page_size=10),
+            'get_session_page_after': lambda: self.db.get_session_page(
+                self.db.get_session_page(page_size=10)['next'], page_size=10),
+            'get_session_page_by_game': lambda: self.db.get_session_page(
+                game_type='license_plates', page_size=10, newest_first=False),
+            'get_score_percentile': lambda: self.db.get_score_percentile('document_recall', 20),
+            'get_attempts': lambda: self.db.get_attempts(self.session_id),
+            'get_recent_attempts': lambda: self.db.get_attempts(limit=10),
+        }
+        for name, call in calls.items():
+            with self.subTest(method=name):
+                self.assert_no_session_scan(call)
+    
+    def test_small_table_lookups_use_primary_keys(self):
+        """Test keyed reads on the small tables are primary-key searches."""
+        calls = [
+            lambda: self.db.get_statistics('document_recall'),
+            lambda: self.db.get_user_data('theme'),
+            lambda: self.db.get_daily_challenge('2025-01-01'),
+        ]
+        for call in calls:
+            for sql, plan in self.capture_plans(call).items():
+                self.assertTrue(all(step.startswith('SEARCH') for step in plan), sql)
+    
+    def test_migration_records_version(self):
+        """Test migrations are recorded and not re-applied."""
+        with self.db.get_connection() as conn:
+            version = conn.execute('PRAGMA user_version').fetchone()[0]
+        self.assertEqual(version, len(Database.MIGRATIONS))
+        self.db.init_database()
+        with self.db.get_connection() as conn:
+            indexes = [row[0] for row in conn.execute(
+                "SELECT name FROM sqlite_master WHERE type = 'index' AND tbl_name = 'sessions'")]
+        self.assertIn('idx_sessions_user_game_ts', indexes)
+        self.assertIn('idx_sessions_ts', indexes)
+
+
+class TestStatisticsRebuild(unittest.TestCase):
+    """Test rebuilding and verifying statistics against sessions."""
+    
+    def setUp(self):
+        """Set up test database with sessions for two games."""
+        self.db = Database(':memory:')
+        for i in range(6):
+            self.db.record_session(['document_recall', 'license_plates'][i % 2], 10 * i, i, i, 10)
+    
+    def corrupt(self, sql):
+        """Change the statistics table behind the database's back."""
+        with self.db.get_connection(write=True) as conn:
+            conn.execute(sql)
+    
+    def test_recorded_statistics_verify(self):
+        """Test statistics kept by record_session match a recomputation."""
+        self.assertEqual(self.db.verify_statistics(), [])
+    
+    def test_future_last_played_is_kept(self):
+        """Test a later session does not move last_played back behind a clock that ran ahead."""
+        ahead = epoch_ms() + 3600 * 1000
+        self.db.record_sessions([{'game_type': 'document_recall', 'score': 5, 'level': 1,
+                                  'ts_ms': ahead}])
+        self.db.record_session('document_recall', 5, 1)
+        self.assertEqual(self.db.verify_statistics(), [])
+    
+    def test_verify_reports_discrepancies(self):
+        """Test drifted values, missing and extra game types are each reported."""
+        self.corrupt("UPDATE statistics SET total_score = total_score + 5 "
+                     "WHERE game_type = 'document_recall'")
+        self.corrupt("DELETE FROM statistics WHERE game_type = 'license_plates'")
+        self.corrupt("INSERT INTO statistics (user_id, game_type, sessions_played) "
+                     "VALUES (1, 'ghost', 3)")
+        
+        found = {(d['game_type'], d['column']): d for d in self.db.verify_statistics()}
+        self.assertEqual(found[('document_recall', 'total_score')]['stored'] -
+                         found[('document_recall', 'total_score')]['expected'], 5)
+        self.assertEqual(found[('license_plates', 'sessions_played')]['expected'], 3)
+        self.assertIsNone(found[('license_plates', 'sessions_played')]['stored'])
+        self.assertIsNone(found[('ghost', 'sessions_played')]['expected'])
+        self.assertNotIn(('document_recall', 'best_score'), found)
+    
+    def test_rebuild_repairs_statistics(self):
+        """Test a rebuild replaces every row with recomputed totals."""
+        expected = self.db.get_statistics()
+        self.corrupt("UPDATE statistics SET sessions_played = 0, best_level = 99")
+        self.corrupt("INSERT INTO statistics (user_id, game_type, sessions_played) "
+                     "VALUES (1, 'ghost', 3)")
+        
+        self.assertEqual(self.db.rebuild_statistics(), 2)
+        self.assertEqual(self.db.verify_statistics(), [])
+        self.assertEqual(self.db.get_statistics(), expected)
+        self.db.record_session('document_recall', 1, 1)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 4)
+
+
+class TestUsers(unittest.TestCase):
+    """Test per-user data in one shared database."""
+    
+    def setUp(self):
+        """Set up a database with a second trainee."""
+        self.db = Database(':memory:')
+        self.alice = self.db.add_user('alice')
+    
+    def test_add_user(self):
+        """Test users get new ids and a taken name returns the existing one."""
+        self.assertNotEqual(self.alice, Database.DEFAULT_USER_ID)
+        self.assertEqual(self.db.add_user('alice'), self.alice)
+        self.assertEqual([user['name'] for user in self.db.get_users()], ['default', 'alice'])
+        with self.assertRaises(ValueError):
+            self.db.set_user(999)
+    
+    def test_data_is_kept_per_user(self):
+        """Test sessions, statistics, history, achievements and settings stay with their user."""
+        self.db.record_session('document_recall', 300, 12)
+        self.db.set_user_data('theme', 'dark')
+        self.assertIn('first_steps', self.db.check_achievements({}))
+        
+        self.db.set_user(self.alice)
+        self.assertEqual(self.db.get_statistics(), {})
+        self.assertEqual(self.db.get_recent_sessions(), [])
+        self.assertEqual(self.db.get_session_history(), [])
+        self.assertEqual(self.db.get_achievements(), {})
+        self.assertIsNone(self.db.get_user_data('theme'))
+        self.db.record_session('license_plates', 10, 1)
+        self.assertEqual(self.db.check_achievements({}), ['first_steps'])
+        self.assertEqual(list(self.db.get_statistics()), ['license_plates'])
+        
+        self.db.set_user(Database.DEFAULT_USER_ID)
+        self.assertEqual(list(self.db.get_statistics()), ['document_recall'])
+        self.assertEqual(self.db.get_user_data('theme'), 'dark')
+        self.assertEqual(self.db.verify_statistics(), [])
+        self.assertEqual(self.db.rebuild_statistics(), 2)
+    
+    def test_batches_and_writer_keep_their_user(self):
+        """Test record_sessions honours user_id and the writer keeps the submitting user."""
+        self.db.record_sessions([{'game_type': 'document_recall', 'score': 5, 'level': 1},
+                                 {'game_type': 'document_recall', 'score': 7, 'level': 2,
+                                  'user_id': self.alice}])
+        future = self.db.record_session_async('face_recognition', 1, 1)
+        self.db.set_user(self.alice)
+        future.result(timeout=5)
+        self.db.writer.close()
+        
+        self.assertEqual(self.db.get_statistics('document_recall')['best_score'], 7)
+        self.assertNotIn('face_recognition', self.db.get_statistics())
+        self.db.set_user(Database.DEFAULT_USER_ID)
+        self.assertEqual(self.db.get_statistics('document_recall')['best_score'], 5)
+        self.assertIn('face_recognition', self.db.get_statistics())
+    
+    def test_user_store_follows_set_user(self):
+        """Test the user data store flushes for the old user and reloads for the new one."""
+        store = self.db.open_user_store(flush_interval=3600)
+        store.set('volume', 3)
+        self.db.set_user(self.alice)
+        self.assertIsNone(store.get('volume'))
+        store.set('volume', 7)
+        self.db.set_user(Database.DEFAULT_USER_ID)
+        self.assertEqual(store.get('volume'), 3)
+        store.close()
+    
+    def test_export_imports_into_current_user(self):
+        """Test an export holds one user's data and imports into the current user."""
+        self.db.record_session('document_recall', 100, 5)
+        self.db.set_user(self.alice)
+        self.db.record_session('license_plates', 10, 1)
+        exported = self.db.export_data()
+        self.assertEqual([row['game_type'] for row in exported['sessions']], ['license_plates'])
+        
+        self.db.set_user(self.db.add_user('bob'))
+        self.assertEqual(self.db.import_data(exported), 1)
+        self.assertEqual(list(self.db.get_statistics()), ['license_plates'])
+        self.db.set_user(Database.DEFAULT_USER_ID)
+        self.db.import_data({'sessions': []}, merge=False)
+        self.assertEqual(self.db.get_statistics(), {})
+        self.db.set_user(self.alice)
+        self.assertEqual(list(self.db.get_statistics()), ['license_plates'])
+    
+    def test_per_user_queries_use_user_indexes(self):
+        """Test recent-session reads seek to the user instead of scanning or sorting."""
+        for sql, index in (
+                ('SELECT * FROM main.sessions WHERE user_id = 2 ORDER BY ts_ms DESC LIMIT 10',
+                 'idx_sessions_user_ts'),
+                ("SELECT * FROM main.sessions WHERE user_id = 2 AND game_type = 'x' "
+                 "ORDER BY ts_ms DESC LIMIT 10", 'idx_sessions_user_game_ts')):
+            plan = '\n'.join(self.db.explain(sql))
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+    
+    def test_migrates_single_user_database(self):
+        """Test data from before users is given to the default user."""
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'legacy.db')
+            conn = sqlite3.connect(path)
+            conn.execute(TestEpochTimestamps.LEGACY_SESSIONS)
+            conn.execute("INSERT INTO sessions (game_type, score, level_reached) "
+                         "VALUES ('document_recall', 50, 4)")
+            conn.execute('CREATE TABLE user_data (key TEXT PRIMARY KEY, value TEXT, '
+                         'updated_at DATETIME)')
+            conn.execute("INSERT INTO user_data (key, value) VALUES ('theme', '\"dark\"')")
+            conn.commit()
+            conn.close()
+            
+            with Database(path) as db:
+                self.assertEqual(db.user_id, Database.DEFAULT_USER_ID)
+                self.assertEqual(db.get_statistics('document_recall')['sessions_played'], 1)
+                self.assertEqual(db.get_recent_sessions()[0]['user_id'], Database.DEFAULT_USER_ID)
+                self.assertEqual(db.get_user_data('theme'), 'dark')
+                db.set_user(db.add_user('alice'))
+                self.assertEqual(db.get_recent_sessions(), [])
+        finally:
+            shutil.rmtree(temp_dir)
+
+
+class TestSessionPages(unittest.TestCase):
+    """Test keyset-paginated session browsing."""
+    
+    def setUp(self):
+        """Set up 25 sessions whose times repeat, so pages split ties."""
+        self.db = Database(':memory:')
+        self.db.record_sessions({'game_type': ['document_recall', 'license_plates'][i % 2],
+                                 'score': i, 'level': 1, 'ts_ms': 1_000_000 + i // 3 * 1000}
+                                for i in range(25))
+        self.newest_first = [row['id'] for row in self.db.get_recent_sessions(100)]
+    
+    def test_pages_cover_every_session_once(self):
+        """Test following next tokens lists each session once, in order, both ways."""
+        ids, token = [], None
+        while True:
+            page = self.db.get_session_page(token, page_size=4)
+            self.assertLessEqual(len(page['sessions']), 4)
+            ids += [row['id'] for row in page['sessions']]
+            token = page['next']
+            if token is None:
+                break
+        self.assertEqual(ids, self.newest_first)
+        self.assertEqual([row['id'] for row in self.db.iter_sessions(page_size=3,
+                                                                     newest_first=False)],
+                         self.newest_first[::-1])
+    
+    def test_previous_and_positions(self):
+        """Test previous tokens read back and (ts_ms, id) positions seek like tokens."""
+        first = self.db.get_session_page(page_size=5)
+        self.assertIsNone(first['previous'])
+        second = self.db.get_session_page(first['next'], page_size=5)
+        back = self.db.get_session_page(second['previous'], page_size=5)
+        self.assertEqual([row['id'] for row in back['sessions']], self.newest_first[4::-1])
+        
+        last = first['sessions'][-1]
+        by_position = self.db.get_session_page((last['ts_ms'], last['id']), page_size=5)
+        self.assertEqual(by_position['sessions'], second['sessions'])
+    
+    def test_filters_and_bad_tokens(self):
+        """Test game_type narrows pages and malformed tokens are rejected."""
+        rows = list(self.db.iter_sessions(game_type='license_plates', page_size=2))
+        self.assertEqual(len(rows), 12)
+        self.assertTrue(all(row['game_type'] == 'license_plates' for row in rows))
+        for token in ('', 'x1.2', 'o12', 'ozz.1'):
+            with self.assertRaises(ValueError):
+                self.db.get_session_page(token)
+        with self.assertRaises(ValueError):
+            self.db.get_session_page(page_size=0)
+    
+    def test_pages_seek_the_index(self):
+        """Test a page past a position is an index range read, not a sort."""
+        for game_type, index in ((None, 'idx_sessions_user_ts'),
+                                 ('document_recall', 'idx_sessions_user_game_ts')):
+            self.db.enable_profiling(slow_ms=0)
+            self.db.get_session_page((1_005_000, 10), game_type=game_type)
+            entry = self.db.slow_queries(explain=True)[-1]
+            self.db.disable_profiling()
+            plan = '\n'.join(step for steps in entry['plans'] for step in steps)
+            self.assertIn(index, plan)
+            self.assertNotIn('TEMP B-TREE', plan)
+
+
+class TestScorePercentile(unittest.TestCase):
+    """Test score percentiles served from the score histogram."""
+    
+    def setUp(self):
+        """Set up sessions scoring 10, 20, ... 100 in one game."""
+        self.db = Database(':memory:')
+        for score in range(10, 60, 10):
+            self.db.record_session('document_recall', score, 1)
+        self.db.record_sessions({'game_type': 'document_recall', 'score': score, 'level': 1}
+                                for score in range(60, 110, 10))
+    
+    def raw_percentile(self, game_type, score):
+        """Count sessions below score directly."""
+        with self.db.get_connection() as conn:
+            below, total = conn.execute('''
+                SELECT SUM(score < ?), COUNT(*) FROM sessions
+                WHERE user_id = ? AND game_type = ?
+            ''', (score, self.db.user_id, game_type)).fetchone()
+        return 100.0 * below / total
+    
+    def test_percentile_matches_sessions(self):
+        """Test the histogram agrees with counting sessions."""
+        for score in (0, 10, 50, 60, 100, 250):
+            self.assertAlmostEqual(self.db.get_score_percentile('document_recall', score),
+                                   self.raw_percentile('document_recall', score))
+        self.assertEqual(self.db.get_score_percentile('document_recall', 90), 80.0)
+        self.assertIsNone(self.db.get_score_percentile('license_plates', 90))
+    
+    def test_percentile_is_per_user(self):
+        """Test another user's runs do not count."""
+        self.db.set_user(self.db.add_user('alice'))
+        self.assertIsNone(self.db.get_score_percentile('document_recall', 50))
+        self.db.record_session('document_recall', 40, 1)
+        self.assertEqual(self.db.get_score_percentile('document_recall', 50), 100.0)
+    
+    def test_import_and_migration_rebuild_histogram(self):
+        """Test imports and the migration recompute the histogram from sessions."""
+        exported = self.db.export_data()
+        self.db.set_user(self.db.add_user('alice'))
+        self.db.import_data(exported)
+        self.assertEqual(self.db.get_score_percentile('document_recall', 90), 80.0)
+        
+        with self.db.get_connection(write=True) as conn:
+            conn.execute('DROP TABLE score_histogram')
+            version = Database.MIGRATIONS.index('_migrate_score_histogram')
+            conn.execute(f'PRAGMA user_version = {version}')
+        self.db.init_database()
+        self.assertEqual(self.db.get_score_percentile('document_recall', 90), 80.0)
+        self.db.set_user(Database.DEFAULT_USER_ID)
+        self.assertEqual(self.db.get_score_percentile('document_recall', 60), 50.0)
+
+
+class TestAttempts(unittest.TestCase):
+    """Test buffered round attempts."""
+    
+    def setUp(self):
+        """Set up an in-memory database."""
+        self.db = Database(':memory:')
+    
+    def count_attempts(self):
+        """Count attempt rows directly."""
+        with self.db.get_connection() as conn:
+            return conn.execute('SELECT COUNT(*) FROM attempts').fetchone()[0]
+    
+    def test_flushes_every_n_rounds(self):
+        """Test rounds reach the table in batches of flush_every."""
+        attempts = self.db.open_attempts('number_memory', flush_every=3)
+        for level in range(1, 6):
+            attempts.add(level, '1234', '1234', True, 900)
+        self.assertEqual(self.count_attempts(), 3)
+        self.assertEqual(attempts.stats(), {'buffered': 2, 'written': 3, 'flushes': 1})
+        attempts.close()
+        self.assertEqual(self.count_attempts(), 5)
+        with self.assertRaises(RuntimeError):
+            attempts.add(6, '1234', '1234', True)
+    
+    def test_finish_links_rounds_to_session(self):
+        """Test finish() links rounds flushed before the session was recorded."""
+        attempts = self.db.open_attempts('number_memory', flush_every=2)
+        for level in range(1, 6):
+            attempts.add(level, str(level), str(level) if level < 5 else '0', level < 5)
+        session_id = self.db.record_session('number_memory', 40, 4)
+        self.assertEqual(attempts.finish(session_id), 5)
+        
+        rounds = self.db.get_attempts(session_id)
+        self.assertEqual([row['level'] for row in rounds], [1, 2, 3, 4, 5])
+        self.assertEqual([row['correct'] for row in rounds], [1, 1, 1, 1, 0])
+        self.assertEqual(rounds[-1]['answer'], '0')
+        self.assertEqual(len(self.db.get_attempts(limit=3)), 3)
+    
+    def test_rounds_belong_to_opening_user(self):
+        """Test rounds are written for the user current when the buffer was opened."""
+        attempts = self.db.open_attempts('number_memory')
+        attempts.add(1, '12', '12', True)
+        self.db.set_user(self.db.add_user('alice'))
+        attempts.finish()
+        self.assertEqual(self.db.get_attempts(), [])
+        self.db.set_user(Database.DEFAULT_USER_ID)
+        self.assertEqual(len(self.db.get_attempts()), 1)
+        self.assertIsNone(self.db.get_attempts()[0]['session_id'])
+
+
+class TestMultiProcessWrites(unittest.TestCase):
+    """Test immediate write transactions and busy retries across connections."""
+    
+    def setUp(self):
+        """Set up a file database and a second connection to hold its lock."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'test.db')
+        Database(self.db_file).close()
+        self.other = sqlite3.connect(self.db_file, check_same_thread=False)
+    
+    def tearDown(self):
+        """Close connections and remove the database file."""
+        self.other.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def hold_lock(self, seconds):
+        """Take the write lock on the other connection and release it after seconds."""
+        self.other.execute('BEGIN IMMEDIATE')
+        timer = threading.Timer(seconds, self.other.rollback)
+        timer.start()
+        return timer
+    
+    def test_retries_until_lock_is_released(self):
+        """Test a write waits out another writer's lock with backoff."""
+        with Database(self.db_file, busy_timeout=0, multi_process=True) as db:
+            self.hold_lock(0.2)
+            db.record_session('document_recall', 100, 5)
+            self.assertEqual(len(db.get_recent_sessions()), 1)
+    
+    def test_default_mode_fails_fast(self):
+        """Test without multi_process a locked database raises once the timeout runs out."""
+        with Database(self.db_file, busy_timeout=0) as db:
+            self.other.execute('BEGIN IMMEDIATE')
+            try:
+                with self.assertRaises(sqlite3.OperationalError) as caught:
+                    db.record_session('document_recall', 100, 5)
+                self.assertTrue(is_busy_error(caught.exception))
+            finally:
+                self.other.rollback()
+    
+    def test_gives_up_after_retries(self):
+        """Test retries stop after WRITE_RETRIES and other errors are not retried."""
+        with Database(self.db_file, busy_timeout=0, multi_process=True) as db:
+            db.WRITE_RETRIES = 2
+            self.other.execute('BEGIN IMMEDIATE')
+            try:
+                with self.assertRaises(sqlite3.OperationalError):
+                    db.record_session('document_recall', 100, 5)
+            finally:
+                self.other.rollback()
+            self.assertEqual(db.get_recent_sessions(), [])
+        self.assertFalse(is_busy_error(sqlite3.OperationalError('no such table: missing')))
+    
+    def test_concurrent_processes_lose_nothing(self):
+        """Test writers in separate processes record every session."""
+        result = run_stress(self.db_file, writers=4, sessions=25, busy_timeout=0)
+        self.assertEqual(result['failed'], 0)
+        self.assertEqual(result['stored'], 100)
+        self.assertEqual(result['lost'], 0)
+        self.assertTrue(result['statistics_consistent'])
+    
+    def test_instances_see_each_others_writes(self):
+        """Test cached reads and achievement counters follow another instance's commits."""
+        with Database(self.db_file, multi_process=True) as first, \
+                Database(self.db_file, multi_process=True) as second:
+            first.record_session('document_recall', 10, 1)
+            self.assertEqual(first.get_statistics('document_recall')['sessions_played'], 1)
+            for _ in range(3):
+                second.record_session('document_recall', 10, 1)
+            self.assertEqual(first.get_statistics('document_recall')['sessions_played'], 4)
+            
+            first.record_session('document_recall', 10, 1)
+            self.assertEqual(first.get_achievement_progress()['dedicated'], 50)
+            self.assertEqual(first.check_achievements({}), ['first_steps'])
+
+
+class TestSessionWriter(unittest.TestCase):
+    """Test the write-behind session writer."""
+    
+    def setUp(self):
+        """Set up a file-backed test database."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.temp_dir, 'test.db'))
+    
+    def tearDown(self):
+        """Stop the writer and remove the database file."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def test_async_record_resolves_future(self):
+        """Test queued sessions resolve to their ids."""
+        future = self.db.record_session_async('document_recall', 100, 5, 5, 5)
+        session_id = future.result(timeout=5)
+        self.assertGreater(session_id, 0)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 1)
+    
+    def test_callback_and_batching(self):
+        """Test callbacks fire and many sessions are grouped into few batches."""
+        results = []
+        writer = self.db.start_writer(batch_size=50)
+        for i in range(200):
+            writer.submit('license_plates', i, 1, callback=lambda f: results.append(f.result()))
+        writer.flush()
+        
+        self.assertEqual(len(results), 200)
+        stats = writer.stats()
+        self.assertEqual(stats['sessions_written'], 200)
+        self.assertEqual(stats['queue_depth'], 0)
+        self.assertLessEqual(stats['batches'], 200)
+        self.assertGreaterEqual(stats['max_latency_ms'], stats['avg_latency_ms'])
+    
+    def test_close_flushes_pending(self):
+        """Test closing the database commits queued sessions."""
+        for i in range(20):
+            self.db.record_session_async('face_recognition', i, 1)
+        self.db.close()
+        self.assertEqual(self.db.get_statistics('face_recognition')['sessions_played'], 20)
+    
+    def test_failed_session_does_not_fail_batch(self):
+        """Test one bad session only fails its own future."""
+        writer = self.db.start_writer()
+        good = writer.submit('document_recall', 10, 1)
+        bad = writer.submit(None, 10, 1)
+        writer.flush()
+        
+        self.assertGreater(good.result(timeout=5), 0)
+        with self.assertRaises(sqlite3.IntegrityError):
+            bad.result(timeout=5)
+        self.assertEqual(writer.stats()['sessions_failed'], 1)
+    
+    def test_cancelled_future_is_skipped(self):
+        """Test a session cancelled while queued is not written and the writer keeps going."""
+        db = Database(':memory:')
+        writer = db.start_writer()
+        with db._persistent_lock:
+            # The writer takes the first session and waits for the connection
+            first = writer.submit('document_recall', 10, 1)
+            while not first.running():
+                time.sleep(0.001)
+            cancelled = writer.submit('document_recall', 20, 1)
+            self.assertTrue(cancelled.cancel())
+        writer.flush()
+        
+        self.assertGreater(first.result(timeout=5), 0)
+        self.assertGreater(writer.submit('document_recall', 30, 1).result(timeout=5), 0)
+        self.assertTrue(writer._thread.is_alive())
+        self.assertEqual(db.get_statistics('document_recall')['sessions_played'], 2)
+        db.close()
+    
+    def test_in_memory_database(self):
+        """Test the writer shares the in-memory connection safely."""
+        db = Database(':memory:')
+        futures = [db.record_session_async('document_recall', i, 1) for i in range(50)]
+        db.writer.flush()
+        self.assertEqual(len({f.result() for f in futures}), 50)
+        self.assertEqual(db.get_statistics('document_recall')['sessions_played'], 50)
+        db.close()
+
+
+class TestAchievements(unittest.TestCase):
+    """Test incremental achievement evaluation."""
+    
+    def setUp(self):
+        """Set up test database."""
+        self.db = Database(':memory:')
+    
+    def test_unlocked_with_session(self):
+        """Test achievements are stored in the session's own transaction."""
+        self.db.record_session('document_recall', 250, 5, 5, 5)
+        unlocked = self.db.get_achievements()
+        for achievement_id in ('first_steps', 'level_5', 'perfect_score'):
+            self.assertIn(achievement_id, unlocked)
+        
+        newly = self.db.check_achievements({'score': 250, 'level': 5})
+        self.assertEqual(sorted(newly), ['first_steps', 'level_5', 'perfect_score'])
+        self.assertEqual(self.db.check_achievements({'score': 250, 'level': 5}), [])
+    
+    def test_progress_tracked_for_locked_achievements(self):
+        """Test the progress column fills in as sessions are recorded."""
+        for game_type in ('document_recall', 'license_plates', 'face_recognition'):
+            self.db.record_session(game_type, 10, 2)
+        
+        progress = self.db.get_achievement_progress()
+        self.assertEqual(progress['dedicated'], 30)
+        self.assertEqual(progress['master'], 6)
+        self.assertEqual(progress['all_modules'], 50)
+        self.assertEqual(progress['level_5'], 40)
+        self.assertNotIn('dedicated', self.db.get_achievements())
+    
+    def test_streak_and_score_from_session_data(self):
+        """Test streaks passed to record_session or check_achievements unlock."""
+        self.db.record_session('document_recall', 10, 1, streak=6)
+        self.assertIn('streak_5', self.db.check_achievements({'score': 10}))
+        self.assertEqual(self.db.check_achievements({'score': 10, 'streak': 12}), ['streak_10'])
+    
+    def test_no_queries_after_warm_up(self):
+        """Test recording a session does not re-read statistics or achievements."""
+        self.db.record_session('document_recall', 10, 1)
+        statements = []
+        with self.db.get_connection() as conn:
+            conn.set_trace_callback(lambda sql: statements.append(sql))
+        self.db.record_session('document_recall', 20, 2)
+        with self.db.get_connection() as conn:
+            conn.set_trace_callback(None)
+        self.assertFalse([sql for sql in statements if sql.lstrip().upper().startswith('SELECT')])
+    
+    def test_state_survives_reload_and_rollback(self):
+        """Test counters match the database after a failed transaction."""
+        for _ in range(9):
+            self.db.record_session('document_recall', 10, 1)
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.record_session(None, 10, 1)
+        
+        self.db.record_session('document_recall', 10, 1)
+        self.assertIn('dedicated', self.db.get_achievements())
+    
+    def test_streak_progress_survives_restart(self):
+        """Test locked streak achievements keep their progress when counters are reloaded."""
+        self.db.record_session('document_recall', 10, 1, streak=4)
+        self.db._achievements.clear()
+        self.db.record_session('document_recall', 10, 1)
+        progress = self.db.get_achievement_progress()
+        self.assertEqual((progress['streak_5'], progress['streak_10']), (80, 40))
+        self.db.record_session('document_recall', 10, 1, streak=5)
+        self.assertIn('streak_5', self.db.get_achievements())
+        self.assertEqual(self.db.get_achievement_progress()['streak_10'], 50)
+    
+    def test_bulk_recording_unlocks(self):
+        """Test record_sessions evaluates achievements once for the batch."""
+        self.db.record_sessions({'game_type': 'map_memorization', 'score': 5, 'level': 10}
+                                for _ in range(10))
+        newly = self.db.check_achievements({})
+        for achievement_id in ('first_steps', 'dedicated', 'level_5', 'level_10'):
+            self.assertIn(achievement_id, newly)
+    
+    def test_unreported_unlocks_survive_reload(self):
+        """Test committed unlocks are still reported after the counters are dropped."""
+        reloads = {
+            'unlock_achievement': lambda: self.db.unlock_achievement('x'),
+            'record_sessions': lambda: self.db.record_sessions(
+                [{'game_type': 'document_codes', 'score': 10, 'level': 1}]),
+            'import_data': lambda: self.db.import_data({'sessions': []}),
+            'rebuild_statistics': lambda: self.db.rebuild_statistics(),
+            'rollback': lambda: self.db.record_session(None, 10, 1),
+        }
+        for name, reload in reloads.items():
+            with self.subTest(name):
+                self.db = Database(':memory:')
+                self.db.record_session('document_codes', 10, 1)
+                try:
+                    reload()
+                except sqlite3.IntegrityError:
+                    pass
+                self.assertEqual(self.db.check_achievements({}), ['first_steps'])
+                self.db.close()
+    
+    def test_unreported_unlocks_survive_writer_fallback(self):
+        """Test a failed writer batch does not lose unlocks committed before it."""
+        self.db.record_session('document_codes', 10, 1)
+        writer = self.db.start_writer()
+        writer.submit('document_codes', 10, 1)
+        writer.submit(None, 10, 1)
+        writer.flush()
+        self.assertEqual(self.db.check_achievements({}), ['first_steps'])
+        self.db.close()
+    
+    def test_rolled_back_unlocks_not_reported(self):
+        """Test an unlock whose transaction rolled back is reported only once it commits."""
+        with self.assertRaises(RuntimeError):
+            with self.db.get_connection(write=True):
+                self.db.record_session('document_codes', 10, 1)
+                raise RuntimeError('abort')
+        self.assertEqual(self.db.check_achievements({}), [])
+        
+        self.db.record_session('document_codes', 10, 1)
+        self.assertEqual(self.db.check_achievements({}), ['first_steps'])
+
+
+class TestStreamingExport(unittest.TestCase):
+    """Test streaming JSON export."""
+    
+    def setUp(self):
+        """Set up a database with some history."""
+        self.db = Database(':memory:')
+        self.db.record_sessions({'game_type': 'document_recall', 'score': i, 'level': 1 + i % 7,
+                                 'timestamp': f'2025-01-{1 + i % 28:02d} 12:00:00'}
+                                for i in range(250))
+        self.db.set_user_data('theme', {'name': 'dark'})
+    
+    def test_matches_export_data(self):
+        """Test the streamed document parses to the same data as export_data."""
+        buffer = io.StringIO()
+        count = self.db.export_stream(buffer, batch_size=16)
+        self.assertEqual(count, 250)
+        
+        streamed = json.loads(buffer.getvalue())
+        exported = self.db.export_data()
+        for key in ('sessions', 'statistics', 'achievements', 'user_data'):
+            self.assertEqual(streamed[key], exported[key], key)
+    
+    def test_round_trip_through_import(self):
+        """Test a streamed export can be imported."""
+        buffer = io.StringIO()
+        self.db.export_stream(buffer)
+        
+        new_db = Database(':memory:')
+        new_db.import_data(json.loads(buffer.getvalue()), merge=False)
+        self.assertEqual(new_db.get_statistics('document_recall')['sessions_played'], 250)
+        self.assertEqual(new_db.get_user_data('theme'), {'name': 'dark'})
+    
+    def test_empty_database(self):
+        """Test exporting an empty database produces valid JSON."""
+        buffer = io.StringIO()
+        self.assertEqual(Database(':memory:').export_stream(buffer), 0)
+        self.assertEqual(json.loads(buffer.getvalue())['sessions'], [])
+
+
+class TestDataPack(unittest.TestCase):
+    """Test the compressed pack export and import."""
+    
+    def setUp(self):
+        """Set up a database with sessions, achievements and user data."""
+        self.db = Database(':memory:')
+        self.db.record_sessions({'game_type': ['document_recall', 'face_recognition'][i % 2],
+                                 'score': i % 250, 'level': 1 + i % 12, 'correct': i % 7,
+                                 'total': 7, 'ts_ms': 1_700_000_000_000 + i * 60_000}
+                                for i in range(2500))
+        self.db.unlock_achievement('streak_10')
+        self.db.set_user_data('theme', 'blue')
+        self.db.set_user_data('volume', {'music': 3})
+    
+    def pack(self, **options):
+        """Export the database to an in-memory pack."""
+        buffer = io.BytesIO()
+        self.db.export_pack(buffer, **options)
+        buffer.seek(0)
+        return buffer
+    
+    def test_round_trip(self):
+        """Test every codec restores the same sessions, statistics and user data."""
+        expected = self.db.export_data()
+        for codec in ('zlib', 'lzma', 'none'):
+            with self.subTest(codec=codec):
+                target = Database(':memory:')
+                count = target.import_pack(self.pack(codec=codec, chunk_rows=300))
+                self.assertEqual(count, 2500)
+                restored = target.export_data()
+                for section in ('sessions', 'statistics', 'achievements', 'user_data'):
+                    self.assertEqual(restored[section], expected[section], section)
+    
+    def test_header_and_size(self):
+        """Test the header describes the tables and the pack is smaller than JSON."""
+        buffer = self.pack(chunk_rows=1000)
+        reader = PackReader(buffer)
+        self.assertEqual(reader.header['codec'], 'zlib')
+        self.assertEqual(reader.header['schema_version'], len(Database.MIGRATIONS))
+        self.assertEqual(reader.header['tables']['sessions']['rows'], 2500)
+        self.assertIn('ts_ms', reader.columns('sessions'))
+        frames = [(table, len(rows)) for table, rows in reader.frames()]
+        self.assertEqual([n for table, n in frames if table == 'sessions'], [1000, 1000, 500])
+        
+        json_size = len(json.dumps(self.db.export_data()))
+        self.assertLess(len(buffer.getvalue()) * 5, json_size)
+    
+    def test_progress_reports_total(self):
+        """Test import progress knows the session count from the header."""
+        seen = []
+        target = Database(':memory:')
+        target.import_pack(self.pack(), progress=lambda done, total: seen.append((done, total)))
+        self.assertEqual(seen[-1], (2500, 2500))
+    
+    def test_rejects_bad_streams(self):
+        """Test corrupt, truncated and newer packs are refused."""
+        target = Database(':memory:')
+        with self.assertRaises(PackError):
+            target.import_pack(io.BytesIO(b'{"sessions": []}'))
+        with self.assertRaises(PackError):
+            target.import_pack(io.BytesIO(self.pack().getvalue()[:-100]))
+        corrupt = self.pack()
+        PackReader(corrupt)
+        data = bytearray(corrupt.getvalue())
+        data[corrupt.tell()] = 200  # first frame's table index
+        with self.assertRaises(PackError):
+            target.import_pack(io.BytesIO(bytes(data)))
+        self.assertEqual(target.get_statistics(), {})
+        
+        newer = io.BytesIO()
+        PackWriter(newer, {}, schema_version=len(Database.MIGRATIONS) + 1).close()
+        newer.seek(0)
+        with self.assertRaises(PackError):
+            target.import_pack(newer)
+
+
+class TestBatchedImport(unittest.TestCase):
+    """Test batched import with statistics recomputation."""
+    
+    def setUp(self):
+        """Set up a source database and its export."""
+        source = Database(':memory:')
+        source.record_sessions({'game_type': ['document_recall', 'license_plates'][i % 2],
+                                'score': i, 'level': 1 + i % 9, 'correct': 1, 'total': 2}
+                               for i in range(100))
+        self.exported = source.export_data()
+        self.db = Database(':memory:')
+    
+    def test_merge_does_not_trust_statistics_block(self):
+        """Test merged statistics are recomputed rather than overwritten."""
+        self.db.record_session('document_recall', 500, 12, 3, 3)
+        self.exported['statistics']['document_recall']['sessions_played'] = 999
+        self.db.import_data(self.exported, merge=True)
+        
+        stats = self.db.get_statistics('document_recall')
+        self.assertEqual(stats['sessions_played'], 51)
+        self.assertEqual(stats['best_score'], 500)
+        self.assertEqual(stats['best_level'], 12)
+        self.assertEqual(stats['total_attempts'], 50 * 2 + 3)
+    
+    def test_progress_callback(self):
+        """Test progress is reported once per batch."""
+        calls = []
+        count = self.db.import_data(self.exported, merge=False, batch_size=30,
+                                    progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(count, 100)
+        self.assertEqual(calls, [(30, 100), (60, 100), (90, 100), (100, 100)])
+    
+    def test_iterator_sessions(self):
+        """Test sessions may be any iterable, with an unknown total."""
+        calls = []
+        data = dict(self.exported, sessions=iter(self.exported['sessions']))
+        self.db.import_data(data, merge=False, batch_size=64,
+                            progress=lambda done, total: calls.append((done, total)))
+        self.assertEqual(calls, [(64, None), (100, None)])
+        self.assertEqual(self.db.get_statistics('license_plates')['sessions_played'], 50)
+    
+    def test_import_joins_enclosing_transaction(self):
+        """Test an import inside a failed write block is rolled back with it."""
+        with self.assertRaises(RuntimeError):
+            with self.db.get_connection(write=True):
+                self.db.import_data(self.exported, merge=False)
+                raise RuntimeError('abort')
+        self.assertEqual(self.db.get_recent_sessions(), [])
+        self.assertEqual(self.db.get_statistics(), {})
+    
+    def test_failed_import_rolls_back(self):
+        """Test a bad session leaves the database unchanged."""
+        self.db.record_session('document_recall', 10, 1)
+        self.exported['sessions'].append({'score': 1, 'level_reached': 1})
+        with self.assertRaises(sqlite3.IntegrityError):
+            self.db.import_data(self.exported, merge=False)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 1)
+        self.assertEqual(len(self.db.get_recent_sessions(limit=500)), 1)
+
+
+class TestDailyRollup(unittest.TestCase):
+    """Test the materialised daily rollup behind get_session_history."""
+    
+    RAW_HISTORY = '''
+        SELECT local_day, COUNT(*) as sessions, SUM(score) as total_score,
+               AVG(score) as avg_score, MAX(level_reached) as max_level
+        FROM sessions
+        WHERE local_day >= ?
+        GROUP BY local_day
+        ORDER BY local_day DESC
+    '''
+    
+    def setUp(self):
+        """Set up a database with sessions spread over recent local days."""
+        self.db = Database(':memory:')
+        morning = datetime.now().replace(hour=8, minute=0, second=0, microsecond=0)
+        times = [int((morning - timedelta(days=offset)).timestamp() * 1000)
+                 for offset in (0, 1, 2, 5, 40)]
+        self.db.record_sessions({'game_type': ['document_recall', 'license_plates'][i % 2],
+                                 'score': i * 3, 'level': 1 + i % 8,
+                                 'ts_ms': times[i % len(times)]}
+                                for i in range(60))
+        self.db.record_session('face_recognition', 77, 11)
+    
+    def raw_history(self, days):
+        """Compute history straight from sessions."""
+        first_day = int((datetime.now() - timedelta(days=days)).strftime('%Y%m%d'))
+        with self.db.get_connection() as conn:
+            rows = [dict(row) for row in conn.execute(self.RAW_HISTORY, (first_day,))]
+        for row in rows:
+            row['date'] = datetime.strptime(str(row['local_day']), '%Y%m%d').date().isoformat()
+        return rows
+    
+    def assert_history_matches(self, days=30):
+        """Check get_session_history against the raw aggregation."""
+        history = self.db.get_session_history(days)
+        raw = self.raw_history(days)
+        self.assertEqual(len(history), len(raw))
+        for row, expected in zip(history, raw):
+            self.assertEqual(row['date'], expected['date'])
+            self.assertEqual(row['sessions'], expected['sessions'])
+            self.assertEqual(row['total_score'], expected['total_score'])
+            self.assertEqual(row['max_level'], expected['max_level'])
+            self.assertAlmostEqual(row['avg_score'], expected['avg_score'])
+    
+    def test_history_matches_sessions(self):
+        """Test incremental maintenance agrees with a full aggregation."""
+        self.assert_history_matches(30)
+        self.assert_history_matches(60)
+    
+    def test_backfill_migration(self):
+        """Test upgrading a database from before the rollup backfills it."""
+        with self.db.get_connection() as conn:
+            legacy_rows = [(row['game_type'], row['score'], row['level_reached'],
+                            datetime.fromtimestamp(row['ts_ms'] / 1000, timezone.utc)
+                            .strftime('%Y-%m-%d %H:%M:%S'))
+                           for row in conn.execute('SELECT * FROM sessions')]
+        temp_dir = tempfile.mkdtemp()
+        try:
+            path = os.path.join(temp_dir, 'legacy.db')
+            conn = sqlite3.connect(path)
+            conn.execute(TestEpochTimestamps.LEGACY_SESSIONS)
+            conn.executemany('''
+                INSERT INTO sessions (game_type, score, level_reached, timestamp)
+                VALUES (?, ?, ?, ?)
+            ''', legacy_rows)
+            conn.commit()
+            conn.close()
+            
+            self.db = Database(path)
+            self.assert_history_matches(60)
+            self.db.close()
+        finally:
+            shutil.rmtree(temp_dir)
+    
+    def test_import_rebuilds_rollup(self):
+        """Test importing a backup rebuilds the rollup."""
+        exported = self.db.export_data()
+        self.db = Database(':memory:')
+        self.db.import_data(exported, merge=False)
+        self.assert_history_matches(60)
+
+
+class TestEpochTimestamps(unittest.TestCase):
+    """Test epoch-millisecond session times and the text timestamp migration."""
+    
+    LEGACY_SESSIONS = '''
+        CREATE TABLE sessions (
+            id INTEGER PRIMARY KEY AUTOINCREMENT,
+            game_type TEXT NOT NULL,
+            score INTEGER NOT NULL,
+            level_reached INTEGER NOT NULL,
+            correct_answers INTEGER DEFAULT 0,
+            total_attempts INTEGER DEFAULT 0,
+            duration_seconds INTEGER DEFAULT 0,
+            practice_mode BOOLEAN DEFAULT 0,
+            timestamp DATETIME DEFAULT CURRENT_TIMESTAMP
+        )
+    '''
+    
+    def setUp(self):
+        """Set up a temporary directory."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'legacy.db')
+    
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.temp_dir)
+    
+    def create_legacy(self, path):
+        """Create a pre-migration sessions table with text timestamps."""
+        conn = sqlite3.connect(path)
+        conn.execute(self.LEGACY_SESSIONS)
+        conn.executemany('''
+            INSERT INTO sessions (game_type, score, level_reached, timestamp)
+            VALUES (?, ?, ?, ?)
+        ''', [('document_recall', 10 * i, i, f'2024-03-{i:02d} 23:30:00') for i in range(1, 11)])
+        # A deleted newest row: its id must not be handed out again
+        conn.execute('DELETE FROM sessions WHERE id = 10')
+        conn.commit()
+        conn.close()
+    
+    def test_migrates_legacy_file(self):
+        """Test an old database is converted in place with ids and history intact."""
+        self.create_legacy(self.db_file)
+        with Database(self.db_file) as db:
+            rows = db.get_recent_sessions(20)
+            self.assertEqual(len(rows), 9)
+            self.assertNotIn('timestamp', rows[0])
+            newest = rows[0]
+            self.assertEqual(newest['id'], 9)
+            self.assertEqual(newest['ts_ms'], to_epoch_ms('2024-03-09 23:30:00'))
+            self.assertEqual(newest['local_day'], local_day(newest['ts_ms']))
+            
+            stats = db.get_statistics('document_recall')
+            self.assertEqual(stats['sessions_played'], 9)
+            self.assertEqual(stats['last_played'], newest['ts_ms'])
+            
+            self.assertGreater(db.record_session('document_recall', 5, 1), 10)
+            with db.get_connection() as conn:
+                days = conn.execute('SELECT COUNT(*) FROM daily_rollup').fetchone()[0]
+            self.assertEqual(days, 10)
+    
+    def test_migrates_legacy_archive(self):
+        """Test an archive file from before the migration is converted when attached."""
+        archive_file = os.path.join(self.temp_dir, 'archive.db')
+        self.create_legacy(archive_file)
+        with Database(self.db_file, archive_file=archive_file) as db:
+            sessions = db.get_recent_sessions(20, include_archive=True)
+            self.assertEqual(len(sessions), 9)
+            self.assertTrue(all(isinstance(row['ts_ms'], int) for row in sessions))
+    
+    def test_time_range_queries_use_indexes(self):
+        """Test ordering by time reads the ts_ms index instead of sorting."""
+        with Database(self.db_file) as db:
+            with db.get_connection() as conn:
+                plan = [row[3] for row in conn.execute(
+                    'EXPLAIN QUERY PLAN SELECT * FROM sessions WHERE ts_ms >= ? ORDER BY ts_ms',
+                    (0,))]
+        self.assertTrue(any('idx_sessions_ts' in step for step in plan), plan)
+        self.assertFalse(any('TEMP B-TREE' in step for step in plan), plan)
+    
+    def test_to_epoch_ms(self):
+        """Test legacy text timestamps are read as UTC."""
+        self.assertEqual(to_epoch_ms('1970-01-01 00:00:01'), 1000)
+        self.assertEqual(to_epoch_ms(1234), 1234)
+        self.assertIsNone(to_epoch_ms(None))
+
+
+class TestReadCache(unittest.TestCase):
+    """Test the generation-versioned read cache."""
+    
+    def setUp(self):
+        """Set up test database."""
+        self.db = Database(':memory:')
+        self.db.record_session('document_recall', 100, 5, 8, 10)
+    
+    def test_repeated_reads_hit(self):
+        """Test repeated reads are served from the cache."""
+        self.db.get_statistics()
+        self.db.get_statistics('document_recall')
+        before = self.db.cache_stats()
+        for _ in range(5):
+            self.db.get_statistics()
+            self.db.get_statistics('document_recall')
+        after = self.db.cache_stats()
+        self.assertEqual(after['hits'] - before['hits'], 10)
+        self.assertEqual(after['misses'], before['misses'])
+        self.assertGreater(after['hit_rate'], 0.5)
+    
+    def test_writes_invalidate(self):
+        """Test each mutating method makes the next read see its change."""
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 1)
+        self.db.record_session('document_recall', 50, 2)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 2)
+        
+        self.db.get_achievements()
+        self.db.unlock_achievement('level_15')
+        self.assertIn('level_15', self.db.get_achievements())
+        
+        self.assertIsNone(self.db.get_user_data('theme'))
+        self.db.set_user_data('theme', 'blue')
+        self.assertEqual(self.db.get_user_data('theme'), 'blue')
+        
+        self.db.import_data({'sessions': [{'game_type': 'license_plates', 'score': 10,
+                                           'level_reached': 1}]})
+        self.assertIn('license_plates', self.db.get_statistics())
+    
+    def test_failed_write_keeps_generation(self):
+        """Test a rolled back write does not invalidate the cache."""
+        generation = self.db.cache_stats()['generation']
+        with self.assertRaises(sqlite3.OperationalError):
+            with self.db.get_connection(write=True) as conn:
+                conn.execute('INSERT INTO missing_table VALUES (1)')
+        self.assertEqual(self.db.cache_stats()['generation'], generation)
+    
+    def test_uncommitted_reads_bypass_cache(self):
+        """Test reads inside a write block see its rows, which are not cached after a rollback."""
+        self.assertIsNone(self.db.get_user_data('theme'))
+        with self.assertRaises(sqlite3.OperationalError):
+            with self.db.get_connection(write=True) as conn:
+                conn.execute("INSERT INTO user_data (user_id, key, value) VALUES (1, 'theme', 'red')")
+                self.assertEqual(self.db.get_user_data('theme'), 'red')
+                conn.execute('INSERT INTO missing_table VALUES (1)')
+        self.assertIsNone(self.db.get_user_data('theme'))
+    
+    def test_results_are_copies(self):
+        """Test mutating a returned dict does not poison the cache."""
+        stats = self.db.get_statistics('document_recall')
+        stats['best_score'] = -1
+        self.assertEqual(self.db.get_statistics('document_recall')['best_score'], 100)
+
+
+class TestSnapshotReads(unittest.TestCase):
+    """Test read-only snapshot connections for statistics and history."""
+    
+    def setUp(self):
+        """Set up a file database with snapshot reads."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'test.db')
+        self.db = Database(self.db_file, snapshot_reads=True)
+        self.db.record_session('document_recall', 100, 5, 5, 5)
+    
+    def tearDown(self):
+        """Close connections and remove the database file."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def test_reads_during_import_see_last_commit(self):
+        """Test reads from inside a running import see the state before it."""
+        seen = []
+        
+        def progress(done, total):
+            seen.append((self.db.get_statistics('document_recall')['sessions_played'],
+                         len(self.db.get_recent_sessions(50))))
+        
+        self.db.import_data({'sessions': [{'game_type': 'document_recall', 'score': 1,
+                                           'level_reached': 1}] * 20},
+                            batch_size=5, progress=progress)
+        self.assertEqual(seen, [(1, 1)] * 4)
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 21)
+    
+    def test_not_blocked_by_open_writer(self):
+        """Test reads return committed data while another connection holds the write lock."""
+        writer = sqlite3.connect(self.db_file)
+        writer.execute('BEGIN IMMEDIATE')
+        writer.execute("INSERT INTO sessions (game_type, score, level_reached) "
+                       "VALUES ('license_plates', 1, 1)")
+        try:
+            self.assertEqual(len(self.db.get_recent_sessions(10)), 1)
+            self.assertEqual(len(self.db.get_session_history(1)), 1)
+            self.assertNotIn('license_plates', self.db.get_statistics())
+        finally:
+            writer.rollback()
+            writer.close()
+    
+    def test_snapshot_is_read_only_and_consistent(self):
+        """Test a read block sees one snapshot and cannot write."""
+        with self.db.read_connection() as conn:
+            before = conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+            thread = threading.Thread(
+                target=lambda: self.db.record_session('document_recall', 1, 1))
+            thread.start()
+            thread.join()
+            self.assertEqual(conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0], before)
+            with self.assertRaises(sqlite3.OperationalError):
+                conn.execute('DELETE FROM sessions')
+        self.assertEqual(len(self.db.get_recent_sessions(10)), 2)
+    
+    def test_memory_database_uses_main_connection(self):
+        """Test in-memory databases fall back to the shared connection."""
+        db = Database(':memory:', snapshot_reads=True)
+        self.assertFalse(db.snapshot_reads)
+        db.record_session('document_recall', 1, 1)
+        self.assertEqual(len(db.get_recent_sessions()), 1)
+
+
+class TestProfiling(unittest.TestCase):
+    """Test per-method latency histograms and the slow-call log."""
+    
+    def setUp(self):
+        """Set up test database."""
+        self.db = Database(':memory:')
+    
+    def test_disabled_leaves_class_methods(self):
+        """Test profiling adds nothing to the instance unless enabled."""
+        self.assertNotIn('record_session', vars(self.db))
+        self.assertEqual(self.db.profile_stats(), {})
+        self.db.enable_profiling()
+        self.assertIn('record_session', vars(self.db))
+        self.assertNotIn('get_connection', vars(self.db))
+        self.db.disable_profiling()
+        self.assertNotIn('record_session', vars(self.db))
+        self.assertEqual(self.db.slow_queries(), [])
+    
+    def test_counts_and_histograms(self):
+        """Test calls are counted per method with consistent percentiles."""
+        self.db.enable_profiling(slow_ms=10_000)
+        for score in range(5):
+            self.db.record_session('document_recall', score, 1)
+        self.db.get_statistics()
+        
+        stats = self.db.disable_profiling()
+        record = stats['methods']['record_session']
+        self.assertEqual(record['calls'], 5)
+        self.assertEqual(sum(record['histogram'].values()), 5)
+        self.assertLessEqual(record['p50_us'], record['p99_us'])
+        self.assertLessEqual(record['p99_us'], record['max_us'])
+        self.assertEqual(stats['methods']['get_statistics']['calls'], 1)
+        self.assertEqual(stats['slow_calls'], 0)
+    
+    def test_slow_log_captures_sql_and_plan(self):
+        """Test slow calls keep their statements and can be explained."""
+        self.db.record_session('document_recall', 100, 5)
+        self.db.enable_profiling(slow_ms=0)
+        self.db.get_recent_sessions(5, game_type='document_recall')
+        
+        entry = self.db.slow_queries(explain=True)[-1]
+        self.assertEqual(entry['method'], 'get_recent_sessions')
+        select = next(i for i, sql in enumerate(entry['sql']) if sql.lstrip().startswith('SELECT'))
+        self.assertIn("'document_recall'", entry['sql'][select])
+        self.assertIn('idx_sessions_user_game_ts', '\n'.join(entry['plans'][select]))
+        self.assertIn('get_recent_sessions', self.db.profiler.report())
+    
+    def test_statement_log_is_capped(self):
+        """Test bulk calls keep only the first statements they traced."""
+        self.db.enable_profiling(slow_ms=0)
+        self.db.import_data({'sessions': [{'game_type': 'document_recall', 'score': 1,
+                                           'level_reached': 1}] * 200})
+        entry = self.db.slow_queries()[-1]
+        self.assertEqual(entry['method'], 'import_data')
+        self.assertEqual(len(entry['sql']), self.db.profiler.MAX_STATEMENTS)
+
+
+class TestLazySingletons(unittest.TestCase):
+    """Test the global config and db are created on first use."""
+    
+    # Milliseconds for our own modules once their stdlib imports are loaded
+    IMPORT_BUDGET_MS = 15
+    STDLIB = ('atexit, collections, contextlib, datetime, itertools, json, os, queue, '
+              'random, sqlite3, string, threading, typing')
+    
+    def setUp(self):
+        """Set up an empty working directory and a bytecode cache."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.work_dir = os.path.join(self.temp_dir, 'work')
+        os.mkdir(self.work_dir)
+    
+    def tearDown(self):
+        """Drop the singletons and remove temporary files."""
+        if database_module._db is not None:
+            database_module._db.close()
+        database_module._db = None
+        config_module._config = None
+        shutil.rmtree(self.temp_dir)
+    
+    def run_python(self, code):
+        """Run code in a fresh interpreter inside the empty working directory."""
+        env = dict(os.environ,
+                   PYTHONPATH=os.path.dirname(os.path.abspath(__file__)),
+                   PYTHONPYCACHEPREFIX=os.path.join(self.temp_dir, 'pycache'))
+        env.pop('PYTHONDONTWRITEBYTECODE', None)
+        return subprocess.run([sys.executable, '-c', code], cwd=self.work_dir, env=env,
+                              capture_output=True, text=True, check=True).stdout
+    
+    def test_import_has_no_side_effects(self):
+        """Test importing opens no database and reads no settings."""
+        output = self.run_python('import database, config, utils; '
+                                 'print(database._db is None, config._config is None)')
+        self.assertEqual(output.split(), ['True', 'True'])
+        self.assertEqual(os.listdir(self.work_dir), [])
+    
+    def test_import_time_budget(self):
+        """Test importing database, config and utils stays within budget."""
+        code = (f'import time, {self.STDLIB}\n'
+                'start = time.perf_counter()\n'
+                'import database, config, utils\n'
+                'print((time.perf_counter() - start) * 1000)')
+        self.run_python(code)  # compile once so later runs load bytecode
+        best = min(float(self.run_python(code)) for _ in range(3))
+        self.assertLess(best, self.IMPORT_BUDGET_MS)
+    
+    def test_init_and_first_access(self):
+        """Test init() hooks and attribute access share one instance."""
+        settings_file = os.path.join(self.temp_dir, 'settings.json')
+        with open(settings_file, 'w') as f:
+            json.dump({'archive_file': None, 'backup_enabled': False}, f)
+        loaded = config_module.init(settings_file)
+        self.assertIs(config_module.config, loaded)
+        
+        db = database_module.init(os.path.join(self.temp_dir, 'stats.db'))
+        self.assertIs(database_module.db, db)
+        self.assertIs(database_module.get_db(), db)
+        self.assertIsNone(db.backups)
+        db.record_session('document_recall', 10, 1)
+        
+        reopened = database_module.init(os.path.join(self.temp_dir, 'stats.db'))
+        self.assertIsNot(reopened, db)
+        self.assertEqual(len(database_module.db.get_recent_sessions()), 1)
+        with self.assertRaises(AttributeError):
+            database_module.missing
+
+
+class TestUserDataStore(unittest.TestCase):
+    """Test the in-memory user data store."""
+    
+    def setUp(self):
+        """Set up a file database with some saved user data."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'test.db')
+        self.db = Database(self.db_file)
+        self.db.set_user_data('theme', 'dark')
+        self.db.set_user_data('sessions_today', 3)
+        self.db.set_user_data('muted', True)
+    
+    def tearDown(self):
+        """Close connections and remove the database file."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def stored(self, key):
+        """Read a raw value from the table."""
+        with self.db.get_connection() as conn:
+            row = conn.execute('SELECT value FROM user_data WHERE key = ?', (key,)).fetchone()
+        return row['value'] if row else None
+    
+    def test_typed_accessors(self):
+        """Test typed reads return the loaded values or the default."""
+        store = self.db.open_user_store()
+        self.assertEqual(store.get_str('theme'), 'dark')
+        self.assertEqual(store.get_int('sessions_today'), 3)
+        self.assertTrue(store.get_bool('muted'))
+        self.assertEqual(store.get_int('muted', -1), -1)
+        self.assertEqual(store.get_str('missing', 'x'), 'x')
+    
+    def test_writes_are_deferred_until_flush(self):
+        """Test writes stay in memory until one flush commits them all."""
+        store = self.db.open_user_store(flush_interval=60)
+        self.db.set_user_data('theme', 'blue')
+        store.increment('sessions_today')
+        self.assertEqual(self.db.get_user_data('theme'), 'blue')
+        self.assertEqual(self.stored('theme'), 'dark')
+        
+        self.assertEqual(store.flush(), 2)
+        self.assertEqual(self.stored('theme'), 'blue')
+        self.assertEqual(self.stored('sessions_today'), '4')
+        self.assertEqual(store.stats(), {'keys': 3, 'dirty': 0, 'flushes': 1})
+    
+    def test_timer_flush(self):
+        """Test pending writes are flushed after the interval."""
+        store = self.db.open_user_store(flush_interval=0.01)
+        store.set('theme', 'light')
+        for _ in range(200):
+            if store.stats()['dirty'] == 0:
+                break
+            threading.Event().wait(0.01)
+        self.assertEqual(self.stored('theme'), 'light')
+    
+    def test_timed_flushes_share_one_connection(self):
+        """Test repeated timed flushes run on one thread and connection."""
+        store = self.db.open_user_store(flush_interval=0.001)
+        for i in range(20):
+            store.set('count', i)
+            for _ in range(200):
+                if store.stats()['dirty'] == 0:
+                    break
+                threading.Event().wait(0.005)
+        self.assertEqual(store.stats()['flushes'], 20)
+        # This thread's connection and the flush thread's
+        self.assertEqual(len(self.db._connections), 2)
+    
+    def test_close_flushes(self):
+        """Test closing the database writes pending values."""
+        self.db.open_user_store(flush_interval=60).set('volume', 7)
+        self.db.close()
+        self.db = Database(self.db_file)
+        self.assertEqual(self.db.get_user_data('volume'), 7)
+    
+    def test_export_and_import_see_store(self):
+        """Test exports include unflushed writes and imports reload the store."""
+        store = self.db.open_user_store(flush_interval=60)
+        store.set('volume', 7)
+        self.assertEqual(self.db.export_data()['user_data']['volume'], 7)
+        self.db.import_data({'user_data': {'volume': 9}})
+        self.assertEqual(store.get_int('volume'), 9)
+
+
+class TestBackups(unittest.TestCase):
+    """Test online backups and the backup schedule."""
+    
+    def setUp(self):
+        """Set up a file database with some sessions."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.backup_dir = os.path.join(self.temp_dir, 'backups')
+        self.db = Database(os.path.join(self.temp_dir, 'test.db'))
+        self.db.record_sessions({'game_type': 'document_recall', 'score': i, 'level': 1}
+                                for i in range(2000))
+    
+    def tearDown(self):
+        """Close connections and remove the files."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def count_sessions(self, path):
+        """Count the sessions in a backup file."""
+        conn = sqlite3.connect(path)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_paged_backup_with_concurrent_write(self):
+        """Test a backup completes while a session is written between every step."""
+        for profile in ('balanced', 'durable'):
+            with self.subTest(profile):
+                db = Database(os.path.join(self.temp_dir, f'{profile}.db'), profile=profile)
+                db.record_sessions({'game_type': 'document_recall', 'score': i, 'level': 1}
+                                   for i in range(2000))
+                steps = []
+                
+                def progress(copied, total):
+                    db.record_session('license_plates', 10, 1)
+                    steps.append((copied, total))
+                
+                target = os.path.join(self.temp_dir, f'{profile}-copy.db')
+                result = db.backup(target, pages=2, step_sleep=0, progress=progress,
+                                   max_restarts=3)
+                db.close()
+                # WAL copies in one step; the rollback journal restarts, then does
+                self.assertEqual(len(steps) == 1, profile == 'balanced')
+                self.assertEqual(steps[-1][0], steps[-1][1])
+                self.assertEqual(result['pages'], steps[-1][1])
+                self.assertGreaterEqual(self.count_sessions(target), 2000)
+                self.assertFalse(os.path.exists(target + '.partial'))
+    
+    def test_memory_database_backup(self):
+        """Test in-memory databases can be backed up to a file."""
+        db = Database(':memory:')
+        db.record_session('document_recall', 5, 1)
+        target = os.path.join(self.temp_dir, 'memory.db')
+        db.backup(target)
+        self.assertEqual(self.count_sessions(target), 1)
+    
+    def test_rotation(self):
+        """Test only the newest copies are kept."""
+        manager = self.db.start_backups(self.backup_dir, keep=2, interval=3600,
+                                        startup_delay=3600)
+        results = [manager.backup_now() for _ in range(3)]
+        self.assertEqual(manager.list_backups(), [r['path'] for r in results[1:]])
+        status = manager.status()
+        self.assertEqual(status['backups'], 2)
+        self.assertEqual(status['last_backup'], results[-1])
+        self.assertFalse(status['running'])
+    
+    def test_archive_is_backed_up_and_rotated(self):
+        """Test each backup carries a copy of the archive, rotated with it."""
+        db = Database(os.path.join(self.temp_dir, 'archived.db'),
+                      archive_file=os.path.join(self.temp_dir, 'archived.archive.db'))
+        self.addCleanup(db.close)
+        old = (datetime.now(timezone.utc) - timedelta(days=730)).strftime('%Y-%m-%d')
+        db.record_sessions({'game_type': 'document_recall', 'score': i, 'level': 1,
+                            'timestamp': f'{old} 10:00:00'} for i in range(30))
+        db.record_session('document_recall', 5, 1)
+        db.archive_sessions(365)
+        
+        manager = db.start_backups(self.backup_dir, keep=1, interval=3600, startup_delay=3600)
+        first = manager.backup_now()
+        result = manager.backup_now()
+        self.assertEqual(result['archive'],
+                         os.path.splitext(result['path'])[0] + '.archive.db')
+        self.assertEqual(self.count_sessions(result['path']), 1)
+        self.assertEqual(self.count_sessions(result['archive']), 30)
+        self.assertEqual(manager.list_backups(), [result['path']])
+        self.assertFalse(os.path.exists(first['archive']))
+    
+    def test_schedule(self):
+        """Test the background thread backs up when due."""
+        manager = self.db.start_backups(self.backup_dir, interval=0.05, startup_delay=0)
+        for _ in range(200):
+            if manager.status()['last_backup']:
+                break
+            threading.Event().wait(0.01)
+        self.db.close()
+        backups = manager.list_backups()
+        self.assertTrue(backups)
+        self.assertEqual(self.count_sessions(backups[-1]), 2000)
+
+
+class TestHybridDatabase(unittest.TestCase):
+    """Test in-memory working sets snapshotted to disk."""
+    
+    def setUp(self):
+        """Set up a database file with one session on disk."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db_file = os.path.join(self.temp_dir, 'test.db')
+        with Database(self.db_file) as db:
+            db.record_session('document_recall', 100, 5)
+    
+    def tearDown(self):
+        """Remove the database files."""
+        shutil.rmtree(self.temp_dir)
+    
+    def sessions_on_disk(self):
+        """Count sessions in the file itself."""
+        conn = sqlite3.connect(self.db_file)
+        try:
+            return conn.execute('SELECT COUNT(*) FROM sessions').fetchone()[0]
+        finally:
+            conn.close()
+    
+    def test_loads_and_writes_in_memory(self):
+        """Test the file is loaded at startup and untouched until a snapshot."""
+        db = Database(self.db_file, hybrid=True, snapshot_interval=3600)
+        try:
+            self.assertEqual(db.get_statistics('document_recall')['sessions_played'], 1)
+            db.record_session('document_recall', 120, 6)
+            self.assertEqual(self.sessions_on_disk(), 1)
+            self.assertTrue(db.snapshotter.status()['dirty'])
+            
+            self.assertIsNotNone(db.snapshotter.snapshot_now())
+            self.assertEqual(self.sessions_on_disk(), 2)
+            self.assertIsNone(db.snapshotter.snapshot_now())
+            self.assertFalse(db.snapshotter.status()['dirty'])
+        finally:
+            db.close()
+    
+    def test_close_saves_last_changes(self):
+        """Test close() snapshots writes made since the last snapshot."""
+        db = Database(self.db_file, hybrid=True, snapshot_interval=3600)
+        db.record_session('license_plates', 50, 2)
+        db.close()
+        
+        with Database(self.db_file, hybrid=True, snapshot_interval=3600) as reopened:
+            self.assertEqual(len(reopened.get_recent_sessions()), 2)
+            self.assertEqual(reopened.verify_statistics(), [])
+    
+    def test_timer_snapshots_within_interval(self):
+        """Test the background thread saves changes on its own."""
+        db = Database(self.db_file, hybrid=True, snapshot_interval=0.05)
+        try:
+            db.record_session('document_recall', 120, 6)
+            for _ in range(100):
+                if self.sessions_on_disk() == 2:
+                    break
+                time.sleep(0.02)
+            self.assertEqual(self.sessions_on_disk(), 2)
+            self.assertIsNotNone(db.snapshotter.status()['last_snapshot'])
+        finally:
+            db.close()
+    
+    def test_new_file_is_created(self):
+        """Test a hybrid database starting without a file writes one on close."""
+        path = os.path.join(self.temp_dir, 'new.db')
+        with Database(path, hybrid=True) as db:
+            db.record_session('document_recall', 1, 1)
+            self.assertFalse(os.path.exists(path))
+        self.assertTrue(os.path.exists(path))
+        self.assertFalse(os.path.exists(path + '.partial'))
+    
+    def test_snapshots_leave_archive_in_place(self):
+        """Test snapshots copy only the main database, not the attached archive."""
+        archive_file = os.path.join(self.temp_dir, 'test.archive.db')
+        db = Database(self.db_file, hybrid=True, snapshot_interval=3600,
+                      archive_file=archive_file)
+        old = (datetime.now(timezone.utc) - timedelta(days=730)).strftime('%Y-%m-%d')
+        db.record_sessions({'game_type': 'license_plates', 'score': i, 'level': 2,
+                            'timestamp': f'{old} 10:{i:02d}:00'} for i in range(5))
+        inode = os.stat(archive_file).st_ino
+        
+        result = db.snapshotter.snapshot_now()
+        self.assertIsNone(result['archive'])
+        self.assertEqual(os.stat(archive_file).st_ino, inode)
+        self.assertEqual(db.archive_sessions(older_than_days=365), 5)
+        db.close()
+        
+        with Database(self.db_file, hybrid=True, snapshot_interval=3600,
+                      archive_file=archive_file) as reopened:
+            self.assertEqual(self.sessions_on_disk(), 1)
+            self.assertEqual(reopened.get_statistics('license_plates')['sessions_played'], 5)
+            self.assertEqual(reopened.verify_statistics(), [])
+
+
+class TestArchive(unittest.TestCase):
+    """Test moving old sessions into the attached archive file."""
+    
+    def setUp(self):
+        """Set up a database with sessions from two years ago and from today."""
+        self.temp_dir = tempfile.mkdtemp()
+        self.db = Database(os.path.join(self.temp_dir, 'test.db'),
+                           archive_file=os.path.join(self.temp_dir, 'archive.db'))
+        old = (datetime.now(timezone.utc) - timedelta(days=730)).strftime('%Y-%m-%d')
+        self.db.record_sessions({'game_type': 'document_recall', 'score': i, 'level': 3,
+                                 'timestamp': f'{old} 10:{i:02d}:00'} for i in range(25))
+        for i in range(5):
+            self.db.record_session('license_plates', 100 + i, 4)
+    
+    def tearDown(self):
+        """Close connections and remove the database files."""
+        self.db.close()
+        shutil.rmtree(self.temp_dir)
+    
+    def count(self, table):
+        """Count rows in a sessions table."""
+        with self.db.get_connection() as conn:
+            return conn.execute(f'SELECT COUNT(*) FROM {table}').fetchone()[0]
+    
+    def test_moves_old_sessions_in_batches(self):
+        """Test only sessions past the cutoff move, across several batches."""
+        stats = self.db.get_statistics()
+        history = self.db.get_session_history(1000)
+        
+        self.assertEqual(self.db.archive_sessions(365, batch_size=10), 25)
+        self.assertEqual(self.count('main.sessions'), 5)
+        self.assertEqual(self.count('archive.sessions'), 25)
+        self.assertEqual(self.db.archive_sessions(365), 0)
+        
+        self.assertEqual(self.db.get_statistics(), stats)
+        self.assertEqual(self.db.get_session_history(1000), history)
+    
+    def test_statistics_combine_both_tables(self):
+        """Test statistics rebuilt from hot and archived sessions match the running totals."""
+        self.db.record_session('document_recall', 500, 9)
+        stats = self.db.get_statistics()
+        self.db.archive_sessions(365)
+        
+        self.assertEqual(self.db.verify_statistics(), [])
+        self.assertEqual(self.db.rebuild_statistics(), 2)
+        self.assertEqual(self.db.get_statistics(), stats)
+    
+    def test_recent_sessions_read_hot_table(self):
+        """Test recent sessions skip the archive unless asked."""
+        self.db.archive_sessions(365)
+        self.assertEqual(len(self.db.get_recent_sessions(100)), 5)
+        archived = self.db.get_recent_sessions(100, 'document_recall', include_archive=True)
+        self.assertEqual(len(archived), 25)
+    
+    def test_export_includes_archive(self):
+        """Test exports and rebuilds see archived sessions."""
+        self.db.archive_sessions(365)
+        exported = self.db.export_data()
+        self.assertEqual(len(exported['sessions']), 30)
+        
+        out = io.StringIO()
+        self.assertEqual(self.db.export_stream(out), 30)
+        
+        self.db.import_data({'sessions': []})
+        self.assertEqual(self.db.get_statistics('document_recall')['sessions_played'], 25)
+        self.db.import_data(exported, merge=False)
+        self.assertEqual(self.count('archive.sessions'), 0)
+        self.assertEqual(self.count('main.sessions'), 30)
+    
+    def test_resumes_interrupted_move(self):
+        """Test rows copied to the archive but not deleted are not duplicated."""
+        with self.db.get_connection(write=True) as conn:
+            conn.execute("INSERT INTO archive.sessions SELECT * FROM main.sessions "
+                         "WHERE game_type = 'document_recall' LIMIT 3")
+        self.assertEqual(self.db.archive_sessions(365), 22)
+        self.assertEqual(len(self.db.export_data()['sessions']), 30)
+    
+    def test_background_archiving(self):
+        """Test start_archiving() moves old sessions on its own thread."""
+        self.db.start_archiving(365).join()
+        self.assertEqual(self.count('main.sessions'), 5)
+        self.assertEqual(self.count('archive.sessions'), 25)
+        self.db.close()
+        self.assertIsNone(self.db.archiver)
+    
+    def test_requires_archive_file(self):
+        """Test archiving without an archive file is an error."""
+        with self.assertRaises(RuntimeError):
+            Database(':memory:').archive_sessions()
 
 
 class TestUtils(unittest.TestCase):
@@ -328,6 +2235,30 @@ def run_tests():
     # Add test classes
     suite.addTests(loader.loadTestsFromTestCase(TestConfig))
     suite.addTests(loader.loadTestsFromTestCase(TestDatabase))
+    suite.addTests(loader.loadTestsFromTestCase(TestConnectionCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestPerformanceProfiles))
+    suite.addTests(loader.loadTestsFromTestCase(TestQueryPlans))
+    suite.addTests(loader.loadTestsFromTestCase(TestStatisticsRebuild))
+    suite.addTests(loader.loadTestsFromTestCase(TestUsers))
+    suite.addTests(loader.loadTestsFromTestCase(TestSessionPages))
+    suite.addTests(loader.loadTestsFromTestCase(TestScorePercentile))
+    suite.addTests(loader.loadTestsFromTestCase(TestAttempts))
+    suite.addTests(loader.loadTestsFromTestCase(TestMultiProcessWrites))
+    suite.addTests(loader.loadTestsFromTestCase(TestSessionWriter))
+    suite.addTests(loader.loadTestsFromTestCase(TestAchievements))
+    suite.addTests(loader.loadTestsFromTestCase(TestStreamingExport))
+    suite.addTests(loader.loadTestsFromTestCase(TestDataPack))
+    suite.addTests(loader.loadTestsFromTestCase(TestBatchedImport))
+    suite.addTests(loader.loadTestsFromTestCase(TestDailyRollup))
+    suite.addTests(loader.loadTestsFromTestCase(TestEpochTimestamps))
+    suite.addTests(loader.loadTestsFromTestCase(TestReadCache))
+    suite.addTests(loader.loadTestsFromTestCase(TestSnapshotReads))
+    suite.addTests(loader.loadTestsFromTestCase(TestProfiling))
+    suite.addTests(loader.loadTestsFromTestCase(TestLazySingletons))
+    suite.addTests(loader.loadTestsFromTestCase(TestUserDataStore))
+    suite.addTests(loader.loadTestsFromTestCase(TestBackups))
+    suite.addTests(loader.loadTestsFromTestCase(TestHybridDatabase))
+    suite.addTests(loader.loadTestsFromTestCase(TestArchive))
     suite.addTests(loader.loadTestsFromTestCase(TestUtils))
     suite.addTests(loader.loadTestsFromTestCase(TestIntegration))
     